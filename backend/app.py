@@ -5,11 +5,13 @@ import json
 
 app = Flask(__name__)
 CORS(app)
+# JSON数据目录，可通过 app.config 修改（如基准测试使用生成的数据）
+app.config.setdefault('JSON_DATA_DIR', os.path.join(os.path.dirname(__file__), '..', 'data', 'JsonData'))
 
 @app.route('/api/materials', methods=['GET'])
 def get_materials():
     materials_dict = {}  # 使用字典来组织材料数据
-    base_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'JsonData')
+    base_path = app.config['JSON_DATA_DIR']
     
     try:
         if not os.path.exists(base_path):
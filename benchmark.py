@@ -0,0 +1,429 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+import html2Json
+from html2Json import check_result, clean_json_string, extract_material
+from html_cleaner import CLEANERS
+from html_store import HtmlStore
+from metrics import percentile
+
+# 基准测试结果，每次运行追加一行
+DEFAULT_RESULTS_PATH = 'data/benchmarks/results.jsonl'
+# 所有阶段，按执行顺序
+STAGES = ['clean', 'parse', 'extract', 'clean_json_string', 'ingest', 'api']
+
+_GRADES = ['20Cr', '40Cr', '42CrMo4', 'GCr15', '20CrMnTi', '16MnCr5', '38CrMoAl', '65Mn', 'SUJ2', 'S45C']
+_STANDARDS = [
+    ('GB/T 3077-2015', '合金结构钢'), ('GB/T 18254-2016', '高碳铬轴承钢'), ('GB/T 699-2015', '优质碳素结构钢'),
+    ('JIS G 4805-2019', '高碳铬轴承钢'), ('EN 10083-3-2006', '调质钢 第3部分：合金钢'),
+    ('ASTM A29/A29M-2020', '热锻碳钢和合金钢棒'),
+]
+_ELEMENTS = ['C', 'Si', 'Mn', 'Cr', 'Ni', 'Mo', 'V', 'Cu', 'P', 'S', 'Al', 'Ti']
+_PROPERTIES = [('抗拉强度 Rm', 'MPa'), ('下屈服强度 ReL', 'MPa'), ('断后伸长率 A', '%'), ('断面收缩率 Z', '%'),
+               ('冲击吸收能量 KU2', 'J'), ('布氏硬度 HBW', '')]
+_PHYSICAL = [('弹性模量', 'GPa'), ('热膨胀系数', '10⁻⁶/K'), ('热导率', 'W/(m·K)'), ('比热容', 'J/(kg·K)'),
+             ('电阻率', 'Ω·mm²/m')]
+_PROCESSES = [('淬火', '油冷'), ('回火', '水冷、油冷'), ('正火', '空冷'), ('退火', '炉冷'), ('渗碳', '油冷')]
+_SIMILAR_STANDARDS = ['中国 GB', '美国 ASTM', '日本 JIS', '德国 DIN', '欧盟 EN', '国际 ISO', '俄罗斯 GOST']
+# 生成的牌号中带有序号，模拟的模型据此找到对应的JSON
+_NAME_RE = re.compile(r'-B(\d{6})')
+
+def make_material(index, size=1, seed=0):
+    """生成第 index 个材料的JSON，内容只取决于 (index, size, seed)，size 越大各表格的行数越多"""
+    rng = random.Random(seed * 1000003 + index)
+    name = f"{_GRADES[index % len(_GRADES)]}-B{index:06d}"
+    code, description = _STANDARDS[rng.randrange(len(_STANDARDS))]
+    elements = {}
+    for element in _ELEMENTS:
+        low = round(rng.uniform(0, 1.2), 2)
+        elements[element] = {'Min': f"{low:.2f}", 'Max': f"{low + rng.uniform(0.05, 0.4):.2f}"}
+    conditions = [
+        {'Property': prop, 'Condition': f"试样尺寸 {rng.choice([15, 25, 40, 60])} mm",
+         'Value': f"≥{rng.randint(10, 1200)}{' ' + unit if unit else ''}"}
+        for _ in range(size) for prop, unit in _PROPERTIES
+    ]
+    heat_treatment = [
+        {'Process': process, 'TemperatureRange': f"{rng.randint(150, 950)}~{rng.randint(951, 1050)}℃",
+         'CoolingMethod': cooling}
+        for _ in range(size) for process, cooling in _PROCESSES
+    ]
+    physical = [
+        {'Property': prop, 'Condition': f"{temperature}℃", 'Value': f"{rng.uniform(1, 300):.1f} {unit}"}
+        for temperature in range(20, 20 + 100 * size, 100) for prop, unit in _PHYSICAL
+    ]
+    similar = [{'Field': f"相近牌号{row + 1}" if size > 1 else '', 'Mappings': [
+        {'Standard': standard, 'Grades': [f"{rng.choice(_GRADES)}{rng.choice(['', 'A', 'H', 'E'])}"]}
+        for standard in _SIMILAR_STANDARDS
+    ]} for row in range(size)]
+    return {
+        'Material': {
+            'Name': name,
+            'OtherNames': [f"A{rng.randint(10000, 99999)}"],
+            'Category': description,
+            'Density': f"{rng.uniform(7.7, 7.9):.2f} g/cm³",
+            'BelongsToStandard': {'StandardCode': code, 'Description': description},
+            'AllStandards': [{'StandardCode': code, 'Description': description}],
+            'Description': f"{name} 是按 {code} 生产的{description}。",
+        },
+        'ChemicalComposition': {'Elements': elements, 'Notes': []},
+        'MechanicalProperties': {'Conditions': conditions, 'HeatTreatment': heat_treatment, 'Notes': []},
+        'PhysicalProperties': {'Properties': physical},
+        'SimilarGrades': similar,
+    }
+
+def _table(header, rows):
+    head = ''.join(f"<th>{cell}</th>" for cell in header)
+    body = ''.join('<tr>' + ''.join(f'<td class="c" style="width:120px">{cell}</td>' for cell in row) + '</tr>\n'
+                   for row in rows)
+    return f'<table class="layui-table" lay-skin="line"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>\n'
+
+def render_page(material, nav=60, suppliers=30):
+    """把材料JSON渲染为材数库风格的详情页：页头导航、位置导航、各部分表格、供应商广告、数据说明和页脚"""
+    info = material['Material']
+    standard = info['BelongsToStandard']
+    links = ''.join(f'<li class="layui-nav-item"><a href="/category/{i}" onclick="track({i})">分类{i}</a></li>'
+                    for i in range(nav))
+    elements = material['ChemicalComposition']['Elements']
+    parts = [
+        '<!DOCTYPE html>\n<html lang="zh"><head><meta charset="utf-8">',
+        f'<meta name="keywords" content="{info["Name"]},材数库"><title>{info["Name"]}_材数库</title>',
+        '<link rel="stylesheet" href="/layui/css/layui.css"><style>.c{color:#333}.t{font-weight:bold}</style>',
+        '<script src="/layui/layui.js"></script><script>var _hmt = _hmt || [];</script></head>\n<body>',
+        f'<div class="layui-header"><ul class="layui-nav">{links}</ul></div>\n<div class="layui-container">',
+        '<div class="layui-row"><div class="layui-col-md12"><span class="layui-breadcrumb" lay-separator="&gt;">'
+        f'<a href="/">首页</a><a href="/material/">材料</a><a><cite>{info["Name"]}</cite></a></span></div></div>\n',
+        '<div class="layui-row"><div class="layui-col-md12">',
+        f'<h1 class="t">{info["Name"]}</h1>\n<table class="layui-table">',
+        f'<tr><td>牌号</td><td>{info["Name"]}</td></tr>',
+        f'<tr><td>数字牌号</td><td>{info["OtherNames"][0]}</td></tr>',
+        f'<tr><td>所属标准</td><td>{standard["StandardCode"]} {standard["Description"]}</td></tr>',
+        f'<tr><td>类别</td><td>{info["Category"]}</td></tr>',
+        f'<tr><td>密度</td><td>{info["Density"]}</td></tr></table>\n',
+        '<h2 class="t">化学成分</h2>\n',
+        _table(['元素'] + list(elements), [['含量(%)'] + [f"{v['Min']}~{v['Max']}" for v in elements.values()]]),
+        '<h2 class="t">力学性能</h2>\n',
+        _table(['性能', '条件', '数值'], [[c['Property'], c['Condition'], c['Value']]
+                                          for c in material['MechanicalProperties']['Conditions']]),
+        '<h2 class="t">热处理</h2>\n',
+        _table(['工艺', '温度', '冷却方式'], [[h['Process'], h['TemperatureRange'], h['CoolingMethod']]
+                                            for h in material['MechanicalProperties']['HeatTreatment']]),
+        '<h2 class="t">物理性能</h2>\n',
+        _table(['性能', '温度', '数值'], [[p['Property'], p['Condition'], p['Value']]
+                                          for p in material['PhysicalProperties']['Properties']]),
+        '<h2 class="t">相近牌号</h2>\n',
+        _table([m['Standard'] for m in material['SimilarGrades'][0]['Mappings']],
+               [[' '.join(m['Grades']) for m in row['Mappings']] for row in material['SimilarGrades']]),
+        '<!-- suppliers -->\n',
+        ''.join(f'<div class="sup" onclick="ad({i})"><p>供应商{i} &amp; Co</p><img src="/ad/{i}.png"></div>\n'
+                for i in range(suppliers)),
+        '<noscript>请启用JavaScript</noscript></div></div>\n',
+        '<div class="layui-row"><div class="layui-col-md12"><font color="#999">注：数据仅供参考，不作为设计依据</font>'
+        '</div></div>\n',
+        f'<div class="footer"><ul>{links}</ul><p>© 材数库</p></div></div>',
+        '<script>layui.use("element", function(){});</script></body></html>',
+    ]
+    return ''.join(parts)
+
+def generate_dataset(data_dir, count, size=1, seed=0, per_material=3):
+    """在 data_dir 下生成 count 个详情页（html_store）和对应的JSON（JsonData），每个材料文件夹 per_material 个文件"""
+    store = HtmlStore(os.path.join(data_dir, 'html_store'))
+    try:
+        for index in range(count):
+            material = make_material(index, size, seed)
+            folder = f"Bench{index // per_material:05d}"
+            stem = f"{material['Material']['Name']}_{material['Material']['BelongsToStandard']['StandardCode']}"
+            stem = stem.replace(' ', '_').replace('/', '_')
+            store.put(folder, f"{stem}.html", render_page(material))
+            json_dir = os.path.join(data_dir, 'JsonData', folder)
+            os.makedirs(json_dir, exist_ok=True)
+            with open(os.path.join(json_dir, f"{stem}.json"), 'w', encoding='utf-8') as f:
+                json.dump(material, f, ensure_ascii=False, indent=2)
+    finally:
+        store.close()
+
+class _MockStream:
+    def __init__(self, chunks, latency):
+        self.chunks = chunks
+        self.latency = latency
+
+    def __iter__(self):
+        if self.latency:
+            time.sleep(self.latency)
+        for chunk in self.chunks:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk))])
+
+    def close(self):
+        pass
+
+class MockModel:
+    """模拟的模型客户端，按请求文本中的牌号返回生成器中对应材料的JSON，并以流式分块输出
+
+    Args:
+        size: 与生成页面时相同的 size
+        seed: 与生成页面时相同的 seed
+        latency: 每次请求模拟的响应延迟（秒）
+        chunk_size: 每个流式分块的字符数
+    """
+
+    def __init__(self, size=1, seed=0, latency=0.0, chunk_size=64):
+        self.size = size
+        self.seed = seed
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, stream=False, **kwargs):
+        match = _NAME_RE.search(messages[-1]['content'])
+        material = make_material(int(match.group(1)), self.size, self.seed)
+        content = '```json\n' + json.dumps(material, ensure_ascii=False, indent=2) + '\n```'
+        chunks = [content[i:i + self.chunk_size] for i in range(0, len(content), self.chunk_size)]
+        return _MockStream(chunks, self.latency)
+
+def _stats(durations, peak, items=None):
+    total = sum(durations)
+    items = items if items is not None else len(durations)
+    return {
+        'count': len(durations),
+        'total': round(total, 6),
+        'p50': round(percentile(durations, 50), 6),
+        'p95': round(percentile(durations, 95), 6),
+        'p99': round(percentile(durations, 99), 6),
+        'throughput': round(items / total, 2) if total else 0.0,
+        'peak_mb': round(peak / 1024 / 1024, 3),
+    }
+
+def _measure(inputs, func, memory_sample):
+    """对每个输入单独计时（输入的生成不计入），再在前 memory_sample 个输入上用 tracemalloc 统计单次调用的峰值内存"""
+    durations = []
+    for item in inputs():
+        start = time.perf_counter()
+        func(item)
+        durations.append(time.perf_counter() - start)
+    peak = 0
+    if memory_sample:
+        tracemalloc.start()
+        for index, item in enumerate(inputs()):
+            if index >= memory_sample:
+                break
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func(item)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+    return _stats(durations, peak)
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_benchmark(count=1000, size=1, seed=0, stages=None, engines=None, latency=0.0, memory_sample=50,
+                  api_repeat=3, workdir=None):
+    """运行各阶段的基准测试，返回 {阶段名: 统计}，阶段名如 clean:lxml、extract、api
+
+    Args:
+        count: 页面和JSON文档的数量
+        size: 页面大小，各表格的行数随之成倍增加
+        seed: 生成数据的随机种子
+        stages: 要运行的阶段，默认为全部，见 STAGES
+        engines: clean 阶段比较的清理引擎，默认为全部
+        latency: 模拟的模型每次请求的延迟（秒）
+        memory_sample: 统计峰值内存时使用的输入数量，0 表示不统计
+        api_repeat: 接口请求的次数
+        workdir: 生成的JsonData所在目录，默认使用临时目录并在结束时删除
+    """
+    stages = stages or STAGES
+    results = {}
+    pages = lambda: (render_page(make_material(i, size, seed)) for i in range(count))
+    cleaned = lambda: (CLEANERS['lxml'](html) for html in pages())
+
+    if 'clean' in stages:
+        for engine in engines or sorted(CLEANERS):
+            print(f"clean:{engine} ...")
+            results[f"clean:{engine}"] = _measure(pages, CLEANERS[engine], memory_sample)
+    if 'parse' in stages:
+        print("parse ...")
+        results['parse'] = _measure(cleaned, lambda html: extract_material(html, 'parser'), memory_sample)
+    if 'extract' in stages:
+        # 全部交给模拟的模型，测量流式解析、校验和合并的开销
+        print("extract ...")
+        previous = html2Json.client
+        html2Json.client = MockModel(size, seed, latency)
+        try:
+            results['extract'] = _measure(
+                cleaned, lambda html: check_result(extract_material(html, 'llm', cache=None), 'llm'), memory_sample)
+        finally:
+            html2Json.client = previous
+    if 'clean_json_string' in stages:
+        print("clean_json_string ...")
+        outputs = lambda: ('```json\n' + json.dumps(make_material(i, size, seed), ensure_ascii=False, indent=2) + '\n```'
+                           for i in range(count))
+        results['clean_json_string'] = _measure(outputs, lambda raw: json.loads(clean_json_string(raw)), memory_sample)
+
+    if 'ingest' in stages or 'api' in stages:
+        temporary = workdir is None
+        workdir = workdir or tempfile.mkdtemp(prefix='bench_')
+        try:
+            print(f"生成 {count} 个页面和JSON文档: {workdir}")
+            generate_dataset(workdir, count, size, seed)
+            json_dir = os.path.join(workdir, 'JsonData')
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(json_dir) for name in names)
+
+            def load(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+
+            if 'ingest' in stages:
+                print("ingest ...")
+                results['ingest'] = _measure(lambda: iter(files), load, memory_sample)
+            if 'api' in stages:
+                print("api ...")
+                results['api'] = _benchmark_api(json_dir, count, api_repeat, memory_sample)
+        finally:
+            if temporary:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def _benchmark_api(json_dir, count, repeat, memory_sample):
+    """通过Flask测试客户端请求 /api/materials，返回每次完整响应的耗时"""
+    from backend.app import app
+    previous = app.config['JSON_DATA_DIR']
+    app.config['JSON_DATA_DIR'] = json_dir
+    client = app.test_client()
+    try:
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get('/api/materials')
+            body = response.get_data()
+            durations.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/materials 返回 {response.status_code}: {body[:200]!r}")
+        peak = 0
+        if memory_sample:
+            tracemalloc.start()
+            client.get('/api/materials').get_data()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    finally:
+        app.config['JSON_DATA_DIR'] = previous
+    stats = _stats(durations, peak, items=count * repeat)
+    stats['response_bytes'] = len(body)
+    return stats
+
+def load_results(path=DEFAULT_RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_result(record, path=DEFAULT_RESULTS_PATH):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+def print_results(record, baseline=None):
+    """打印各阶段的结果；指定 baseline 时同时列出与其相比 p50 和吞吐量的变化"""
+    print(f"\n{'阶段':<20}{'次数':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'吞吐量(/s)':>12}{'峰值内存(MB)':>14}"
+          + (f"{'p50变化':>10}{'吞吐量变化':>12}" if baseline else ''))
+    for stage, stats in record['stages'].items():
+        line = (f"{stage:<20}{stats['count']:>8}{stats['p50'] * 1000:>10.3f}{stats['p95'] * 1000:>10.3f}"
+                f"{stats['p99'] * 1000:>10.3f}{stats['throughput']:>12.1f}{stats['peak_mb']:>14.2f}")
+        previous = (baseline or {}).get('stages', {}).get(stage)
+        if previous:
+            line += (f"{_change(stats['p50'], previous['p50']):>10}"
+                     f"{_change(stats['throughput'], previous['throughput']):>12}")
+        print(line)
+    if baseline:
+        print(f"对比的基准: {baseline['ts']} ({baseline.get('label') or baseline.get('commit') or '-'})")
+
+def _change(current, previous):
+    if not previous:
+        return '-'
+    return f"{(current - previous) / previous * 100:+.1f}%"
+
+def find_baseline(history, params, baseline=None):
+    """在历史结果中找到对比的基准：指定标签或提交时取最近一次匹配的运行，否则取参数相同的上一次运行"""
+    for record in reversed(history):
+        if baseline is not None:
+            if baseline in (record.get('label'), record.get('commit')):
+                return record
+        elif record['params'] == params:
+            return record
+    return None
+
+def print_history(history, stage=None):
+    """按时间顺序列出历史运行中各阶段的吞吐量"""
+    stages = [stage] if stage else list(dict.fromkeys(s for record in history for s in record['stages']))
+    print(f"{'时间':<22}{'提交':<10}{'标签':<16}{'数量':>8}" + ''.join(f"{s:>20}" for s in stages))
+    for record in history:
+        throughput = ''.join(
+            f"{record['stages'][s]['throughput']:>20.1f}" if s in record['stages'] else f"{'-':>20}" for s in stages)
+        print(f"{record['ts']:<22}{record.get('commit') or '-':<10}{record.get('label') or '-':<16}"
+              f"{record['params']['count']:>8}{throughput}")
+
+def main():
+    parser = argparse.ArgumentParser(description='数据处理各阶段的基准测试')
+    parser.add_argument('-n', '--count', type=int, default=1000, help='生成的页面和JSON文档数量（默认1000）')
+    parser.add_argument('--size', type=int, default=1, help='页面大小，各表格的行数按倍数增加（默认1）')
+    parser.add_argument('--seed', type=int, default=0, help='生成数据的随机种子')
+    parser.add_argument('--stages', type=str, nargs='+', choices=STAGES, default=None, help='要运行的阶段，默认全部')
+    parser.add_argument('--engines', type=str, nargs='+', choices=sorted(CLEANERS), default=None,
+                        help='clean 阶段比较的清理引擎，默认全部')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟的模型每次请求的延迟（秒，默认0）')
+    parser.add_argument('--memory-sample', type=int, default=50,
+                        help='统计峰值内存时使用的输入数量（默认50，0 表示不统计）')
+    parser.add_argument('--api-repeat', type=int, default=3, help='接口请求的次数（默认3）')
+    parser.add_argument('--label', type=str, default=None, help='本次运行的标签，便于之后对比')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='对比的基准运行（标签或提交），默认为参数相同的上一次运行')
+    parser.add_argument('--results', type=str, default=DEFAULT_RESULTS_PATH, help='结果文件路径')
+    parser.add_argument('--no-save', action='store_true', help='不保存本次结果')
+    parser.add_argument('--history', action='store_true', help='只列出历史运行的吞吐量')
+    parser.add_argument('--generate', type=str, default=None,
+                        help='只在指定目录下生成页面（html_store）和JSON（JsonData），不运行基准测试')
+    args = parser.parse_args()
+
+    if args.generate:
+        start = time.perf_counter()
+        generate_dataset(args.generate, args.count, args.size, args.seed)
+        print(f"已生成 {args.count} 个页面和JSON文档: {args.generate}，耗时 {time.perf_counter() - start:.1f}s")
+        return
+    history = load_results(args.results)
+    if args.history:
+        print_history(history, args.stages[0] if args.stages and len(args.stages) == 1 else None)
+        return
+
+    params = {'count': args.count, 'size': args.size, 'seed': args.seed, 'latency': args.latency}
+    stages = run_benchmark(args.count, args.size, args.seed, args.stages, args.engines, args.latency,
+                           args.memory_sample, args.api_repeat)
+    record = {
+        'ts': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'label': args.label,
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': params,
+        'stages': stages,
+    }
+    print_results(record, find_baseline(history, params, args.baseline))
+    if not args.no_save:
+        save_result(record, args.results)
+        print(f"结果已追加到: {args.results}")
+
+if __name__ == "__main__":
+    main()
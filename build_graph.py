@@ -0,0 +1,91 @@
+import os
+from html_cleaner import cleaner_version, load_manifest
+from html_store import HtmlStore, content_hash
+
+# 数据目录之间的依赖关系：
+#   data/html_store（原始页面）--清理--> data/clean_html_data --提取--> data/JsonData
+# 每个产物在清单中记录其输入的内容哈希和生成它的阶段版本（清理规则版本/提取版本），
+# 输入或版本不一致、产物缺失时需要重新生成。清理结果的内容没有变化时下游的JSON不需要重新生成。
+
+def clean_reason(manifest, material, file, digest, cleaner, clean_dir):
+    """返回清理结果需要重新生成的原因，无需重新生成时返回None"""
+    entry = manifest.get(f"{material}/{file}")
+    if entry is None:
+        return '新页面'
+    if entry['input_hash'] != digest:
+        return '原始内容变化'
+    if entry['cleaner'] != cleaner:
+        return '清理规则变化'
+    if not os.path.exists(os.path.join(clean_dir, material, file)):
+        return '输出缺失'
+    return None
+
+def json_key(material, file):
+    """JSON清单中的键：材料/文件名.json"""
+    return f"{material}/{os.path.splitext(file)[0]}.json"
+
+def json_reason(manifest, material, file, input_hash, extractor, json_dir):
+    """返回JSON需要重新生成的原因，input_hash 为清理后HTML的内容哈希，无需重新生成时返回None"""
+    key = json_key(material, file)
+    entry = manifest.get(key)
+    if entry is None:
+        return '新页面'
+    if entry['input_hash'] != input_hash:
+        return '清理结果变化'
+    if entry['extractor'] != extractor:
+        return '提取版本变化'
+    if not os.path.exists(os.path.join(json_dir, key)):
+        return '输出缺失'
+    return None
+
+def record_json(manifest, material, file, input_hash, extractor):
+    """JSON生成成功后更新清单"""
+    manifest[json_key(material, file)] = {'input_hash': input_hash, 'extractor': extractor}
+
+def clean_output_hash(clean_manifest, material, file, clean_dir):
+    """清理结果的内容哈希，清单中没有记录时读取文件计算"""
+    entry = clean_manifest.get(f"{material}/{file}") or {}
+    if entry.get('output_hash'):
+        return entry['output_hash']
+    with open(os.path.join(clean_dir, material, file), 'r', encoding='utf-8') as f:
+        return content_hash(f.read())
+
+def plan(data_dir, clean_dir, json_dir, engine, extractor, material_name=None, filename=None):
+    """列出需要重新生成的产物
+
+    Returns:
+        list: [{'material', 'file', 'clean': 原因或None, 'json': 原因或None}, ...]，
+        清理结果需要重新生成时 json 为 '待清理'，实际是否重新提取取决于清理结果是否变化
+    """
+    store = HtmlStore(os.path.join(data_dir, 'html_store'))
+    pages = store.list_pages(material_name)
+    store.close()
+    clean_manifest = load_manifest(clean_dir)
+    json_manifest = load_manifest(json_dir)
+    cleaner = cleaner_version(engine)
+
+    targets = []
+    for material, file, digest, _ in pages:
+        if filename and not file.startswith(filename):
+            continue
+        reason = clean_reason(clean_manifest, material, file, digest, cleaner, clean_dir)
+        if reason is not None:
+            targets.append({'material': material, 'file': file, 'clean': reason, 'json': '待清理'})
+            continue
+        input_hash = clean_output_hash(clean_manifest, material, file, clean_dir)
+        reason = json_reason(json_manifest, material, file, input_hash, extractor, json_dir)
+        if reason is not None:
+            targets.append({'material': material, 'file': file, 'clean': None, 'json': reason})
+    return targets
+
+def print_plan(targets):
+    """打印需要重新生成的产物及原因"""
+    if not targets:
+        print("所有产物都是最新的")
+        return
+    print(f"{'文件':<48}{'清理':<12}{'JSON':<12}")
+    for target in targets:
+        print(f"{target['material'] + '/' + target['file']:<48}{target['clean'] or '-':<12}{target['json'] or '-':<12}")
+    cleans = sum(1 for target in targets if target['clean'])
+    print(f"\n需要重新清理 {cleans} 个文件，需要重新提取JSON {len(targets) - cleans} 个文件，"
+          f"另有 {cleans} 个文件的JSON视清理结果是否变化决定")
@@ -0,0 +1,151 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# 默认的爬取状态数据库
+DEFAULT_STATE_PATH = 'data/crawl_state.db'
+
+def parse_age(text: str) -> float:
+    """将 30m / 12h / 7d / 2w 或纯数字（秒）形式的时长转换为秒数"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*', text.lower())
+    if not match:
+        raise ValueError(f"无法识别的时长: {text}")
+    value, unit = match.groups()
+    factor = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}[unit]
+    return float(value) * factor
+
+class CrawlState:
+    """持久化的爬取进度，记录每个材料访问过的搜索页、找到的详情链接以及已保存的页面
+
+    材料和标准共同作为键，未指定标准时使用空字符串。所有方法都是线程安全的。
+
+    Args:
+        path: SQLite数据库路径
+        refresh_older_than: 早于该秒数的记录视为过期并重新爬取，None表示记录永不过期。
+            时长从创建时算起，本次运行中写入的记录不会过期
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH, refresh_older_than=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.refresh_older_than = refresh_older_than
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS materials (
+                material TEXT NOT NULL,
+                standard TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (material, standard)
+            );
+            CREATE TABLE IF NOT EXISTS search_pages (
+                material TEXT NOT NULL,
+                standard TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                row_count INTEGER NOT NULL,
+                visited_at REAL NOT NULL,
+                PRIMARY KEY (material, standard, page)
+            );
+            CREATE TABLE IF NOT EXISTS detail_urls (
+                material TEXT NOT NULL,
+                standard TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                name TEXT NOT NULL,
+                row_standard TEXT NOT NULL,
+                found_at REAL NOT NULL,
+                saved_at REAL,
+                PRIMARY KEY (material, standard, url)
+            );
+        ''')
+        self._conn.commit()
+
+    def cutoff(self):
+        """早于该时间点（时间戳）的记录视为过期，记录永不过期时返回负无穷"""
+        if self.refresh_older_than is None:
+            return float('-inf')
+        return self.started_at - self.refresh_older_than
+
+    def material_status(self, material, standard=None):
+        """返回未过期的材料状态（found/not_found），未完成或已过期时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status, updated_at FROM materials WHERE material = ? AND standard = ?',
+                (material, standard or '')
+            ).fetchone()
+        if row is None or row[1] < self.cutoff():
+            return None
+        return row[0]
+
+    def get_page(self, material, standard, page):
+        """返回已访问且未过期的搜索页记录 {'row_count', 'matches'}，否则返回None
+
+        matches 为该页中匹配的详情链接列表 [(名称, 详情链接, 标准), ...]
+        """
+        key = (material, standard or '', page)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT row_count, visited_at FROM search_pages WHERE material = ? AND standard = ? AND page = ?',
+                key
+            ).fetchone()
+            if row is None or row[1] < self.cutoff():
+                return None
+            matches = self._conn.execute(
+                'SELECT name, url, row_standard FROM detail_urls '
+                'WHERE material = ? AND standard = ? AND page = ? ORDER BY rowid',
+                key
+            ).fetchall()
+        return {'row_count': row[0], 'matches': [tuple(m) for m in matches]}
+
+    def record_page(self, material, standard, page, row_count, matches):
+        """记录一次搜索页访问及其中匹配的详情链接"""
+        now = time.time()
+        standard = standard or ''
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO search_pages VALUES (?, ?, ?, ?, ?)',
+                (material, standard, page, row_count, now)
+            )
+            for name, url, row_standard in matches:
+                # 重新发现的链接保留原有的保存时间
+                self._conn.execute(
+                    'INSERT INTO detail_urls VALUES (?, ?, ?, ?, ?, ?, ?, NULL) '
+                    'ON CONFLICT (material, standard, url) DO UPDATE SET '
+                    'page = excluded.page, name = excluded.name, row_standard = excluded.row_standard, '
+                    'found_at = excluded.found_at',
+                    (material, standard, page, url, name, row_standard, now)
+                )
+
+    def is_saved(self, material, standard, url):
+        """详情页是否已保存且未过期"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT saved_at FROM detail_urls WHERE material = ? AND standard = ? AND url = ?',
+                (material, standard or '', url)
+            ).fetchone()
+        return row is not None and row[0] is not None and row[0] >= self.cutoff()
+
+    def mark_saved(self, material, standard, url):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE detail_urls SET saved_at = ? WHERE material = ? AND standard = ? AND url = ?',
+                (time.time(), material, standard or '', url)
+            )
+
+    def mark_material_done(self, material, standard, status):
+        """标记材料已处理完成，status 为 found 或 not_found"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO materials VALUES (?, ?, ?, ?)',
+                (material, standard or '', status, time.time())
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -3,17 +3,131 @@ from dotenv import load_dotenv
 from openai import OpenAI
 from bs4 import BeautifulSoup
 from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import argparse
+import random
+import threading
 import time
 import json
+import re
+import hashlib
+import openai
+from datetime import datetime
+from build_graph import json_reason, record_json
+from html_cleaner import load_manifest, save_manifest
+from html_store import content_hash
+from llm_cache import LlmCache, cache_key
+from material_schema import SchemaDivergence, SectionStream, validate
+from metrics import percentile
+from table_parser import SECTIONS, compact_page, missing_text, parse_material_page, split_sections
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken 为可选依赖，未安装时按字符数估算token
+    tiktoken = None
 # 加载环境变量
 load_dotenv()
 
-# 初始化OpenAI客户端
-client = OpenAI(
-    api_key=os.getenv('OPENAI_API_KEY'),
-    base_url=os.getenv('OPENAI_BASE_URL')
-)
+# 可以重试的API错误：限流、超时、连接失败和服务端错误
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                    openai.InternalServerError)
+
+# OpenAI客户端在第一次调用模型时创建，只用规则解析时不需要API密钥
+client = None
+_client_lock = threading.Lock()
+
+def get_client() -> OpenAI:
+    global client
+    with _client_lock:
+        if client is None:
+            # 重试由 call_openai_api 负责，客户端自身不再重试
+            client = OpenAI(
+                api_key=os.getenv('OPENAI_API_KEY'),
+                base_url=os.getenv('OPENAI_BASE_URL'),
+                timeout=float(os.getenv('OPENAI_TIMEOUT', 120)),
+                max_retries=0,
+            )
+    return client
+
+class AdaptiveLimiter:
+    """模型请求的自适应并发限制，可在多个线程间共享
+
+    遇到限流或超时时并发数减半，并让所有线程暂停一段时间；
+    连续成功 increase_after 次后并发数加一，直到恢复为 max_concurrency。
+
+    Args:
+        max_concurrency: 最大并发请求数
+        increase_after: 并发数加一所需的连续成功次数
+    """
+
+    def __init__(self, max_concurrency=4, increase_after=5):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.increase_after = increase_after
+        self.active = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttles = 0
+        self._successes = 0
+        self._resume_at = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """等待到并发数未满且不在退避期内"""
+        with self._cond:
+            while True:
+                wait = self._resume_at - time.monotonic()
+                if wait <= 0 and self.active < self.limit:
+                    break
+                self._cond.wait(timeout=wait if wait > 0 else None)
+            self.active += 1
+            self.requests += 1
+
+    def release(self, success=True):
+        with self._cond:
+            self.active -= 1
+            if success:
+                self._successes += 1
+                if self._successes >= self.increase_after and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def record_retry(self):
+        """记录一次只影响当前线程的重试（如输出格式错误），不暂停其他线程也不降低并发数"""
+        with self._cond:
+            self.retries += 1
+            self._successes = 0
+
+    def backoff(self, delay):
+        """限流或超时后暂停所有线程 delay 秒，同时降低并发数"""
+        with self._cond:
+            self.retries += 1
+            self._successes = 0
+            self.throttles += 1
+            # 退避期内收到的失败来自退避前发出的请求，只减半一次
+            if time.monotonic() >= self._resume_at:
+                self.limit = max(1, self.limit // 2)
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+            self._cond.notify_all()
+
+    def report(self):
+        print(f"模型请求: {self.requests} 次, 重试 {self.retries} 次, 限流/超时 {self.throttles} 次, "
+              f"结束时并发数 {self.limit}/{self.max_concurrency}")
+
+def _retry_delay(error, attempt, base_delay=2.0, max_delay=60.0):
+    """指数退避加随机抖动；服务端返回 Retry-After 时以其为下限"""
+    delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get('retry-after', 0)))
+        except ValueError:
+            pass
+    return delay
+
+# 未指定限制器时串行调用模型
+_default_limiter = AdaptiveLimiter(1)
 
 def read_html_content(file_path: str) -> str:
     """读取HTML文件内容"""
@@ -21,15 +135,10 @@ def read_html_content(file_path: str) -> str:
         return f.read()
 
 
-def call_openai_api(text: str) -> Dict:
-    """调用OpenAI API生成JSON数据"""
-    try:
-        response = client.chat.completions.create(
-            model="grok-beta",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """你是一个金属材料学数据提取专家。请从提供的html网页中中提取以下信息并以JSON格式返回:
+# 模型名称、温度和系统提示词，三者都参与模型响应缓存的键
+MODEL = "grok-beta"
+TEMPERATURE = 0.9
+SYSTEM_PROMPT = """你是一个金属材料学数据提取专家。请从提供的html网页中中提取以下信息并以JSON格式返回:
                     {
                         "Material": {
                             "Name": "18CrMo4",
@@ -208,18 +317,293 @@ def call_openai_api(text: str) -> Dict:
                         1. MechanicalProperties和PhysicalProperties中的数据请根据实际情况生成,如果网页中没有相关数据请仅生成一个空数组。
                         2. 确保返回的JSON数据格式正确，不要包含任何注释以及markdown格式
                         """
-                },
-                {
-                    "role": "user",
-                    "content": text
-                }
-            ],
-            temperature=0.9,
-        )
-        return json.loads(clean_json_string(response.choices[0].message.content)) 
-    except Exception as e:
-        print(f"API调用出错: {str(e)}")
-        return None
+
+# 精简提示词：输入为 compact_page 生成的文本，输出结构与 SYSTEM_PROMPT 的示例相同
+COMPACT_SYSTEM_PROMPT = """你是一个金属材料学数据提取专家。输入是材料详情页的精简文本：表格每行为 | 分隔的单元格（第一行通常为表头），基本信息为“键: 值”。请按以下结构提取并以JSON格式返回:
+{"Material":{"Name":"18CrMo4","OldName":"18CD4","OtherNames":["1.7243"],"Category":"合金钢","Density":"7.85 g/cm³","BelongsToStandard":{"StandardCode":"NF EN 10084-2008","Description":"表面硬化结构钢"},"AllStandards":[{"StandardCode":"NF EN 10084-2008","Description":"表面硬化结构钢"}],"Description":"一句话介绍材料的类型和用途"},
+"ChemicalComposition":{"Elements":{"C":{"Min":"0.15","Max":"0.21"},"Si":{"Min":"-","Max":"0.4"}},"Notes":[]},
+"MechanicalProperties":{"Conditions":[{"Property":"抗拉强度","Condition":"室温","Value":"≥500 MPa"}],"HeatTreatment":[{"Process":"淬火","TemperatureRange":"860~900°C","CoolingMethod":"油冷"}],"Notes":[]},
+"PhysicalProperties":{"Properties":[{"Property":"热导率","Condition":"20°C","Value":"36 W/(m·K)"}]},
+"SimilarGrades":[{"Field":"合金结构钢","Mappings":[{"Standard":"JIS","Grades":["SCM418"]}]}]}
+注意:
+1. AllStandards 列出页面中的所有标准；Elements 必须包含 Fe、C、Si、Mn、Cr、Ni、Mo、V、Cu、N、P、S、Mg、Zn、Al、W、Ti，页面中没有的元素 Min 和 Max 都填 "-"，≤x 表示 Max 为 x，≥x 表示 Min 为 x
+2. MechanicalProperties和PhysicalProperties中的数据请根据实际情况生成,如果网页中没有相关数据请仅生成一个空数组。
+3. 确保返回的JSON数据格式正确，不要包含任何注释以及markdown格式"""
+
+# 提示词方案：名称 -> (系统提示词, 将清理后的HTML转换为用户消息的函数)
+PROMPTS = {
+    'full': (SYSTEM_PROMPT, lambda html: html),
+    'compact': (COMPACT_SYSTEM_PROMPT, compact_page),
+}
+
+# 按部分提取时各部分的 (说明, 输出示例, 注意事项)
+_SECTION_SPECS = {
+    'Material': (
+        '基本信息和标准',
+        '{"Material":{"Name":"18CrMo4","OldName":"18CD4","OtherNames":["1.7243"],"Category":"合金钢","Density":"7.85 g/cm³","BelongsToStandard":{"StandardCode":"NF EN 10084-2008","Description":"表面硬化结构钢"},"AllStandards":[{"StandardCode":"NF EN 10084-2008","Description":"表面硬化结构钢"}],"Description":"一句话介绍材料的类型和用途"}}',
+        'AllStandards 列出页面中的所有标准',
+    ),
+    'ChemicalComposition': (
+        '化学成分',
+        '{"ChemicalComposition":{"Elements":{"C":{"Min":"0.15","Max":"0.21"},"Si":{"Min":"-","Max":"0.4"}},"Notes":[]}}',
+        'Elements 必须包含 Fe、C、Si、Mn、Cr、Ni、Mo、V、Cu、N、P、S、Mg、Zn、Al、W、Ti，页面中没有的元素 Min 和 Max 都填 "-"，≤x 表示 Max 为 x，≥x 表示 Min 为 x',
+    ),
+    'MechanicalProperties': (
+        '力学性能和热处理',
+        '{"MechanicalProperties":{"Conditions":[{"Property":"抗拉强度","Condition":"室温","Value":"≥500 MPa"}],"HeatTreatment":[{"Process":"淬火","TemperatureRange":"860~900°C","CoolingMethod":"油冷"}],"Notes":[]}}',
+        '如果没有相关数据，Conditions 和 HeatTreatment 为空数组',
+    ),
+    'PhysicalProperties': (
+        '物理性能',
+        '{"PhysicalProperties":{"Properties":[{"Property":"热导率","Condition":"20°C","Value":"36 W/(m·K)"}]}}',
+        '如果没有相关数据，Properties 为空数组',
+    ),
+    'SimilarGrades': (
+        '相近牌号',
+        '{"SimilarGrades":[{"Field":"合金结构钢","Mappings":[{"Standard":"JIS","Grades":["SCM418"]}]}]}',
+        '如果没有相关数据，返回空数组',
+    ),
+}
+
+# 按部分提取时每个部分使用的系统提示词
+SECTION_PROMPTS = {
+    section: f"""你是一个金属材料学数据提取专家。输入是材料详情页中{title}部分的精简文本：表格每行为 | 分隔的单元格（第一行通常为表头），基本信息为“键: 值”。请只提取该部分并以JSON格式返回:
+{example}
+注意:
+1. {note}
+2. 确保返回的JSON数据格式正确，不要包含任何注释以及markdown格式"""
+    for section, (title, example, note) in _SECTION_SPECS.items()
+}
+
+def count_tokens(text: str) -> int:
+    """统计token数；未安装 tiktoken 时中文按每字1个、其他字符按每4个1个估算"""
+    if tiktoken is not None:
+        return len(tiktoken.get_encoding('cl100k_base').encode(text))
+    cjk = len(re.findall(r'[\u2e80-\u9fff\uff00-\uffef]', text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def chat_request_body(text: str, system_prompt: str = SYSTEM_PROMPT, temperature: float = None) -> Dict:
+    """对话补全的请求参数，同步调用和批处理共用；temperature 为None时使用 TEMPERATURE"""
+    return {
+        'model': MODEL,
+        'messages': [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": text}
+        ],
+        'temperature': TEMPERATURE if temperature is None else temperature,
+    }
+
+class StreamStats:
+    """流式提取的统计，可在多个线程间共享"""
+
+    def __init__(self):
+        self.first_section = []
+        self.early_aborts = 0
+        self.aborted_chars = 0
+        self.retries_avoided = 0
+        self._lock = threading.Lock()
+
+    def record_first_section(self, elapsed):
+        with self._lock:
+            self.first_section.append(elapsed)
+
+    def record_abort(self, chars):
+        with self._lock:
+            self.early_aborts += 1
+            self.aborted_chars += chars
+
+    def record_avoided(self):
+        with self._lock:
+            self.retries_avoided += 1
+
+    def report(self):
+        if not self.first_section and not self.early_aborts:
+            return
+        print(f"流式输出: 首个有效部分耗时 p50 {percentile(self.first_section, 50):.2f} 秒, "
+              f"p95 {percentile(self.first_section, 95):.2f} 秒；提前中止 {self.early_aborts} 次"
+              f"（平均在第 {self.aborted_chars // max(1, self.early_aborts)} 个字符处中止）；"
+              f"不需要的部分格式错误而免于重试 {self.retries_avoided} 次")
+
+# 所有流式请求共用的统计
+stream_stats = StreamStats()
+
+class RequestUsage:
+    """单个文件的模型请求统计，按部分并行请求时多个线程共用
+
+    token数按 count_tokens 估算，输入包括系统提示词，输出只统计完整接收的输出。
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {'requests': self.requests, 'retries': self.retries, 'cache_hits': self.cache_hits,
+                    'tokens_in': self.tokens_in, 'tokens_out': self.tokens_out}
+
+def stream_completion(text: str, system_prompt: str = SYSTEM_PROMPT, needed: List[str] = None,
+                      expected: List[str] = None, temperature: float = None):
+    """流式请求模型，每个顶层部分接收完成后立即按JSON Schema校验
+
+    expected 为输出中应包含的部分（默认为全部部分），needed 为其中需要的部分（默认与 expected 相同）。
+    需要的部分偏离格式时立即中止接收并抛出 SchemaDivergence；不需要的部分出错时忽略。
+    返回 (原始输出, 通过校验的部分, 输出是否完整有效)。
+    """
+    start = time.perf_counter()
+    expected = expected or SECTIONS
+    needed = needed or expected
+    parser = SectionStream()
+    result = {}
+    ignored = []
+
+    def accept_partial(reason):
+        # 需要的部分都已通过校验时使用已有结果，不再重试
+        missing = [section for section in needed if section not in result]
+        if missing:
+            stream_stats.record_abort(len(parser.text))
+            raise SchemaDivergence(f"{reason}，缺少 {', '.join(missing)}")
+        stream_stats.record_avoided()
+
+    stream = get_client().chat.completions.create(**chat_request_body(text, system_prompt, temperature), stream=True)
+    try:
+        for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            try:
+                completed = parser.feed(chunk.choices[0].delta.content)
+            except SchemaDivergence as e:
+                accept_partial(str(e))
+                return parser.text, result, False
+            for section, value, errors in completed:
+                if errors:
+                    if section in needed:
+                        stream_stats.record_abort(len(parser.text))
+                        raise SchemaDivergence(f"{section} 不符合格式: {errors[0]}", section)
+                    ignored.append(section)
+                    continue
+                if not result:
+                    stream_stats.record_first_section(time.perf_counter() - start)
+                result[section] = value
+    finally:
+        stream.close()
+
+    if not parser.done:
+        accept_partial("输出不完整")
+        return parser.text, result, False
+    # 各部分已在接收时逐个校验，这里只检查是否缺少部分
+    missing = [section for section in expected if section not in result]
+    if missing:
+        accept_partial(f"缺少 {', '.join(missing)}")
+    elif ignored:
+        stream_stats.record_avoided()
+    return parser.text, result, not missing and not ignored
+
+def call_openai_api(text: str, limiter: AdaptiveLimiter = None, max_retries: int = 3,
+                    cache: LlmCache = None, prompt: str = 'full', needed: List[str] = None,
+                    usage: RequestUsage = None, temperature: float = None) -> Dict:
+    """调用OpenAI API生成JSON数据
+
+    prompt 选择 PROMPTS 中的提示词方案，compact 方案先将页面转换为精简文本再发送；
+    sections 方案按部分拆分页面并行请求，见 extract_sections。
+    needed 为需要的部分，只有这些部分偏离格式时才重试，见 stream_completion。
+    指定 cache 时先查询缓存，内容、提示词、模型和温度都相同的页面直接返回缓存结果；
+    只有完整且通过校验的输出才会写入缓存。
+    限流、超时、连接错误和偏离格式的输出会退避后重试，
+    超过 max_retries 次后抛出最后一次的异常。指定 usage 时累计请求次数、重试次数和token数。
+    temperature 为None时使用 TEMPERATURE。
+    """
+    if prompt == 'sections':
+        return extract_sections(text, needed, limiter, max_retries, cache, usage, temperature)
+    system_prompt, encode = PROMPTS[prompt]
+    return _cached_request(encode(text), system_prompt, limiter, max_retries, cache, needed,
+                           usage=usage, temperature=temperature)
+
+def _cached_request(text: str, system_prompt: str, limiter: AdaptiveLimiter = None, max_retries: int = 3,
+                    cache: LlmCache = None, needed: List[str] = None, expected: List[str] = None,
+                    usage: RequestUsage = None, temperature: float = None) -> Dict:
+    """查询缓存，未命中时请求模型并在输出完整有效时写入缓存"""
+    if cache is None:
+        return _request_json(text, system_prompt, limiter, max_retries, needed, expected, usage, temperature)[1]
+    key = cache_key(text, system_prompt, MODEL, TEMPERATURE if temperature is None else temperature)
+    with cache.lock_for(key):
+        cached = cache.get(key)
+        if cached is not None:
+            if usage is not None:
+                usage.add(cache_hits=1)
+            return cached[1]
+        raw, result, complete = _request_json(text, system_prompt, limiter, max_retries, needed, expected, usage,
+                                              temperature)
+        if complete:
+            cache.put(key, MODEL, raw, result)
+    return result
+
+def extract_sections(text: str, needed: List[str] = None, limiter: AdaptiveLimiter = None, max_retries: int = 3,
+                     cache: LlmCache = None, usage: RequestUsage = None, temperature: float = None) -> Dict:
+    """按部分拆分页面，每个部分使用各自的小提示词并行请求模型，合并为完整的JSON
+
+    每个请求只发送该部分的精简文本，页面中找不到的部分发送整页的精简文本。
+    整页的耗时取决于最慢的部分，而不是所有部分之和。
+    """
+    needed = needed or SECTIONS
+    parts = split_sections(text)
+    page = None
+    requests = {}
+    for section in needed:
+        if section not in parts and page is None:
+            page = compact_page(text)
+        requests[section] = parts.get(section, page)
+
+    def extract(section):
+        return _cached_request(requests[section], SECTION_PROMPTS[section], limiter, max_retries, cache,
+                               needed=[section], expected=[section], usage=usage, temperature=temperature)[section]
+
+    with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+        futures = {section: executor.submit(extract, section) for section in requests}
+        return {section: future.result() for section, future in futures.items()}
+
+def _request_json(text: str, system_prompt: str, limiter: AdaptiveLimiter = None, max_retries: int = 3,
+                  needed: List[str] = None, expected: List[str] = None, usage: RequestUsage = None,
+                  temperature: float = None):
+    """带重试地请求模型，返回 (原始输出, 解析后的JSON, 输出是否完整有效)"""
+    limiter = limiter or _default_limiter
+    tokens_in = count_tokens(system_prompt) + count_tokens(text) if usage is not None else 0
+    for attempt in range(max_retries + 1):
+        if usage is not None:
+            usage.add(requests=1, retries=1 if attempt else 0, tokens_in=tokens_in)
+        limiter.acquire()
+        try:
+            raw, result, complete = stream_completion(text, system_prompt, needed, expected, temperature)
+        except (RETRYABLE_ERRORS + (ValueError,)) as e:
+            limiter.release(success=False)
+            if attempt == max_retries:
+                raise
+            invalid_output = isinstance(e, ValueError)
+            delay = _retry_delay(e, attempt, base_delay=0.5 if invalid_output else 2.0)
+            print(f"API调用出错: {type(e).__name__}: {e}，{delay:.1f} 秒后重试（第 {attempt + 1} 次）")
+            if invalid_output:
+                # 输出偏离格式只与这次请求有关，只在当前线程等待，不暂停其他线程也不降低并发
+                limiter.record_retry()
+                time.sleep(delay)
+            else:
+                limiter.backoff(delay)
+            continue
+        except Exception:
+            limiter.release(success=False)
+            raise
+        limiter.release()
+        if usage is not None:
+            usage.add(tokens_out=count_tokens(raw))
+        return raw, result, complete
 
 def clean_json_string(json_string: str) -> str:
     """清理API返回的JSON字符串"""
@@ -230,13 +614,99 @@ def clean_json_string(json_string: str) -> str:
         json_string = json_string[:-4]
     return json_string
 
-def process_folder(base_path: str, output_base_path: str, material_name: str = None, filename: str = None):
-    """处理文件夹中的所有HTML文件，每个文件单独生成对应的JSON
-    Args:
-        base_path: 输入文件夹路径
-        output_base_path: 输出文件夹路径
-        material_name: 指定要处理的材料名称，默认为None处理所有材料
-        filename: 指定要处理的文件名，默认为None处理所有文件
+# 提取代码的版本号，修改规则解析、精简文本或合并逻辑后需要递增，已有的JSON会在下次构建时重新生成
+# 2: 规则解析只在某部分的所有表格都解析成功时才记为 parser（原先力学性能只解析出热处理表也算）
+EXTRACTOR_VERSION = '2'
+
+def extractor_version(mode: str = 'auto', prompt: str = 'full') -> str:
+    """JSON提取阶段的版本，会调用模型时包含模型名称、温度和提示词内容的哈希，修改提示词后JSON随之失效"""
+    if mode == 'parser':
+        return f"parser-{EXTRACTOR_VERSION}"
+    prompts = [SECTION_PROMPTS[section] for section in SECTIONS] if prompt == 'sections' else [PROMPTS[prompt][0]]
+    digest = hashlib.sha256('\0'.join([MODEL, repr(TEMPERATURE)] + prompts).encode('utf-8')).hexdigest()
+    return f"{mode}-{prompt}-{EXTRACTOR_VERSION}-{digest[:12]}"
+
+def extract_material(text: str, mode: str = 'auto', limiter: AdaptiveLimiter = None,
+                     cache: LlmCache = None, prompt: str = 'full', usage: RequestUsage = None) -> Dict:
+    """从清理后的HTML中提取材料数据
+
+    auto 模式先用规则解析表格，只把解析没有把握的部分交给模型；
+    parser 模式不调用模型，无法解析的部分留空；llm 模式全部交给模型。
+    结果中的 ExtractionSource 记录每个部分的来源（parser/llm/none）。
+    """
+    data, sources = parse_sections(text, mode)
+    llm_data = None
+    if needs_llm(sources, mode):
+        needed = [section for section in SECTIONS if sources[section] is None]
+        llm_data = call_openai_api(text, limiter, cache=cache, prompt=prompt, needed=needed, usage=usage)
+    return merge_result(data, sources, llm_data)
+
+def parse_sections(text: str, mode: str = 'auto'):
+    """规则解析各部分，返回 (数据, 来源)；llm 模式下所有部分都留给模型"""
+    if mode == 'llm':
+        return {}, {section: None for section in SECTIONS}
+    return parse_material_page(text)
+
+def needs_llm(sources: Dict, mode: str = 'auto') -> bool:
+    return mode != 'parser' and any(source is None for source in sources.values())
+
+def merge_result(data: Dict, sources: Dict, llm_data: Dict = None) -> Dict:
+    """用模型输出补全规则解析没有把握的部分，生成最终的JSON"""
+    if llm_data:
+        for section in SECTIONS:
+            if sources[section] is None and section in llm_data:
+                data[section] = llm_data[section]
+                sources[section] = 'llm'
+    result = {section: data[section] for section in SECTIONS if section in data}
+    result['ExtractionSource'] = {section: sources[section] or 'none' for section in SECTIONS}
+    return result
+
+def check_result(json_data: Dict, mode: str = 'auto'):
+    """按JSON Schema校验最终输出；parser 模式允许缺少无法解析的部分"""
+    errors = validate(json_data)
+    if mode == 'parser':
+        errors = [error for error in errors if not error.startswith('$: 缺少')]
+    if errors:
+        raise SchemaDivergence(f"输出不符合格式: {errors[0]}")
+
+def save_json(json_path: str, json_data: Dict):
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(json_data, f, ensure_ascii=False, indent=2)
+    print(f"已保存: {json_path}")
+
+def process_file(file_path: str, json_path: str, mode: str = 'auto', limiter: AdaptiveLimiter = None,
+                 cache: LlmCache = None, prompt: str = 'full', html: str = None) -> Dict:
+    """转换单个HTML文件，返回该文件的处理记录；已有清理后的内容时通过 html 传入，不再读取文件
+
+    记录中的 usage 为该文件的模型请求统计，见 RequestUsage；失败时 error_type 为异常类型。
+    """
+    start = time.perf_counter()
+    record = {'file': file_path, 'status': 'ok', 'error': None, 'sources': {}}
+    usage = RequestUsage()
+    try:
+        if html is None:
+            html = read_html_content(file_path)
+        json_data = extract_material(html, mode, limiter, cache, prompt, usage)
+        check_result(json_data, mode)
+        save_json(json_path, json_data)
+        record['sources'] = json_data['ExtractionSource']
+        record['input_hash'] = content_hash(html)
+        record['extractor'] = extractor_version(mode, prompt)
+    except Exception as e:
+        record['status'] = 'failed'
+        record['error'] = f"{type(e).__name__}: {e}"
+        record['error_type'] = type(e).__name__
+        print(f"处理文件 {os.path.basename(file_path)} 时出错: {record['error']}")
+    record['usage'] = usage.as_dict()
+    record['elapsed'] = time.perf_counter() - start
+    return record
+
+def collect_files(base_path: str, output_base_path: str = None, material_name: str = None, filename: str = None,
+                  manifest: Dict = None, extractor: str = None):
+    """列出待转换的文件，返回 [(HTML路径, JSON路径), ...]，同时创建输出文件夹
+
+    output_base_path 为None时只列出HTML文件（JSON路径为None），不创建任何目录。
+    指定 manifest（JSON清单）时跳过清理结果和提取版本都没有变化的文件，见 build_graph。
     """
     material_folders = os.listdir(base_path)
     
@@ -246,73 +716,413 @@ def process_folder(base_path: str, output_base_path: str, material_name: str = N
             material_folders = [material_name]
         else:
             print(f"未找到材料 {material_name} 对应的文件夹")
-            return
-            
+            return []
+
+    jobs = []
+    skipped = 0
     # 遍历所有子文件夹
     for material_folder in material_folders:
         folder_path = os.path.join(base_path, material_folder)
         if not os.path.isdir(folder_path):
             continue
-            
-        print(f"\n处理材料文件夹: {material_folder}")
-        
+
         # 创建对应的输出文件夹
-        output_folder = os.path.join(output_base_path, material_folder)
-        os.makedirs(output_folder, exist_ok=True)
+        output_folder = os.path.join(output_base_path, material_folder) if output_base_path else None
+        if output_folder:
+            os.makedirs(output_folder, exist_ok=True)
 
-        html_files = os.listdir(folder_path)
-        
-        # 处理每个HTML文件
-        for html_file in html_files:
+        for html_file in sorted(os.listdir(folder_path)):
             if not html_file.endswith('.html'):
                 continue
-                
+
             # 如果指定了文件名，则只处理匹配的文件
             if filename and not html_file.startswith(f"{filename}"):
                 continue
-                
+
             file_path = os.path.join(folder_path, html_file)
-            print(f"处理文件: {html_file}")
-            
-            try:
-                # 读取并处理HTML内容
-                text_content = read_html_content(file_path)
-                
-                # 调用OpenAI API
-                json_data = call_openai_api(text_content)
-                if json_data:
-                    # 生成对应的JSON文件名
-                    json_filename = html_file.replace('.html', '.json')
-                    json_path = os.path.join(output_folder, json_filename)
-                    
-                    # 保存单个JSON文件
-                    with open(json_path, 'w', encoding='utf-8') as f:
-                        json.dump(json_data, f, ensure_ascii=False, indent=2)
-                    
-                    print(f"已保存: {json_path}")
-                    
-                # 添加延迟以避免API限制
-                time.sleep(1)
-                
-            except Exception as e:
-                print(f"处理文件 {html_file} 时出错: {str(e)}")
+            if manifest is not None:
+                input_hash = content_hash(read_html_content(file_path))
+                if json_reason(manifest, material_folder, html_file, input_hash, extractor, output_base_path) is None:
+                    skipped += 1
+                    continue
+            jobs.append((file_path, os.path.join(output_folder, html_file.replace('.html', '.json')) if output_folder else None))
+    if skipped:
+        print(f"跳过 {skipped} 个清理结果和提取版本都没有变化的文件")
+    return jobs
+
+def record_outputs(output_base_path: str, records: List[Dict]):
+    """把成功生成的JSON写入输出目录中的清单"""
+    done = [record for record in records if record['status'] == 'ok' and 'input_hash' in record]
+    if not done:
+        return
+    manifest = load_manifest(output_base_path)
+    for record in done:
+        material = os.path.basename(os.path.dirname(record['file']))
+        record_json(manifest, material, os.path.basename(record['file']), record['input_hash'], record['extractor'])
+    save_manifest(output_base_path, manifest)
+
+def print_records(records: List[Dict], elapsed: float, limiter: AdaptiveLimiter = None, cache: LlmCache = None):
+    """汇总打印每个文件的处理记录"""
+    counts = {'parser': 0, 'llm': 0, 'none': 0}
+    for record in records:
+        for source in record['sources'].values():
+            counts[source] += 1
+    failed = [record for record in records if record['status'] == 'failed']
+    print(f"\n成功 {len(records) - len(failed)} 个, 失败 {len(failed)} 个；耗时 {elapsed:.2f} 秒")
+    print(f"各部分来源: 规则解析 {counts['parser']}, 模型 {counts['llm']}, 未提取 {counts['none']}")
+    if limiter is not None and limiter.requests:
+        limiter.report()
+    if cache is not None and (cache.hits or cache.misses):
+        cache.report()
+    stream_stats.report()
+    for record in failed:
+        print(f"  失败: {record['file']} ({record['error']})")
+
+def process_folder(base_path: str, output_base_path: str, material_name: str = None, filename: str = None,
+                   mode: str = 'auto', workers: int = 1, cache: LlmCache = None, prompt: str = 'full',
+                   force: bool = False):
+    """处理文件夹中的所有HTML文件，每个文件单独生成对应的JSON
+    Args:
+        base_path: 输入文件夹路径
+        output_base_path: 输出文件夹路径
+        material_name: 指定要处理的材料名称，默认为None处理所有材料
+        filename: 指定要处理的文件名，默认为None处理所有文件
+        mode: 提取方式，auto/parser/llm，见 extract_material
+        workers: 并发处理的文件数，同时也是模型请求的最大并发数
+        cache: 模型响应缓存，为None时每次都请求模型
+        prompt: 提示词方案，见 PROMPTS
+        force: 忽略JSON清单，重新转换所有文件
+
+    Returns:
+        每个文件的处理记录列表
+    """
+    start = time.perf_counter()
+    manifest = None if force else load_manifest(output_base_path)
+    jobs = collect_files(base_path, output_base_path, material_name, filename, manifest, extractor_version(mode, prompt))
+
+    print(f"共 {len(jobs)} 个文件待转换，并发数 {workers}")
+    # 按部分提取时每个文件同时发出多个请求
+    limiter = AdaptiveLimiter(workers * len(SECTIONS) if prompt == 'sections' else workers)
+    if workers <= 1:
+        records = [process_file(file_path, json_path, mode, limiter, cache, prompt) for file_path, json_path in jobs]
+    else:
+        # 单个文件出错只记录在该文件的结果中，不影响其他文件
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(process_file, file_path, json_path, mode, limiter, cache, prompt)
+                       for file_path, json_path in jobs]
+            records = [future.result() for future in as_completed(futures)]
+
+    record_outputs(output_base_path, records)
+    print_records(records, time.perf_counter() - start, limiter, cache)
+    return records
+
+# 批处理的工作目录，state.json 记录当前未完成的批处理
+DEFAULT_BATCH_DIR = 'data/batch'
+# 批处理结束时的状态
+BATCH_FINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+def _save_batch_state(path: str, state: Dict):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def _prepare_batch(files, mode, cache, prompt, batch_dir, records):
+    """规则解析和缓存能处理的文件直接写出，其余文件写入批处理输入文件
+
+    内容相同的页面只生成一个请求，custom_id 即模型响应缓存的键。
+    没有需要提交的请求时返回None。
+    """
+    system_prompt, encode = PROMPTS[prompt]
+    requests, targets = {}, {}
+    for file_path, json_path in files:
+        start = time.perf_counter()
+        html = read_html_content(file_path)
+        data, sources = parse_sections(html, mode)
+        if needs_llm(sources, mode):
+            text = encode(html)
+            key = cache_key(text, system_prompt, MODEL, TEMPERATURE)
+            cached = cache.get(key) if cache is not None else None
+            if cached is None:
+                requests[key] = chat_request_body(text, system_prompt)
+                targets.setdefault(key, []).append([file_path, json_path])
                 continue
+            json_data = merge_result(data, sources, cached[1])
+        else:
+            json_data = merge_result(data, sources)
+        save_json(json_path, json_data)
+        records.append({'file': file_path, 'status': 'ok', 'error': None,
+                        'sources': json_data['ExtractionSource'], 'elapsed': time.perf_counter() - start,
+                        'input_hash': content_hash(html), 'extractor': extractor_version(mode, prompt)})
+    if not requests:
+        return None
+
+    run_dir = os.path.join(batch_dir, datetime.now().strftime('%Y%m%d_%H%M%S'))
+    os.makedirs(run_dir, exist_ok=True)
+    input_path = os.path.join(run_dir, 'input.jsonl')
+    with open(input_path, 'w', encoding='utf-8') as f:
+        for key, body in requests.items():
+            line = {'custom_id': key, 'method': 'POST', 'url': '/v1/chat/completions', 'body': body}
+            f.write(json.dumps(line, ensure_ascii=False) + '\n')
+    print(f"已写入 {len(requests)} 个请求（{sum(len(t) for t in targets.values())} 个文件）: {input_path}")
+    return {'run_dir': run_dir, 'input_path': input_path, 'mode': mode, 'prompt': prompt, 'targets': targets,
+            'file_id': None, 'batch_id': None, 'status': 'prepared', 'output_path': None, 'error_path': None}
+
+def _download_file(file_id: str, path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(get_client().files.content(file_id).text)
+
+def _poll_batch(state: Dict, state_path: str, poll_interval: float) -> bool:
+    """提交批处理并等待结束，结果下载到本地后返回True；中断时返回False，状态保留在 state.json 中"""
+    client = get_client()
+    if state['file_id'] is None:
+        with open(state['input_path'], 'rb') as f:
+            state['file_id'] = client.files.create(file=f, purpose='batch').id
+        _save_batch_state(state_path, state)
+        print(f"已上传输入文件: {state['file_id']}")
+    if state['batch_id'] is None:
+        batch = client.batches.create(input_file_id=state['file_id'], endpoint='/v1/chat/completions',
+                                      completion_window='24h')
+        state['batch_id'] = batch.id
+        _save_batch_state(state_path, state)
+        print(f"已提交批处理: {state['batch_id']}")
+
+    try:
+        while True:
+            batch = client.batches.retrieve(state['batch_id'])
+            counts = batch.request_counts
+            progress = f"{counts.completed + counts.failed}/{counts.total}" if counts else '-'
+            print(f"批处理 {batch.id}: {batch.status}，已完成 {progress}")
+            if batch.status in BATCH_FINAL_STATUSES:
+                break
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print(f"\n已停止等待，批处理仍在服务端运行；重新运行 --batch 将继续等待 {state['batch_id']}")
+        return False
+
+    # 失败、过期或取消的批处理可能仍有部分结果
+    state['status'] = batch.status
+    if batch.output_file_id:
+        state['output_path'] = os.path.join(state['run_dir'], 'output.jsonl')
+        _download_file(batch.output_file_id, state['output_path'])
+    if batch.error_file_id:
+        state['error_path'] = os.path.join(state['run_dir'], 'errors.jsonl')
+        _download_file(batch.error_file_id, state['error_path'])
+    if batch.status != 'completed' and batch.errors:
+        for error in batch.errors.data or []:
+            print(f"批处理错误: {error.code}: {error.message}")
+    _save_batch_state(state_path, state)
+    return True
+
+def _apply_batch_results(state: Dict, cache: LlmCache, records: List[Dict]):
+    """将批处理结果写回各文件对应的JSON，并保存到模型响应缓存"""
+    results, errors = {}, {}
+    for path in (state['output_path'], state['error_path']):
+        if not path:
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get('response') or {}
+                if response.get('status_code') == 200:
+                    results[item['custom_id']] = response['body']['choices'][0]['message']['content']
+                else:
+                    error = item.get('error') or (response.get('body') or {}).get('error') or {}
+                    errors[item['custom_id']] = f"{error.get('code') or response.get('status_code')}: {error.get('message')}"
+
+    for key, targets in state['targets'].items():
+        llm_data, error = None, errors.get(key, '批处理未返回结果')
+        if key in results:
+            try:
+                llm_data = json.loads(clean_json_string(results[key]))
+                if cache is not None and not validate(llm_data):
+                    cache.put(key, MODEL, results[key], llm_data)
+            except json.JSONDecodeError as e:
+                error = f"JSONDecodeError: {e}"
+        for file_path, json_path in targets:
+            record = {'file': file_path, 'status': 'ok', 'error': None, 'sources': {}, 'elapsed': 0.0}
+            if llm_data is None:
+                record['status'], record['error'] = 'failed', error
+            else:
+                html = read_html_content(file_path)
+                data, sources = parse_sections(html, state['mode'])
+                json_data = merge_result(data, sources, llm_data)
+                try:
+                    check_result(json_data, state['mode'])
+                except SchemaDivergence as e:
+                    record['status'], record['error'] = 'failed', f"SchemaDivergence: {e}"
+                    records.append(record)
+                    continue
+                save_json(json_path, json_data)
+                record['sources'] = json_data['ExtractionSource']
+                record['input_hash'] = content_hash(html)
+                record['extractor'] = extractor_version(state['mode'], state.get('prompt', 'compact'))
+            records.append(record)
+
+def run_batch(base_path: str, output_base_path: str, material_name: str = None, filename: str = None,
+              mode: str = 'auto', cache: LlmCache = None, prompt: str = 'full',
+              batch_dir: str = DEFAULT_BATCH_DIR, poll_interval: float = 30, force: bool = False) -> List[Dict]:
+    """通过批处理接口离线转换文件
+
+    需要调用模型的请求写入OpenAI批处理格式的JSONL文件，上传并提交后轮询等待，
+    结束后把结果写回 JsonData/<材料>/<文件>.json。进度保存在 <batch_dir>/state.json 中，
+    等待被中断后再次运行会继续等待同一个批处理，而不是重新提交。
+    清理结果和提取版本都没有变化的文件不再提交，force 为True时全部重新转换。
+
+    Returns:
+        每个文件的处理记录列表
+    """
+    start = time.perf_counter()
+    os.makedirs(batch_dir, exist_ok=True)
+    state_path = os.path.join(batch_dir, 'state.json')
+    records = []
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        print(f"继续未完成的批处理: {state['run_dir']}")
+    else:
+        manifest = None if force else load_manifest(output_base_path)
+        files = collect_files(base_path, output_base_path, material_name, filename, manifest,
+                              extractor_version(mode, prompt))
+        state = _prepare_batch(files, mode, cache, prompt, batch_dir, records)
+        if state is None:
+            record_outputs(output_base_path, records)
+            print_records(records, time.perf_counter() - start, cache=cache)
+            return records
+        _save_batch_state(state_path, state)
+
+    if state['status'] not in BATCH_FINAL_STATUSES and not _poll_batch(state, state_path, poll_interval):
+        record_outputs(output_base_path, records)
+        return records
+    _apply_batch_results(state, cache, records)
+    record_outputs(output_base_path, records)
+    # 结果写回后将状态移到本次批处理的目录中
+    os.replace(state_path, os.path.join(state['run_dir'], 'state.json'))
+    print_records(records, time.perf_counter() - start, cache=cache)
+    return records
+
+def token_report(base_path: str, material_name: str = None, filename: str = None):
+    """对比每个文件在完整提示词和精简提示词下发送的token数，并检查精简文本是否丢失页面文字"""
+    files = collect_files(base_path, None, material_name, filename)
+    print(f"{'文件':<50}{'原token':>10}{'精简token':>10}{'比例':>8}{'丢失片段':>10}")
+    total_full = total_compact = 0
+    for file_path, _ in files:
+        html = read_html_content(file_path)
+        compact = compact_page(html)
+        full = count_tokens(SYSTEM_PROMPT) + count_tokens(html)
+        small = count_tokens(COMPACT_SYSTEM_PROMPT) + count_tokens(compact)
+        total_full += full
+        total_compact += small
+        name = os.path.relpath(file_path, base_path)
+        print(f"{name:<50}{full:>10}{small:>10}{small / full:>8.1%}{len(missing_text(html, compact)):>10}")
+    if files:
+        print(f"{'合计':<50}{total_full:>10}{total_compact:>10}{total_compact / total_full:>8.1%}")
+    if tiktoken is None:
+        print("未安装 tiktoken，token数为按字符估算的结果")
+
+# 提示词回归检查使用的固定页面：清理后的HTML（*.html）及同名的预期JSON（*.json）
+PROMPT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'fixtures', 'prompts')
+
+def _normalize_number(match):
+    return format(float(match.group()), 'g')
+
+def _normalize_value(value):
+    """比较用的规范化：数值统一格式（7.850 与 7.85 相同），忽略符号两侧和连续的空白"""
+    if isinstance(value, dict):
+        return {key: _normalize_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize_value(item) for item in value]
+    if value is None or isinstance(value, bool):
+        return value
+    text = re.sub(r'\d+(?:\.\d+)?', _normalize_number, str(value))
+    text = re.sub(r'\s*([^\w\s])\s*', r'\1', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def _canonical_sections(data: Dict) -> Dict:
+    """用于比较的各部分内容，忽略模型自由生成的材料概述"""
+    sections = {section: _normalize_value(data.get(section)) for section in SECTIONS}
+    if isinstance(sections['Material'], dict):
+        sections['Material'] = {k: v for k, v in sections['Material'].items() if k != 'Description'}
+    return {section: json.dumps(value, ensure_ascii=False, sort_keys=True) for section, value in sections.items()}
+
+def compare_prompts(fixtures_dir: str = PROMPT_FIXTURES_DIR, cache: LlmCache = None,
+                    prompts: List[str] = ('full', 'compact')) -> bool:
+    """在固定页面上用各提示词方案提取，逐部分与预期JSON比较
+
+    请求使用温度0，结果写入缓存后重复运行直接比较缓存的响应；比较前规范化数值和空白。
+    """
+    pages = sorted(name for name in os.listdir(fixtures_dir) if name.endswith('.html'))
+    differences = 0
+    for name in pages:
+        html = read_html_content(os.path.join(fixtures_dir, name))
+        with open(os.path.join(fixtures_dir, name[:-5] + '.json'), 'r', encoding='utf-8') as f:
+            expected = _canonical_sections(json.load(f))
+        for prompt in prompts:
+            actual = _canonical_sections(call_openai_api(html, cache=cache, prompt=prompt, temperature=0))
+            changed = [section for section in SECTIONS if actual[section] != expected[section]]
+            if changed:
+                differences += 1
+                print(f"{name} [{prompt}]: 与预期不一致的部分 {', '.join(changed)}")
+            else:
+                print(f"{name} [{prompt}]: 一致")
+    print(f"\n共 {len(pages)} 个页面、{len(prompts)} 种提示词，{differences} 次提取与预期不一致")
+    return differences == 0
 
 def main():
     # 创建命令行参数解析器
     parser = argparse.ArgumentParser(description='将HTML文件转换为JSON格式')
     parser.add_argument('-m', '--material', type=str, help='指定要处理的材料名称', default=None)
     parser.add_argument('-f', '--filename', type=str, help='指定要处理的文件名（如：42CrMo4_20240318_123456）', default=None)
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='并发转换的文件数（默认1），遇到限流或超时会自动降低并发')
+    parser.add_argument('--no-cache', action='store_true', help='不使用模型响应缓存，每个页面都重新请求模型')
+    parser.add_argument('--cache-size', type=int, default=200, help='模型响应缓存的最大大小（MB，默认200）')
+    parser.add_argument('--prompt', choices=sorted(PROMPTS) + ['sections'], default='full',
+                        help='提示词方案：full（默认）发送完整HTML和完整示例；compact 将页面转换为精简文本并使用精简提示词；'
+                             'sections 按部分拆分页面，每个部分使用各自的提示词并行请求')
+    parser.add_argument('--token-report', action='store_true', help='只统计每个文件在两种提示词下的token数，不调用模型')
+    parser.add_argument('--compare-prompts', action='store_true',
+                        help='在固定页面上用 full 和 compact 两种提示词分别提取（温度0），检查输出与预期JSON是否一致')
+    parser.add_argument('--fixtures', type=str, default=PROMPT_FIXTURES_DIR,
+                        help='--compare-prompts 使用的页面目录，每个 .html 对应一个同名的预期 .json')
+    parser.add_argument('--batch', action='store_true',
+                        help='通过批处理接口离线转换：写入批处理JSONL、提交、轮询并写回结果，中断后重新运行可继续')
+    parser.add_argument('--poll-interval', type=float, default=30, help='批处理模式下查询进度的间隔（秒，默认30）')
+    parser.add_argument('--mode', choices=['auto', 'parser', 'llm'], default='auto',
+                        help='提取方式：auto 先规则解析表格、只把无法解析的部分交给模型；parser 不调用模型；llm 全部交给模型')
+    parser.add_argument('--force', action='store_true', help='忽略JSON清单，重新转换所有文件')
     args = parser.parse_args()
     
     base_path = "./data/clean_html_data"
     output_base_path = "./data/JsonData"
     
+    if args.token_report:
+        token_report(base_path, args.material, args.filename)
+        return
+
     # 创建输出根目录
     os.makedirs(output_base_path, exist_ok=True)
-    
-    # 处理文件
-    process_folder(base_path, output_base_path, args.material, args.filename)
+
+    cache = None if args.no_cache else LlmCache(max_bytes=args.cache_size * 1024 * 1024)
+    if args.compare_prompts:
+        consistent = compare_prompts(args.fixtures, cache)
+    elif args.batch:
+        if args.prompt == 'sections':
+            # 批处理中每个文件只对应一个请求
+            print("批处理模式不支持按部分提取，改用 full 提示词")
+            args.prompt = 'full'
+        run_batch(base_path, output_base_path, args.material, args.filename, args.mode, cache, args.prompt,
+                  poll_interval=args.poll_interval, force=args.force)
+    else:
+        # 处理文件
+        process_folder(base_path, output_base_path, args.material, args.filename, args.mode, args.workers,
+                       cache, args.prompt, args.force)
+    if cache is not None:
+        cache.close()
+    if args.compare_prompts:
+        raise SystemExit(0 if consistent else 1)
     
     if args.material:
         print(f"\n材料 {args.material} 的转换处理完成!")
@@ -1,17 +1,26 @@
 from bs4 import BeautifulSoup
 import os
 import re
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from bs4.element import Comment,Tag
+from lxml import etree
+import lxml.html
+from html_store import HtmlStore, content_hash
 
-def clean_html(html_content):
+def clean_html(html_content, region_only=False):
+    # region_only 为True时同时删除位置导航所在容器之后的内容（如页脚），即流式清理的预期输出
     # 创建BeautifulSoup对象
     soup = BeautifulSoup(html_content, 'html.parser')
     
     # 删除位置导航之前的所有内容
     breadcrumb = soup.find('span', class_='layui-breadcrumb')
+    container = None
     if breadcrumb:
         parent_div = breadcrumb.find_parent('div', class_='layui-row')
         if parent_div:
+            container = parent_div.parent
             # 删除该div之前的所有内容
             for element in list(parent_div.previous_siblings):
                 if isinstance(element, Tag):
@@ -30,6 +39,11 @@ def clean_html(html_content):
                     element.decompose()
                 else:
                     element.extract()
+            if region_only and container is not None and parent_div.parent is container:
+                # 删除容器及其各层父元素之后的内容
+                for ancestor in [container] + list(container.parents):
+                    for element in list(ancestor.next_siblings):
+                        element.extract()
             parent_div.decompose()
     
     # 删除所有script标签和onclick等JavaScript事件
@@ -40,21 +54,19 @@ def clean_html(html_content):
     for style in soup.find_all(['style', 'link']):
         style.decompose()
     
-    # 删除所有注释
+    # 删除所有注释，suppliers paihao 与 suppliers paihao end 之间的同级内容一并删除
+    # （最初的实现只删除开始注释后的第一个元素，见 tests/fixtures/suppliers/）
     for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
-        if 'suppliers paihao' in comment:
+        if 'suppliers paihao' in comment and 'suppliers paihao end' not in comment:
             # 找到对应的结束注释
-            end_comment = comment.find_next(string=lambda text: isinstance(text, Comment) and 'suppliers paihao end' in text)
+            end_comment = comment.find_next_sibling(string=lambda text: isinstance(text, Comment) and 'suppliers paihao end' in text)
             if end_comment:
                 # 删除这两个注释之间的所有内容
-                current = comment
-                while current and current != end_comment:
-                    next_element = current.next_element
-                    current.extract()
-                    current = next_element
-                end_comment.extract()
-        else:
-            comment.extract()
+                for element in list(comment.next_siblings):
+                    if element is end_comment:
+                        break
+                    element.extract()
+        comment.extract()
     
     # 删除meta标签(保留charset的meta标签)
     for meta in soup.find_all('meta'):
@@ -78,56 +90,465 @@ def clean_html(html_content):
     
     return cleaned_html
 
-def process_folder(input_folder, output_folder, material_name=None, filename=None):
+# lxml引擎需要删除的标签
+_DROP_TAGS = {'script', 'noscript', 'style', 'link'}
+# 与BeautifulSoup一致，以 <tag/> 形式输出的空元素
+_VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem',
+    'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame',
+    'image', 'isindex', 'nextid', 'spacer',
+}
+_HAS_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+_BREADCRUMB_XPATH = '//span[' + _HAS_CLASS.format('layui-breadcrumb') + ']'
+_LAYUI_ROW_XPATH = 'ancestor::div[' + _HAS_CLASS.format('layui-row') + '][1]'
+_NOTE_XPATH = "//font[contains(text(), '注：数据仅供参考')]"
+
+def _escape_text(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def _is_comment(node, marker):
+    return node.tag is etree.Comment and marker in (node.text or '')
+
+def _serialize_children(element, out, stop=None):
+    """输出子节点，同时完成标签过滤、注释删除和属性清理；指定 stop 时只输出该子节点之前的内容"""
+    children = list(element)
+    index = 0
+    while index < len(children):
+        child = children[index]
+        if child is stop:
+            break
+        index += 1
+        if child.tag is etree.Comment:
+            if _is_comment(child, 'suppliers paihao') and not _is_comment(child, 'suppliers paihao end'):
+                # 跳过到同级的结束注释为止的所有内容
+                for end_index in range(index, len(children)):
+                    if _is_comment(children[end_index], 'suppliers paihao end'):
+                        child = children[end_index]
+                        index = end_index + 1
+                        break
+        elif not isinstance(child.tag, str):
+            # 处理指令等其他节点直接丢弃
+            pass
+        elif child.tag in _DROP_TAGS or (child.tag == 'meta' and not child.get('charset')):
+            pass
+        else:
+            _serialize_element(child, out)
+        # 被删除节点之后的文本仍然保留
+        if child.tail:
+            out.append(_escape_text(child.tail))
+
+def _start_tag(element):
+    """开始标签（不含结尾的 > ），只保留charset属性"""
+    charset = element.get('charset')
+    return f'<{element.tag} charset="{_escape_text(charset)}"' if charset is not None else f'<{element.tag}'
+
+def _serialize_element(element, out):
+    tag = element.tag
+    start = _start_tag(element)
+    if tag in _VOID_TAGS and not element.text and len(element) == 0:
+        out.append(start + '/>')
+        return
+    out.append(start + '>')
+    if element.text:
+        out.append(_escape_text(element.text))
+    _serialize_children(element, out)
+    out.append(f'</{tag}>')
+
+def clean_html_lxml(html_content):
+    """基于lxml的清理实现，输出与 clean_html 等价
+
+    解析后只做一次遍历，在输出的同时完成标签、注释和属性的清理。
+    """
+    parser = lxml.html.HTMLParser(encoding='utf-8', remove_comments=False)
+    root = lxml.html.document_fromstring(html_content.encode('utf-8'), parser=parser)
+    
+    # 删除位置导航之前的所有内容
+    breadcrumb = root.xpath(_BREADCRUMB_XPATH)
+    if breadcrumb:
+        parent_div = breadcrumb[0].xpath(_LAYUI_ROW_XPATH)
+        if parent_div:
+            parent_div = parent_div[0]
+            container = parent_div.getparent()
+            if container is not None:
+                container.text = None
+                for element in list(parent_div.itersiblings(preceding=True)):
+                    container.remove(element)
+    
+    # 删除"注：数据仅供参考"所在行及之后的所有内容
+    note = root.xpath(_NOTE_XPATH)
+    if note:
+        parent_div = note[0].xpath(_LAYUI_ROW_XPATH)
+        if parent_div:
+            parent_div = parent_div[0]
+            container = parent_div.getparent()
+            if container is not None:
+                for element in [parent_div] + list(parent_div.itersiblings()):
+                    container.remove(element)
+    
+    out = []
+    # 源文件没有文档类型声明时，libxml2会补一个默认值，这里不输出
+    doctype = root.getroottree().docinfo.doctype
+    if doctype and html_content.lstrip()[:9].lower() == '<!doctype':
+        out.append(doctype + '\n')
+    _serialize_element(root, out)
+    cleaned_html = ''.join(out)
+    
+    # 删除空行和多余的空白
+    cleaned_html = re.sub(r'\n\s*\n', '\n', cleaned_html)
+    cleaned_html = re.sub(r'>\s+<', '>\n<', cleaned_html)
+    
+    return cleaned_html
+
+def _has_class(element, name):
+    return name in (element.get('class') or '').split()
+
+def _stream_region(html_bytes, chunk_size):
+    """流式解析页面，输出到"注：数据仅供参考"所在行为止
+
+    位置导航所在行之前的同级内容删除，外层元素中更早的内容（如head、页头导航）与完整清理一样保留，
+    读到数据说明所在行后停止解析，外层容器之后的内容（如页脚）不再输出。
+    返回清理前的输出片段列表；找不到两个标记或结构不符合预期时返回None。
+    """
+    parser = etree.HTMLPullParser(events=('start', 'end', 'comment'), encoding='utf-8', remove_comments=False)
+    out = []
+    open_rows = []          # 当前尚未结束的 layui-row
+    container = None        # 位置导航所在行的父元素
+    chain = []              # 从根元素到 container 的各层元素
+    last_sibling = None     # 区域内最近输出的同级元素，它的tail要等下一个节点出现后才完整
+    skipping = False        # 是否处于 suppliers paihao 注释块中
+    done = False
+
+    def flush_tail():
+        nonlocal last_sibling
+        if last_sibling is not None:
+            if last_sibling.tail and not skipping:
+                out.append(_escape_text(last_sibling.tail))
+            container.remove(last_sibling)
+            last_sibling = None
+
+    for offset in range(0, len(html_bytes), chunk_size):
+        parser.feed(html_bytes[offset:offset + chunk_size])
+        for event, element in parser.read_events():
+            tag = element.tag
+            if container is None:
+                # 区域开始之前：外层元素中的内容要原样保留，只记录尚未结束的 layui-row
+                if event == 'start':
+                    if tag == 'div' and _has_class(element, 'layui-row'):
+                        open_rows.append(element)
+                    elif tag == 'span' and _has_class(element, 'layui-breadcrumb'):
+                        if not open_rows:
+                            return None
+                        row = open_rows[-1]
+                        container = row.getparent()
+                        chain = [a for a in container.iterancestors()][::-1] + [container]
+                        # 输出外层各元素在区域之前的内容，容器中该行之前的同级内容删除
+                        for parent, child in zip(chain, chain[1:] + [row]):
+                            out.append(_start_tag(parent) + '>')
+                            if parent is not container:
+                                if parent.text:
+                                    out.append(_escape_text(parent.text))
+                                _serialize_children(parent, out, stop=child)
+                            for previous in list(child.itersiblings(preceding=True)):
+                                parent.remove(previous)
+                            parent.text = None
+                elif event == 'end' and open_rows and element is open_rows[-1]:
+                    open_rows.pop()
+                continue
+
+            parent = element.getparent()
+            if event == 'start':
+                if parent is container:
+                    flush_tail()
+            elif event == 'comment':
+                if parent is container:
+                    flush_tail()
+                    text = element.text or ''
+                    if 'suppliers paihao end' in text:
+                        skipping = False
+                    elif 'suppliers paihao' in text:
+                        skipping = True
+                    last_sibling = element
+            elif tag == 'font' and '注：数据仅供参考' in (element.text or ''):
+                # 数据说明所在行必须与位置导航所在行同级，否则交给完整解析处理
+                row = next((a for a in element.iterancestors('div') if _has_class(a, 'layui-row')), None)
+                if row is None or row.getparent() is not container:
+                    return None
+                flush_tail()
+                done = True
+                break
+            elif parent is container:
+                if not skipping and isinstance(tag, str) and tag not in _DROP_TAGS \
+                        and not (tag == 'meta' and not element.get('charset')):
+                    _serialize_element(element, out)
+                last_sibling = element
+        if done:
+            break
+
+    if not done:
+        return None
+    # 按原有层级补上区域外层的结束标签
+    return out + [f'</{element.tag}>' for element in reversed(chain)]
+
+def clean_html_stream(html_content, chunk_size=64 * 1024):
+    """流式清理：读到数据说明所在行后停止解析
+
+    与完整清理的区别只在于位置导航所在容器之后的内容（如页脚）不会保留，
+    即输出与 clean_html(html_content, region_only=True) 一致。
+    找不到位置导航或数据说明时回退到 clean_html_lxml。
+    """
+    parts = _stream_region(html_content.encode('utf-8'), chunk_size)
+    if parts is None:
+        return clean_html_lxml(html_content)
+    
+    doctype = re.match(r'\s*<!doctype\s+([^>]*)>', html_content, re.IGNORECASE)
+    cleaned_html = (f'<!DOCTYPE {doctype.group(1)}>\n' if doctype else '') + ''.join(parts)
+    
+    # 删除空行和多余的空白
+    cleaned_html = re.sub(r'\n\s*\n', '\n', cleaned_html)
+    cleaned_html = re.sub(r'>\s+<', '>\n<', cleaned_html)
+    
+    return cleaned_html
+
+# 可用的清理引擎
+CLEANERS = {
+    'bs4': clean_html,
+    'lxml': clean_html_lxml,
+    'stream': clean_html_stream,
+}
+
+def _print_progress(done, total, errors, width=30):
+    """在同一行刷新进度条"""
+    filled = int(width * done / total) if total else width
+    print(f"\r[{'#' * filled}{'.' * (width - filled)}] {done}/{total} 错误 {errors}", end='', flush=True)
+    if done == total:
+        print()
+
+# 工作进程中的存储实例，由 _init_worker 创建
+_worker_store = None
+
+def _init_worker(store_root):
+    global _worker_store
+    _worker_store = HtmlStore(store_root)
+
+def _clean_job(digest, output_paths, engine):
+    """工作进程：清理一份内容并写入所有对应的输出文件，只返回简短的状态记录"""
+    try:
+        cleaned_html = CLEANERS[engine](_worker_store.read(digest))
+        for output_path in output_paths:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(cleaned_html)
+        return {'digest': digest, 'outputs': len(output_paths), 'output_hash': content_hash(cleaned_html), 'error': None}
+    except Exception as e:
+        return {'digest': digest, 'outputs': 0, 'error': f"{type(e).__name__}: {e}"}
+
+# 清理规则的版本号，修改任一引擎的清理逻辑后需要递增，已有的清理结果会在下次运行时重新生成
+# 2: suppliers paihao 注释块删除两条注释之间的全部同级内容（原先只删除开始注释后的第一个元素），
+#    stream 引擎保留位置导航所在容器之前的内容
+CLEANER_VERSION = '2'
+# 清理清单文件名，保存在输出目录中
+MANIFEST_NAME = '.manifest.json'
+
+def cleaner_version(engine):
+    return f"{engine}-{CLEANER_VERSION}"
+
+def load_manifest(output_folder):
+    """读取清理清单 {材料/文件名: {'input_hash', 'cleaner', 'output_hash'}}，也用于 build_graph 中的JSON清单"""
+    path = os.path.join(output_folder, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(output_folder, manifest):
+    path = os.path.join(output_folder, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _is_up_to_date(manifest, name, digest, version, output_path):
+    entry = manifest.get(name)
+    return (entry is not None and entry['input_hash'] == digest and entry['cleaner'] == version
+            and os.path.exists(output_path))
+
+def stale_pages(input_folder, output_folder, material_name=None, engine='bs4'):
+    """返回原始内容或清理规则发生变化、需要重新清理的页面 [(材料, 文件名), ...]"""
+    store = HtmlStore(os.path.join(input_folder, 'html_store'))
+    pages = store.list_pages(material_name)
+    store.close()
+    manifest = load_manifest(output_folder)
+    version = cleaner_version(engine)
+    return [
+        (material, file) for material, file, digest, _ in pages
+        if not _is_up_to_date(manifest, f"{material}/{file}", digest, version,
+                              os.path.join(output_folder, material, file))
+    ]
+
+def clean_stored_page(store, material, file, output_folder, manifest, engine='bs4'):
+    """清理存储中的一个页面并写入输出文件夹，更新清单，返回清理后的HTML
+
+    供 run_pipeline 在同一进程中逐个页面调用，清单由调用方负责保存。
+    """
+    digest = store.get_hash(material, file)
+    if digest is None:
+        raise FileNotFoundError(f"存储中不存在页面: {material}/{file}")
+    cleaned_html = CLEANERS[engine](store.read(digest))
+    output_dir = os.path.join(output_folder, material)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, file), 'w', encoding='utf-8') as f:
+        f.write(cleaned_html)
+    manifest[f"{material}/{file}"] = {'input_hash': digest, 'cleaner': cleaner_version(engine),
+                                      'output_hash': content_hash(cleaned_html)}
+    return cleaned_html
+
+def _collect_jobs(store, output_folder, manifest, version, material_name=None, filename=None, force=False):
+    """按内容哈希分组需要清理的页面，返回 ({哈希: [(显示名称, 输出路径), ...]}, 跳过的文件数)"""
+    jobs = {}
+    skipped = 0
+    # 遍历索引中的所有页面，如果指定了材料名称，则只处理对应材料
+    for material, file, digest, _ in store.list_pages(material_name):
+        # 如果指定了文件名，则只处理匹配的文件
+        if filename and not file.startswith(f"{filename}"):
+            continue
+        
+        # 构建输出路径，保持原有的子文件夹结构
+        output_dir = os.path.join(output_folder, material)
+        output_path = os.path.join(output_dir, file)
+        name = f"{material}/{file}"
+        # 原始内容和清理规则都没有变化的文件直接跳过
+        if not force and _is_up_to_date(manifest, name, digest, version, output_path):
+            skipped += 1
+            continue
+        
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        jobs.setdefault(digest, []).append((name, output_path))
+    return jobs, skipped
+
+def _process_parallel(store_root, jobs, engine, workers, manifest, version):
+    """使用进程池清理，显示进度条并在结束时汇总错误"""
+    errors = []
+    done = 0
+    total = len(jobs)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(store_root,)) as executor:
+        futures = [
+            executor.submit(_clean_job, digest, [path for _, path in targets], engine)
+            for digest, targets in jobs.items()
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            if result['error']:
+                names = ', '.join(name for name, _ in jobs[result['digest']])
+                errors.append((names, result['error']))
+            else:
+                for name, _ in jobs[result['digest']]:
+                    manifest[name] = {'input_hash': result['digest'], 'cleaner': version,
+                                      'output_hash': result['output_hash']}
+            done += 1
+            _print_progress(done, total, len(errors))
+    
+    print(f"已清理 {total - len(errors)} 份内容，对应 {sum(len(t) for t in jobs.values())} 个文件")
+    if errors:
+        print(f"\n{len(errors)} 份内容处理出错:")
+        for names, error in errors:
+            print(f"- {names}: {error}")
+
+def process_folder(input_folder, output_folder, material_name=None, filename=None, engine='bs4', workers=1,
+                   force=False):
     # 确保输出文件夹存在
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     
-    # 获取html_data目录的完整路径
-    html_data_dir = os.path.join(input_folder, 'html_data')
+    # 原始HTML通过存储索引读取
+    store_root = os.path.join(input_folder, 'html_store')
+    store = HtmlStore(store_root)
+    # 清单记录每个输出对应的原始内容哈希和清理规则版本
+    manifest = load_manifest(output_folder)
+    version = cleaner_version(engine)
+    # 内容相同的页面只清理一次
+    jobs, skipped = _collect_jobs(store, output_folder, manifest, version, material_name, filename, force)
+    if skipped:
+        print(f"跳过 {skipped} 个未变化的文件")
     
-    # 遍历html_data目录下的所有文件
-    for root, dirs, files in os.walk(html_data_dir):
-        # 如果指定了材料名称，则只处理对应文件夹
-        if material_name:
-            current_folder = os.path.basename(root)
-            if current_folder != material_name:
-                continue
+    try:
+        if workers > 1:
+            _process_parallel(store_root, jobs, engine, workers, manifest, version)
+            return
         
-        for file in files:
-            if file.endswith('.html'):
-                # 如果指定了文件名，则只处理匹配的文件
-                if filename and not file.startswith(f"{filename}"):
-                    continue
-                
-                # 构建输入文件的完整路径
-                input_path = os.path.join(root, file)
-                
-                # 获取相对路径，保持子文件夹结构
-                rel_path = os.path.relpath(root, html_data_dir)
-                # 构建输出路径，保持原有的子文件夹结构
-                output_dir = os.path.join(output_folder, rel_path)
-                if not os.path.exists(output_dir):
-                    os.makedirs(output_dir)
-                output_path = os.path.join(output_dir, file)
-                
-                print(f"处理文件: {input_path}")
+        cleaner = CLEANERS[engine]
+        for digest, targets in jobs.items():
+            cleaned_html = None
+            for name, output_path in targets:
+                print(f"处理文件: {name}")
                 
                 try:
-                    # 读取HTML文件
-                    with open(input_path, 'r', encoding='utf-8') as f:
-                        html_content = f.read()
-                    
-                    # 清理HTML
-                    cleaned_html = clean_html(html_content)
+                    if cleaned_html is not None:
+                        print("内容与已处理的页面相同，复用清理结果")
+                    else:
+                        # 读取并清理HTML
+                        cleaned_html = cleaner(store.read(digest))
                     
                     # 保存清理后的HTML
                     with open(output_path, 'w', encoding='utf-8') as f:
                         f.write(cleaned_html)
+                    manifest[name] = {'input_hash': digest, 'cleaner': version, 'output_hash': content_hash(cleaned_html)}
                     
                     print(f"已保存到: {output_path}")
                 except Exception as e:
-                    print(f"处理文件 {input_path} 时出错: {str(e)}")
+                    print(f"处理文件 {name} 时出错: {str(e)}")
+    finally:
+        store.close()
+        if jobs:
+            save_manifest(output_folder, manifest)
+
+def _canonical(html):
+    """忽略标签之间和连续的空白，用于比较两个引擎的输出"""
+    return re.sub(r'\s+', ' ', re.sub(r'>\s+<', '><', html)).strip()
+
+def expected_engine_outputs(engine, pages, bs4_outputs=None):
+    """各引擎的预期输出：stream 引擎不保留位置导航所在容器之后的内容，其他引擎与 bs4 完全一致"""
+    if engine == 'stream':
+        return [clean_html(html, region_only=True) for html in pages]
+    return bs4_outputs if bs4_outputs is not None else [clean_html(html) for html in pages]
+
+def compare_engines(input_folder, material_name=None, filename=None):
+    """在已保存的页面上比较各清理引擎的输出是否一致，并统计吞吐量"""
+    store = HtmlStore(os.path.join(input_folder, 'html_store'))
+    pages = [(material, file, store.read(digest))
+             for material, file, digest, _ in store.list_pages(material_name)
+             if not filename or file.startswith(filename)]
+    store.close()
+    if not pages:
+        print("没有可比较的页面")
+        return True
+    
+    total_mb = sum(len(html.encode('utf-8')) for _, _, html in pages) / 1024 / 1024
+    outputs = {}
+    for engine, cleaner in CLEANERS.items():
+        start = time.perf_counter()
+        outputs[engine] = [cleaner(html) for _, _, html in pages]
+        elapsed = time.perf_counter() - start
+        print(f"{engine:<6} {len(pages)} 个页面, 耗时 {elapsed:.2f} 秒, "
+              f"{len(pages) / elapsed:.1f} 页/秒, {total_mb / elapsed:.2f} MB/秒")
+    
+    consistent = True
+    for engine in CLEANERS:
+        if engine == 'bs4':
+            continue
+        expected_outputs = expected_engine_outputs(engine, [html for _, _, html in pages], outputs['bs4'])
+        mismatches = [
+            f"{material}/{file}"
+            for (material, file, _), expected, actual in zip(pages, expected_outputs, outputs[engine])
+            if _canonical(expected) != _canonical(actual)
+        ]
+        if mismatches:
+            consistent = False
+            print(f"\n{engine}: {len(mismatches)} 个页面的输出与预期不一致:")
+            for page in mismatches:
+                print(f"- {page}")
+        else:
+            print(f"\n{engine}: 全部 {len(pages)} 个页面的输出与预期一致")
+    return consistent
 
 if __name__ == "__main__":
     import argparse
@@ -136,14 +557,22 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='清理HTML文件')
     parser.add_argument('-m', '--material', type=str, help='指定要处理的材料名称', default=None)
     parser.add_argument('-f', '--filename', type=str, help='指定要处理的文件名（如：42CrMo4_20240318_123456）', default=None)
+    parser.add_argument('--engine', choices=sorted(CLEANERS), default='bs4', help='清理引擎')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='并行清理的进程数')
+    parser.add_argument('--force', action='store_true', help='忽略清理清单，重新清理所有文件')
+    parser.add_argument('--compare', action='store_true', help='比较各引擎在已保存页面上的输出和吞吐量，不写入文件')
     args = parser.parse_args()
     
     # 设置输入和输出文件夹
     input_folder = "./data"
     output_folder = "./data/clean_html_data"
     
+    if args.compare:
+        consistent = compare_engines(input_folder, args.material, args.filename)
+        raise SystemExit(0 if consistent else 1)
+    
     # 使用命令行参数调用函数
-    process_folder(input_folder, output_folder, args.material, args.filename)
+    process_folder(input_folder, output_folder, args.material, args.filename, args.engine, args.workers, args.force)
     
     if args.material:
         print(f"材料 {args.material} 的文件处理完成！")
@@ -0,0 +1,180 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:  # zstandard 为可选依赖，未安装时使用gzip
+    zstandard = None
+
+# 默认的原始HTML存储目录
+DEFAULT_STORE_PATH = 'data/html_store'
+
+def content_hash(html: str) -> str:
+    """计算页面内容的哈希值"""
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+class HtmlStore:
+    """按内容哈希存储的压缩原始HTML
+
+    页面内容压缩后保存在 objects/<哈希前两位>/<哈希>.html.zst（或 .html.gz）中，
+    内容相同的页面只保存一份；index.db 记录 材料/文件名 到哈希的映射。
+    所有方法都是线程安全的。
+
+    Args:
+        root: 存储根目录
+    """
+
+    def __init__(self, root=DEFAULT_STORE_PATH):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                material TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (material, filename)
+            )
+        ''')
+        self._conn.commit()
+
+    def _object_path(self, digest, ext):
+        return os.path.join(self.objects_dir, digest[:2], digest + ext)
+
+    def _find_object(self, digest):
+        for ext in ('.html.zst', '.html.gz'):
+            path = self._object_path(digest, ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, material, filename, html):
+        """保存页面并更新索引，返回内容哈希"""
+        digest = content_hash(html)
+        if self._find_object(digest) is None:
+            data = html.encode('utf-8')
+            if zstandard is not None:
+                path = self._object_path(digest, '.html.zst')
+                data = zstandard.ZstdCompressor(level=10).compress(data)
+            else:
+                path = self._object_path(digest, '.html.gz')
+                data = gzip.compress(data, compresslevel=6)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再改名，避免中断时留下不完整的对象
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)',
+                (material, filename, digest, len(html.encode('utf-8')), time.time())
+            )
+        return digest
+
+    def read(self, digest):
+        """按哈希读取页面内容"""
+        path = self._find_object(digest)
+        if path is None:
+            raise FileNotFoundError(f"存储中不存在对象: {digest}")
+        with open(path, 'rb') as f:
+            data = f.read()
+        if path.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError("读取 .zst 对象需要安装 zstandard")
+            data = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            data = gzip.decompress(data)
+        return data.decode('utf-8')
+
+    def get_hash(self, material, filename):
+        """返回 材料/文件名 对应的哈希，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT hash FROM pages WHERE material = ? AND filename = ?', (material, filename)
+            ).fetchone()
+        return row[0] if row else None
+
+    def page_size(self, material, filename):
+        """返回 材料/文件名 对应页面的原始大小（字节），不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT size FROM pages WHERE material = ? AND filename = ?', (material, filename)
+            ).fetchone()
+        return row[0] if row else None
+
+    def read_page(self, material, filename):
+        """读取 材料/文件名 对应的页面，不存在时返回None"""
+        digest = self.get_hash(material, filename)
+        return self.read(digest) if digest else None
+
+    def list_pages(self, material=None):
+        """列出索引中的页面，返回 [(材料, 文件名, 哈希, 保存时间), ...]"""
+        query = 'SELECT material, filename, hash, stored_at FROM pages'
+        params = ()
+        if material:
+            query += ' WHERE material = ?'
+            params = (material,)
+        with self._lock:
+            return self._conn.execute(query + ' ORDER BY material, filename', params).fetchall()
+
+    def has_material(self, material):
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM pages WHERE material = ? LIMIT 1', (material,)).fetchone()
+        return row is not None
+
+    def stats(self):
+        """返回索引条目数、不同内容数、原始大小和压缩后大小"""
+        with self._lock:
+            entries, raw_size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages').fetchone()
+            unique = self._conn.execute('SELECT COUNT(DISTINCT hash) FROM pages').fetchone()[0]
+        stored_size = 0
+        for root, _, files in os.walk(self.objects_dir):
+            stored_size += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        return {'entries': entries, 'unique': unique, 'raw_size': raw_size, 'stored_size': stored_size}
+
+    def import_folder(self, html_data_dir):
+        """将旧版 html_data/<材料>/<文件名>.html 目录导入存储，返回导入的文件数"""
+        count = 0
+        for root, _, files in os.walk(html_data_dir):
+            for file in files:
+                if not file.endswith('.html'):
+                    continue
+                material = os.path.relpath(root, html_data_dir)
+                with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
+                    self.put(material, file, f.read())
+                count += 1
+                print(f"已导入: {material}/{file}")
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='原始HTML存储管理')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help='导入旧版 data/html_data 目录中的HTML文件')
+    import_parser.add_argument('--source', type=str, help='要导入的目录', default='data/html_data')
+    subparsers.add_parser('stats', help='显示存储统计')
+    args = parser.parse_args()
+
+    store = HtmlStore()
+    if args.command == 'import':
+        print(f"共导入 {store.import_folder(args.source)} 个文件")
+    stats = store.stats()
+    print(f"索引条目: {stats['entries']}, 不同内容: {stats['unique']}, "
+          f"原始大小: {stats['raw_size'] / 1024:.1f} KB, 压缩后: {stats['stored_size'] / 1024:.1f} KB")
+    store.close()
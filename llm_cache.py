@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# 默认的模型响应缓存数据库
+DEFAULT_LLM_CACHE_PATH = 'data/llm_cache.db'
+
+def cache_key(text, system_prompt, model, temperature):
+    """由清理后的HTML、系统提示词、模型名称和温度计算缓存键"""
+    digest = hashlib.sha256()
+    for part in (text, system_prompt, model, repr(temperature)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class LlmCache:
+    """模型响应的本地缓存，保存原始输出和解析后的JSON
+
+    键只取决于页面内容和请求参数，通过不同别名找到的相同页面共用一条缓存。
+    所有条目的总大小超过 max_bytes 时按最近访问时间淘汰。所有方法都是线程安全的。
+
+    Args:
+        path: SQLite数据库路径
+        max_bytes: 缓存的最大总大小（字节）
+    """
+
+    def __init__(self, path=DEFAULT_LLM_CACHE_PATH, max_bytes=200 * 1024 * 1024):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # 键 -> [锁, 正在使用或等待该锁的线程数]，没有线程使用时删除
+        self._key_locks = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                raw TEXT NOT NULL,
+                parsed TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    @contextmanager
+    def lock_for(self, key):
+        """持有该键专用的锁，避免内容相同的页面同时请求模型；最后一个使用者释放后删除该锁"""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def get(self, key):
+        """返回缓存的 (原始输出, 解析后的JSON)，未命中时返回None"""
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT raw, parsed FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            self.hits += 1
+        return row[0], json.loads(row[1])
+
+    def put(self, key, model, raw, parsed):
+        """保存一次模型响应，并在超出容量时淘汰最久未访问的条目"""
+        parsed_text = json.dumps(parsed, ensure_ascii=False)
+        size = len(raw.encode('utf-8')) + len(parsed_text.encode('utf-8'))
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, model, raw, parsed_text, size, now, now)
+            )
+            # 按访问时间从新到旧累计大小，删除超出容量的部分
+            self._conn.execute('''
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS total FROM responses
+                    ) WHERE total > ?
+                )
+            ''', (self.max_bytes,))
+
+    def stats(self):
+        """返回条目数和总大小"""
+        with self._lock:
+            entries, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return {'entries': entries, 'size': size}
+
+    def report(self):
+        stats = self.stats()
+        print(f"模型响应缓存: 命中 {self.hits} 次, 未命中 {self.misses} 次, "
+              f"共 {stats['entries']} 条 {stats['size'] / 1024:.1f} KB")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,285 @@
+import json
+from typing import List, Tuple
+
+try:
+    import jsonschema
+except ImportError:  # jsonschema 为可选依赖，未安装时使用下面的简易校验
+    jsonschema = None
+
+_STRING = {'type': 'string'}
+_STRING_LIST = {'type': 'array', 'items': _STRING}
+_NOTES = {'type': 'array', 'items': {'type': ['string', 'object']}}
+_STANDARD = {
+    'type': 'object',
+    'properties': {'StandardCode': _STRING, 'Description': _STRING},
+    'required': ['StandardCode'],
+}
+
+# html2Json 输出的材料JSON格式
+MATERIAL_SCHEMA = {
+    '$schema': 'https://json-schema.org/draft/2020-12/schema',
+    'title': 'Material',
+    'type': 'object',
+    'properties': {
+        'Material': {
+            'type': 'object',
+            'properties': {
+                'Name': _STRING,
+                'OldName': _STRING,
+                'OtherNames': _STRING_LIST,
+                'Category': _STRING,
+                'Density': _STRING,
+                'BelongsToStandard': _STANDARD,
+                'AllStandards': {'type': 'array', 'items': _STANDARD},
+                'Description': _STRING,
+            },
+            'required': ['Name', 'BelongsToStandard'],
+        },
+        'ChemicalComposition': {
+            'type': 'object',
+            'properties': {
+                'Elements': {
+                    'type': 'object',
+                    'additionalProperties': {
+                        'type': 'object',
+                        'properties': {'Min': _STRING, 'Max': _STRING},
+                        'required': ['Min', 'Max'],
+                    },
+                },
+                'Notes': _NOTES,
+            },
+            'required': ['Elements'],
+        },
+        'MechanicalProperties': {
+            'type': 'object',
+            'properties': {
+                'Conditions': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {'Property': _STRING, 'Condition': _STRING, 'Value': _STRING},
+                        'required': ['Property', 'Value'],
+                    },
+                },
+                'HeatTreatment': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {'Process': _STRING, 'TemperatureRange': _STRING, 'CoolingMethod': _STRING},
+                        'required': ['Process'],
+                    },
+                },
+                'Notes': _NOTES,
+            },
+            'required': ['Conditions', 'HeatTreatment'],
+        },
+        'PhysicalProperties': {
+            'type': 'object',
+            'properties': {
+                'Properties': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {'Property': _STRING, 'Condition': _STRING, 'Value': _STRING},
+                        'required': ['Property', 'Value'],
+                    },
+                },
+            },
+            'required': ['Properties'],
+        },
+        'SimilarGrades': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'Field': _STRING,
+                    'Mappings': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {'Standard': _STRING, 'Grades': _STRING_LIST},
+                            'required': ['Standard', 'Grades'],
+                        },
+                    },
+                },
+                'required': ['Mappings'],
+            },
+        },
+        'ExtractionSource': {
+            'type': 'object',
+            'additionalProperties': {'enum': ['parser', 'llm', 'none']},
+        },
+    },
+    'required': ['Material', 'ChemicalComposition', 'MechanicalProperties', 'PhysicalProperties', 'SimilarGrades'],
+    'additionalProperties': False,
+}
+
+_TYPES = {
+    'object': dict, 'array': list, 'string': str, 'boolean': bool,
+    'number': (int, float), 'integer': int, 'null': type(None),
+}
+
+def _simple_validate(value, schema, path) -> List[str]:
+    """未安装 jsonschema 时的校验，只支持本文件中用到的关键字"""
+    types = schema.get('type')
+    if types is not None:
+        types = [types] if isinstance(types, str) else types
+        if not any(isinstance(value, _TYPES[t]) and not (t != 'boolean' and isinstance(value, bool)) for t in types):
+            return [f"{path}: 应为 {'/'.join(types)}"]
+    if 'enum' in schema and value not in schema['enum']:
+        return [f"{path}: 取值 {value!r} 不在 {schema['enum']} 中"]
+    errors = []
+    if isinstance(value, dict):
+        properties = schema.get('properties', {})
+        for key in schema.get('required', []):
+            if key not in value:
+                errors.append(f"{path}: 缺少 {key}")
+        extra = schema.get('additionalProperties', True)
+        for key, item in value.items():
+            if key in properties:
+                errors.extend(_simple_validate(item, properties[key], f"{path}.{key}"))
+            elif extra is False:
+                errors.append(f"{path}: 不允许的字段 {key}")
+            elif isinstance(extra, dict):
+                errors.extend(_simple_validate(item, extra, f"{path}.{key}"))
+    elif isinstance(value, list) and 'items' in schema:
+        for index, item in enumerate(value):
+            errors.extend(_simple_validate(item, schema['items'], f"{path}[{index}]"))
+    return errors
+
+def validate(value, schema=MATERIAL_SCHEMA, path='$') -> List[str]:
+    """按JSON Schema校验，返回错误信息列表，通过时为空"""
+    if jsonschema is None:
+        return _simple_validate(value, schema, path)
+    return [
+        path + ''.join(f"[{p}]" if isinstance(p, int) else f".{p}" for p in error.absolute_path) + f": {error.message}"
+        for error in jsonschema.Draft202012Validator(schema).iter_errors(value)
+    ]
+
+class SchemaDivergence(ValueError):
+    """模型输出偏离了预期的格式"""
+
+    def __init__(self, message, section=None):
+        super().__init__(message)
+        self.section = section
+
+class SectionStream:
+    """增量解析流式输出的材料JSON
+
+    每收到一段文本调用 feed，返回其中新完成的顶层部分 [(名称, 值, 错误列表), ...]，
+    每个部分完成时立即按 MATERIAL_SCHEMA 中对应的子结构校验。
+    顶层结构出错（不是对象、出现未知字段、语法错误）时抛出 SchemaDivergence。
+    输出开头的 ```json 代码块标记会被忽略。
+    """
+
+    def __init__(self, schema=MATERIAL_SCHEMA):
+        self.schema = schema
+        self.text = ''
+        self.pos = 0
+        self.state = 'start'
+        self.key = None
+        self.value_start = None
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def _divergence(self, message, section=None):
+        raise SchemaDivergence(f"{message}（第 {self.pos} 个字符）", section)
+
+    def _finish_value(self, end) -> Tuple[str, object, List[str]]:
+        key, raw = self.key, self.text[self.value_start:end]
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self._divergence(f"{key} 不是合法的JSON: {e}", key)
+        self.state = 'after_value'
+        return key, value, validate(value, self.schema['properties'][key], f"$.{key}")
+
+    def feed(self, chunk: str) -> List[Tuple[str, object, List[str]]]:
+        self.text += chunk
+        completed = []
+        text = self.text
+        while self.pos < len(text):
+            char = text[self.pos]
+            if self.state == 'value':
+                if self.in_string:
+                    if self.escape:
+                        self.escape = False
+                    elif char == '\\':
+                        self.escape = True
+                    elif char == '"':
+                        self.in_string = False
+                        if self.depth == 0:
+                            completed.append(self._finish_value(self.pos + 1))
+                elif char == '"':
+                    self.in_string = True
+                elif char in '{[':
+                    self.depth += 1
+                elif char in '}]':
+                    if self.depth == 0:
+                        # 数字等标量值在顶层的 } 处结束
+                        completed.append(self._finish_value(self.pos))
+                        continue
+                    self.depth -= 1
+                    if self.depth == 0:
+                        completed.append(self._finish_value(self.pos + 1))
+                elif char == ',' and self.depth == 0:
+                    completed.append(self._finish_value(self.pos))
+                    continue
+                self.pos += 1
+                continue
+
+            if char.isspace():
+                self.pos += 1
+                continue
+            if self.state == 'start':
+                if text.startswith('```', self.pos) or '```'.startswith(text[self.pos:]):
+                    newline = text.find('\n', self.pos)
+                    if newline < 0:
+                        break
+                    self.pos = newline + 1
+                    continue
+                if char != '{':
+                    self._divergence("输出不是JSON对象")
+                self.state = 'expect_key'
+            elif self.state == 'expect_key':
+                if char == '}':
+                    self.state = 'done'
+                elif char == '"':
+                    end = text.find('"', self.pos + 1)
+                    if end < 0:
+                        break
+                    self.key = text[self.pos + 1:end]
+                    if self.key not in self.schema['properties']:
+                        self._divergence(f"未知的字段 {self.key}", self.key)
+                    self.pos = end
+                    self.state = 'expect_colon'
+                else:
+                    self._divergence(f"应为字段名，实际为 {char!r}")
+            elif self.state == 'expect_colon':
+                if char != ':':
+                    self._divergence(f"应为 ':'，实际为 {char!r}", self.key)
+                self.state = 'value'
+                self.value_start = self.pos + 1
+                self.depth = 0
+            elif self.state == 'after_value':
+                if char == ',':
+                    self.state = 'expect_key'
+                elif char == '}':
+                    self.state = 'done'
+                else:
+                    self._divergence(f"应为 ',' 或 '}}'，实际为 {char!r}", self.key)
+            elif self.state == 'done':
+                # JSON对象之后只允许出现结尾的代码块标记
+                rest = text[self.pos:]
+                if rest.startswith('```'):
+                    self.pos = len(text)
+                elif not '```'.startswith(rest):
+                    self._divergence("JSON对象之后还有多余内容")
+                break
+            self.pos += 1
+        return completed
+
+    @property
+    def done(self) -> bool:
+        return self.state == 'done'
@@ -3,11 +3,37 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver import Chrome, ChromeOptions
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 import time
 import os
 from datetime import datetime
 import random
+import queue
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+import lxml.html
+from crawl_state import CrawlState, parse_age
+from search_cache import SearchCache
+from html_store import HtmlStore
+from metrics import MetricsRecorder, default_metrics_path
+
+# 材数库搜索页地址模板
+DEFAULT_BASE_URL = "https://www.caishuku.com/material/?keyword={keyword}&page={page}"
+
+# 所有可用的材料列表
+ALL_MATERIALS = ['06Cr19Ni10', '10', '10#', '100C6', '100Cr6', '100Cr6-E', '100Cr6-G', 
+                '100Cr6A', '100CrMnMoSi8-4-6', '100CrMnSi6-4', '100CrMo7-3', '100CrMo7-4', 
+                '10B50', '10MnCrNi', '10MnCrNiMo', '16MnCr5', '16MnCr5H', '18CrMo4', 
+                '18CrNiMo7-6', '18Ni300',  '20Cr', '20CrMnTiH', '20CrMo', '20CrNiMo', 
+                '20MnCr5', '20MnCr5ZR', '31CrMnV9ZR', '34Cr4',  '38CrMoAl', '40Cr', 
+                '42CRMO', '42CrMo4', '440B', '44SMn28', '45#', '50CrMo4', '52100', '55#', 
+                '55#钢', '65Mn', '8620H', '8Cr4Mo4V', '9Cr18Mo', 'C20', 'C45', 'CF53', 
+                'Cr12MoV', 'EP4', 'EP6', 'GCr15', 'GCr15SiMn', 'GCr18Mo', 'K1010',  
+                'M2高速钢', 'M50', 'S43C', 'S45C', 'S53C', 'SAE1055', 'SAE5120', 'SCM415H', 
+                'SCM420H', 'SKF3L', 'SNCM439', 'SUJ2', 'SUJ2S1', 'W6Mo5Cr4V2', 'X45NiCrMo4', 
+                'ZF7B']
 
 def get_random_user_agent():
     # 基础浏览器和操作系统组件
@@ -44,36 +70,130 @@ def get_random_user_agent():
         
     return ua
 
-# 设置options参数
-option = ChromeOptions()
+def build_chrome_options():
+    """构建浏览器选项，每次调用都会生成新的随机User-Agent和窗口大小"""
+    option = ChromeOptions()
+
+    # 开启无头模式
+    # option.add_argument('--headless=new')  # 新版Chrome的无头模式写法
+
+    # 开启无痕模式
+    option.add_argument('--incognito')
+
+    # 反爬虫相关设置
+    option.add_argument('--disable-blink-features=AutomationControlled')
+    option.add_experimental_option('excludeSwitches', ['enable-automation'])
+    option.add_experimental_option('useAutomationExtension', False)
+    option.add_argument('--disable-web-security')
+    option.add_argument('--no-sandbox')
+    option.add_argument('--disable-dev-shm-usage')
+    option.add_argument('--disable-gpu')
+    option.add_argument(f'user-agent={get_random_user_agent()}')
+
+    # 添加随机窗口大小
+    widths = [1280, 1366, 1920]
+    heights = [768, 900, 1080]
+    option.add_argument(f'--window-size={random.choice(widths)},{random.choice(heights)}')
+
+    # 禁用图片加载以提高速度
+    option.add_argument('--blink-settings=imagesEnabled=false')
+    return option
+
+def create_driver():
+    """启动一个独立的浏览器会话"""
+    driver = webdriver.Chrome(build_chrome_options())
+
+    # 使用 CDP 命令修改 webdriver 属性
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+        'source': '''
+            Object.defineProperty(navigator, 'webdriver', {
+                get: () => undefined
+            })
+        '''
+    })
+    return driver
+
+def _quit_driver(driver):
+    """关闭浏览器，忽略已崩溃会话的异常"""
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+class RateLimiter:
+    """按主机划分的令牌桶限速器，可在多个线程间共享
+
+    站点响应变慢、返回429/5xx、验证页或空结果时速率减半；
+    响应正常时逐步恢复到配置的速率。
 
-# 开启无头模式
-# option.add_argument('--headless=new')  # 新版Chrome的无头模式写法
+    Args:
+        rate: 每个主机每秒允许的请求数
+        burst: 令牌桶容量，即允许的突发请求数
+        jitter: 每次请求额外附加的随机等待上限（秒）
+        slow_threshold: 响应耗时超过该值（秒）视为站点变慢
+        min_rate: 退避时速率的下限
+    """
 
-# 开启无痕模式
-option.add_argument('--incognito')
+    def __init__(self, rate=0.5, burst=1, jitter=1.0, slow_threshold=8.0, min_rate=0.05):
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+        self.slow_threshold = slow_threshold
+        self.min_rate = min(min_rate, rate)
+        self._lock = threading.Lock()
+        self._buckets = {}
 
-# 反爬虫相关设置
-option.add_argument('--disable-blink-features=AutomationControlled')
-option.add_experimental_option('excludeSwitches', ['enable-automation'])
-option.add_experimental_option('useAutomationExtension', False)
-option.add_argument('--disable-web-security')
-option.add_argument('--no-sandbox')
-option.add_argument('--disable-dev-shm-usage')
-option.add_argument('--disable-gpu')
-option.add_argument(f'user-agent={get_random_user_agent()}')
+    def _bucket(self, host):
+        if host not in self._buckets:
+            now = time.monotonic()
+            self._buckets[host] = {
+                'rate': self.rate, 'tokens': float(self.burst), 'updated': now,
+                'first': now, 'last': now, 'requests': 0, 'waited': 0.0, 'throttles': 0,
+            }
+        return self._buckets[host]
 
-# 添加随机窗口大小
-widths = [1280, 1366, 1920]
-heights = [768, 900, 1080]
-option.add_argument(f'--window-size={random.choice(widths)},{random.choice(heights)}')
+    def acquire(self, url):
+        """为一次请求获取令牌，必要时阻塞等待，返回等待的秒数"""
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._bucket(host)
+            now = time.monotonic()
+            bucket['tokens'] = min(self.burst, bucket['tokens'] + (now - bucket['updated']) * bucket['rate'])
+            bucket['updated'] = now
+            # 先预占令牌再在锁外等待，令牌为负表示排队中的请求
+            bucket['tokens'] -= 1
+            wait = -bucket['tokens'] / bucket['rate'] if bucket['tokens'] < 0 else 0.0
+            wait += random.uniform(0, self.jitter)
+            bucket['requests'] += 1
+            bucket['waited'] += wait
+            bucket['last'] = now + wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
 
-# 禁用图片加载以提高速度
-option.add_argument('--blink-settings=imagesEnabled=false')
+    def feedback(self, url, elapsed=0.0, status_code=200, empty=False):
+        """根据响应情况调整该主机的速率"""
+        host = urlparse(url).netloc
+        throttled = (
+            status_code == 429 or status_code >= 500 or status_code == 403
+            or elapsed > self.slow_threshold or empty
+        )
+        with self._lock:
+            bucket = self._bucket(host)
+            if throttled:
+                bucket['rate'] = max(self.min_rate, bucket['rate'] / 2)
+                bucket['throttles'] += 1
+            else:
+                bucket['rate'] = min(self.rate, bucket['rate'] + self.rate * 0.1)
 
-# 添加随机延迟函数
-def random_sleep():
-    time.sleep(random.uniform(2, 5))
+    def report(self):
+        """打印每个主机的实际请求速率和累计等待时间"""
+        with self._lock:
+            for host, bucket in self._buckets.items():
+                duration = max(bucket['last'] - bucket['first'], 1e-9)
+                effective = bucket['requests'] / duration if bucket['requests'] > 1 else 0.0
+                print(f"限速统计 [{host}]: 请求 {bucket['requests']} 次, 实际速率 {effective:.2f} 次/秒, "
+                      f"累计等待 {bucket['waited']:.1f} 秒, 退避 {bucket['throttles']} 次, 当前速率 {bucket['rate']:.2f} 次/秒")
 
 def clean_name(text: str) -> str:
     """清理名称中的空格"""
@@ -83,89 +203,362 @@ def clean_standard(text: str) -> str:
     """将标准中的空格和斜杠替换为下划线"""
     return text.replace(' ', '_').replace('/', '_')
 
-def scrape_materials(materials_list, driver, base_url, standard=None):
+# 搜索结果表格
+SEARCH_TABLE_XPATH = '//table[@class="layui-table head-sticky"]'
+# 详情页中必须存在的标记（html_cleaner 依赖它定位正文）
+DETAIL_PAGE_MARKER = 'layui-breadcrumb'
+# 反爬验证页的常见特征
+CHALLENGE_MARKERS = ('captcha', 'challenge-platform', 'cf-chl', '安全验证', '人机验证', '访问过于频繁')
+
+# 在浏览器中一次性提取所有结果行：[[名称, 详情链接, 标准], ...]，无法识别的行返回null
+EXTRACT_ROWS_SCRIPT = '''
+    const table = document.evaluate('//table[@class="layui-table head-sticky"]', document, null,
+                                    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (!table) { return []; }
+    return Array.from(table.querySelectorAll(':scope > tbody > tr')).map(row => {
+        const link = row.querySelector(':scope > td:nth-of-type(2) > a');
+        const standard = row.querySelector(':scope > td:nth-of-type(3) b');
+        if (!link || !standard) { return null; }
+        return [link.innerText.trim(), link.href, standard.innerText.trim()];
+    });
+'''
+
+def looks_like_challenge(status_code, html):
+    """判断响应是否为反爬验证页"""
+    if status_code in (403, 429, 503):
+        return True
+    lowered = html[:20000].lower()
+    return any(marker in lowered for marker in CHALLENGE_MARKERS)
+
+def parse_search_rows(html, page_url):
+    """用lxml解析搜索结果页，返回 [(名称, 详情链接, 标准), ...]
+
+    页面中没有结果表格时返回None，以便调用方回退到浏览器渲染。
+    """
+    doc = lxml.html.fromstring(html)
+    doc.make_links_absolute(page_url)
+    tables = doc.xpath(SEARCH_TABLE_XPATH)
+    if not tables:
+        return None
+
+    rows = []
+    # 服务端HTML不一定带tbody，这里直接取包含td的行
+    for row in tables[0].xpath('.//tr[td]'):
+        name_elements = row.xpath('./td[2]/a')
+        standard_elements = row.xpath('./td[3]//b')
+        if not name_elements or not standard_elements:
+            rows.append(None)
+            continue
+        rows.append((
+            name_elements[0].text_content().strip(),
+            name_elements[0].get('href'),
+            standard_elements[0].text_content().strip(),
+        ))
+    return rows
+
+class HttpFetcher:
+    """基于keep-alive连接池的HTTP抓取器，可在多个线程间共享"""
+
+    def __init__(self, pool_size=10, timeout=15):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': get_random_user_agent(),
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        })
+
+    def get(self, url):
+        """返回 (状态码, 页面文本)"""
+        response = self.session.get(url, timeout=self.timeout)
+        # 站点未声明编码时，按内容推断，避免中文乱码
+        if 'charset' not in response.headers.get('Content-Type', '').lower():
+            response.encoding = response.apparent_encoding
+        return response.status_code, response.text
+
+    def close(self):
+        self.session.close()
+
+class PageFetcher:
+    """页面抓取入口：优先使用HTTP，遇到验证页或缺少预期内容时回退到Selenium
+
+    Args:
+        engine: 'http' 优先走HTTP；'selenium' 始终使用浏览器渲染
+        http: 共享的HttpFetcher，为None时自动创建
+        limiter: 共享的RateLimiter，为None时使用默认配置
+        metrics: 共享的MetricsRecorder，为None时只在内存中统计
+    """
+
+    def __init__(self, engine='http', http=None, limiter=None, metrics=None):
+        self.engine = engine
+        # 只关闭自己创建的连接池，共享的连接池由创建者负责关闭
+        self._owns_http = http is None and engine == 'http'
+        self.http = HttpFetcher() if self._owns_http else http
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.metrics = metrics if metrics is not None else MetricsRecorder()
+        self.driver = None
+        self.stats = {'http': 0, 'selenium': 0, 'fallback': 0}
+
+    def _get_driver(self):
+        # 浏览器按需启动，纯HTTP抓取时不会占用浏览器资源
+        if self.driver is None:
+            with self.metrics.timer('browser_start'):
+                self.driver = create_driver()
+        return self.driver
+
+    def _http_get(self, url):
+        """HTTP抓取，失败或命中验证页时返回None"""
+        self.metrics.record('rate_limit_wait', self.limiter.acquire(url))
+        start = time.monotonic()
+        try:
+            status_code, html = self.http.get(url)
+        except requests.RequestException as e:
+            elapsed = time.monotonic() - start
+            self.metrics.record('http_get', elapsed, url=url, error=type(e).__name__)
+            self.limiter.feedback(url, elapsed, status_code=599)
+            print(f"HTTP请求失败，回退到浏览器: {str(e)}")
+            return None
+        elapsed = time.monotonic() - start
+        self.metrics.record('http_get', elapsed, url=url, status=status_code)
+        self.metrics.count('page_loads')
+        self.metrics.count('bytes_downloaded', len(html.encode('utf-8')))
+        challenged = looks_like_challenge(status_code, html)
+        self.limiter.feedback(url, elapsed, 403 if challenged else status_code)
+        if challenged or status_code != 200:
+            print(f"HTTP响应异常(状态码 {status_code})，回退到浏览器")
+            return None
+        return html
+
+    def _selenium_get(self, driver, url):
+        """经过限速器后在浏览器中打开页面"""
+        self.metrics.record('rate_limit_wait', self.limiter.acquire(url))
+        start = time.monotonic()
+        with self.metrics.timer('browser_get', url=url):
+            driver.get(url)
+        self.metrics.count('page_loads')
+        self.limiter.feedback(url, time.monotonic() - start)
+
+    def _selenium_page_source(self, url):
+        """在新标签页中打开页面并返回渲染后的源码"""
+        driver = self._get_driver()
+        driver.execute_script("window.open('');")
+        driver.switch_to.window(driver.window_handles[-1])
+        try:
+            self._selenium_get(driver, url)
+            return driver.page_source
+        finally:
+            driver.close()
+            driver.switch_to.window(driver.window_handles[0])
+
+    def _selenium_search_rows(self, url):
+        driver = self._get_driver()
+        driver.execute_script("window.open('');")
+        driver.switch_to.window(driver.window_handles[-1])
+        try:
+            self._selenium_get(driver, url)
+
+            # 等待结果表格出现，没有表格说明没有搜索结果
+            try:
+                with self.metrics.timer('element_wait'):
+                    WebDriverWait(driver, 10).until(
+                        EC.presence_of_element_located((By.XPATH, SEARCH_TABLE_XPATH))
+                    )
+            except TimeoutException:
+                return []
+
+            # 一次脚本调用取回所有行，避免逐行逐元素的WebDriver往返
+            start = time.perf_counter()
+            rows = driver.execute_script(EXTRACT_ROWS_SCRIPT)
+            elapsed = time.perf_counter() - start
+            self.metrics.record('extract_rows', elapsed, engine='selenium', rows=len(rows))
+            print(f"结果行提取耗时: {elapsed * 1000:.1f} ms（{len(rows)} 行）")
+            return [tuple(row) if row is not None else None for row in rows]
+        finally:
+            driver.close()
+            driver.switch_to.window(driver.window_handles[0])
+
+    def search_rows(self, url):
+        """获取搜索结果行，无法识别的行以None占位"""
+        rows = None
+        if self.engine == 'http':
+            html = self._http_get(url)
+            if html is not None:
+                start = time.perf_counter()
+                rows = parse_search_rows(html, url)
+                if rows is not None:
+                    elapsed = time.perf_counter() - start
+                    self.metrics.record('extract_rows', elapsed, engine='http', rows=len(rows))
+                    print(f"结果行提取耗时: {elapsed * 1000:.1f} ms（{len(rows)} 行）")
+                    self.stats['http'] += 1
+                else:
+                    print("HTTP页面中未找到结果表格，回退到浏览器")
+            if rows is None:
+                self.stats['fallback'] += 1
+                self.metrics.count('fallbacks')
+        if rows is None:
+            self.stats['selenium'] += 1
+            rows = self._selenium_search_rows(url)
+        if not rows:
+            # 空结果页可能是被限流的信号，放慢后续请求
+            self.limiter.feedback(url, empty=True)
+        return rows
+
+    def detail_page(self, url):
+        """获取详情页HTML"""
+        if self.engine == 'http':
+            html = self._http_get(url)
+            if html is not None:
+                if DETAIL_PAGE_MARKER in html:
+                    self.stats['http'] += 1
+                    return html
+                print("HTTP详情页缺少预期内容，回退到浏览器")
+            self.stats['fallback'] += 1
+            self.metrics.count('fallbacks')
+        self.stats['selenium'] += 1
+        return self._selenium_page_source(url)
+
+    def close_driver(self):
+        """关闭浏览器会话，下次回退时会重新启动"""
+        if self.driver is not None:
+            _quit_driver(self.driver)
+            self.driver = None
+
+    def close(self):
+        self.close_driver()
+        if self._owns_http:
+            self.http.close()
+
+def match_rows(rows, material, standard=None):
+    """筛选名称和标准都匹配的搜索结果行，返回 [(名称, 详情链接, 标准), ...]"""
+    matches = []
+    for row_index, row in enumerate(rows, 1):
+        if row is None:
+            print(f"第 {row_index} 行未找到材料名称或标准元素")
+            continue
+        name, detail_link, row_standard = row
+
+        # 检查材料名称和标准是否匹配
+        if clean_name(name) == clean_name(material) and (standard is None or row_standard == standard):
+            print(f"匹配: {row_index}/{len(rows)} - 当前材料: {name} - 标准: {row_standard}")
+            matches.append(row)
+        else:
+            print(f"× 跳过第 {row_index} 行 - 材料名称或标准不匹配: {name} - {row_standard}")
+    return matches
+
+def scrape_material(material, fetcher, base_url, standard=None, state=None, cache=None, store=None, on_saved=None):
+    """爬取单个材料，返回是否找到匹配记录
+
+    指定 state（CrawlState）时会跳过已完成的材料，并从中断处继续：
+    已访问的搜索页直接使用记录的匹配结果，已保存的详情页不再下载。
+    指定 cache（SearchCache）时优先使用缓存的搜索结果行，标准过滤直接在缓存上进行；
+    state 要求重新爬取时，早于其过期时间点的缓存条目不再使用。
+    指定 store（HtmlStore）时详情页压缩保存到按内容哈希组织的存储中，否则写入 data/html_data。
+    指定 on_saved 时每保存一个详情页就调用 on_saved(材料文件夹名, 文件名)。
+    """
+    if state is not None:
+        status = state.material_status(material, standard)
+        if status is not None:
+            print(f"材料 {material} 已完成（{status}），跳过")
+            return status == 'found'
+
+    material_folder = os.path.join('data/html_data', clean_name(material))
+    if store is None and not os.path.exists(material_folder):
+        os.makedirs(material_folder, exist_ok=True)
+
+    metrics = fetcher.metrics
+    # 重新爬取过期的材料时，搜索结果也要重新获取，不能使用同样过期的缓存
+    fetched_after = state.cutoff() if state is not None else None
+    material_found = False
+    page = 1
+    max_pages = 2  # 设置最大翻页次数，避免无限循环
+
+    while not material_found and page <= max_pages:
+        current_url = base_url.format(keyword=material, page=page)
+        visited = state.get_page(material, standard, page) if state is not None else None
+        if visited is not None:
+            row_count, matches = visited['row_count'], visited['matches']
+            print(f"\n第{page}页已访问过，使用记录的 {len(matches)} 个匹配结果")
+            metrics.count('resumed_pages')
+        else:
+            rows = cache.get(material, page, fetched_after) if cache is not None else None
+            if rows is not None:
+                print(f"\n使用缓存的搜索结果: {current_url}")
+                metrics.count('cache_hits')
+            else:
+                print(f"\n访问页面: {current_url}")
+                rows = fetcher.search_rows(current_url)
+                # 空结果可能是被限流导致的，不写入缓存
+                if cache is not None and rows:
+                    cache.put(material, page, rows)
+            row_count = len(rows)
+            print(f"第{page}页找到 {row_count} 个搜索结果")
+            matches = match_rows(rows, material, standard)
+            metrics.count('matches', len(matches))
+            metrics.count('skips', row_count - len(matches))
+            if state is not None:
+                state.record_page(material, standard, page, row_count, matches)
+
+        if row_count == 0:
+            print(f"第{page}页没有搜索结果，停止翻页")
+            break
+
+        for name, detail_link, row_standard in matches:
+            material_found = True
+
+            # 生成文件名：材料名_标准
+            filename = f"{clean_name(name)}_{clean_standard(row_standard)}.html"
+            filepath = os.path.join(material_folder, filename)
+
+            if store is not None:
+                exists = store.get_hash(clean_name(material), filename) is not None
+            else:
+                exists = os.path.exists(filepath)
+            if state is not None and state.is_saved(material, standard, detail_link) and exists:
+                print(f"- 已保存过，跳过: {filepath}")
+                metrics.count('already_saved')
+                continue
+
+            page_source = fetcher.detail_page(detail_link)
+            with metrics.timer('save', material=material, file=filename) as fields:
+                fields['bytes_out'] = len(page_source.encode('utf-8'))
+                if store is not None:
+                    digest = store.put(clean_name(material), filename, page_source)
+                    print(f"√ 已保存: {clean_name(material)}/{filename} -> {digest[:12]}")
+                else:
+                    with open(filepath, 'w', encoding='utf-8') as f:
+                        f.write(page_source)
+                    print(f"√ 已保存: {filepath}")
+            metrics.count('pages_saved')
+            metrics.count('bytes_saved', len(page_source.encode('utf-8')))
+            if state is not None:
+                state.mark_saved(material, standard, detail_link)
+            if on_saved is not None:
+                on_saved(clean_name(material), filename)
+
+        if not material_found:
+            print(f"\n第{page}页未找到匹配的材料和标准，继续翻页")
+            page += 1
+
+    if not material_found:
+        print(f"\n未找到材料 {material} 的匹配记录")
+    if state is not None:
+        state.mark_material_done(material, standard, 'found' if material_found else 'not_found')
+    return material_found
+
+def scrape_materials(materials_list, fetcher, base_url, standard=None, state=None, cache=None, store=None):
     """爬取材料数据的主要函数"""
     try:
         for material_index, material in enumerate(materials_list, 1):
             print(f"\n{'='*50}")
             print(f"正在处理第 {material_index}/{len(materials_list)} 个材料: {material}")
             print(f"{'='*50}")
-            
-            material_folder = os.path.join('data/html_data', clean_name(material))
-            if not os.path.exists(material_folder):
-                os.makedirs(material_folder)
-
-            material_found = False
-            page = 1
-            max_pages = 2  # 设置最大翻页次数，避免无限循环
-
-            while not material_found and page <= max_pages:
-                # 在新标签页打开搜索页面
-                driver.execute_script("window.open('');")
-                driver.switch_to.window(driver.window_handles[-1])
-                current_url = base_url.format(keyword=material, page=page)
-                print(f"\n访问页面: {current_url}")
-                driver.get(current_url)
-                random_sleep()
-
-                rows = driver.find_elements(By.XPATH, '//table[@class="layui-table head-sticky"]/tbody/tr')
-                print(f"第{page}页找到 {len(rows)} 个搜索结果")
-                
-                if len(rows) == 0:
-                    print(f"第{page}页没有搜索结果，停止翻页")
-                    break
-
-                for row_index, row in enumerate(rows, 1):
-                    try:
-                        name_element = WebDriverWait(row, 10).until(
-                            EC.visibility_of_element_located((By.XPATH, './td[2]/a'))
-                        )
-                        name = name_element.text.strip()
-                        detail_link = name_element.get_attribute('href')
-                        
-                        # 获取标准元素
-                        standard_element = row.find_element(By.XPATH, './td[3]//b')
-                        row_standard = standard_element.text.strip()
-                    except NoSuchElementException:
-                        print(f"第 {row_index} 行未找到材料名称或标准元素")
-                        continue
-
-                    # 检查材料名称和标准是否匹配
-                    if clean_name(name) == clean_name(material) and (standard is None or row_standard == standard):
-                        material_found = True
-                        print(f"\n处理进度: {row_index}/{len(rows)} - 当前材料: {name} - 标准: {row_standard}")
-                        
-                        # 在新标签页打开详情页
-                        driver.execute_script("window.open('');")
-                        driver.switch_to.window(driver.window_handles[-1])
-                        driver.get(detail_link)
-                        random_sleep()
-                        
-                        # 生成文件名：材料名_标准
-                        filename = f"{clean_name(name)}_{clean_standard(row_standard)}.html"
-                        filepath = os.path.join(material_folder, filename)
-                        
-                        with open(filepath, 'w', encoding='utf-8') as f:
-                            f.write(driver.page_source)
-                        print(f"√ 已保存: {filepath}")
-
-                        # 关闭详情页标签
-                        driver.close()
-                        driver.switch_to.window(driver.window_handles[-1])
-                    else:
-                        print(f"× 跳过第 {row_index} 行 - 材料名称或标准不匹配: {name} - {row_standard}")
-                
-                # 关闭当前页面标签
-                driver.close()
-                driver.switch_to.window(driver.window_handles[0])
-                
-                if not material_found:
-                    print(f"\n第{page}页未找到匹配的材料和标准，继续翻页")
-                    page += 1
-                
-            if not material_found:
-                print(f"\n未找到材料 {material} 的匹配记录")
-            
+
+            with fetcher.metrics.timer('material', material=material):
+                scrape_material(material, fetcher, base_url, standard, state, cache, store)
+
             print(f"\n{'*'*30}")
             print(f"材料 {material} 处理完成")
             print(f"{'*'*30}")
@@ -174,68 +567,174 @@ def scrape_materials(materials_list, driver, base_url, standard=None):
         print(f"\n发生错误: {str(e)}")
     finally:
         print("\n正在关闭浏览器...")
-        driver.quit()
+        fetcher.close()
+        print(f"页面抓取统计: HTTP {fetcher.stats['http']} 次, 浏览器 {fetcher.stats['selenium']} 次, 回退 {fetcher.stats['fallback']} 次")
+        fetcher.limiter.report()
+        if cache is not None:
+            cache.report()
+        fetcher.metrics.print_summary()
         print("任务完成！")
 
+def _scrape_worker(worker_id, work_queue, results, max_retries, fetcher_args, base_url, scrape_kwargs):
+    """工作线程：持有独立的浏览器会话，从共享队列中领取材料"""
+    fetcher = PageFetcher(*fetcher_args)
+    try:
+        while True:
+            try:
+                material_index, material, attempt = work_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            prefix = f"[worker {worker_id}]"
+            print(f"\n{prefix} 正在处理第 {material_index} 个材料: {material}")
+            try:
+                with fetcher.metrics.timer('material', material=material, worker=worker_id):
+                    found = scrape_material(material, fetcher, base_url, **scrape_kwargs)
+                results[material] = 'found' if found else 'not_found'
+                print(f"{prefix} 材料 {material} 处理完成")
+            except WebDriverException as e:
+                # 浏览器会话崩溃：丢弃当前会话，材料重新入队由任意工作线程重试
+                print(f"{prefix} 浏览器会话异常 ({material}): {str(e).splitlines()[0] if str(e) else e}")
+                fetcher.close_driver()
+                if attempt < max_retries:
+                    fetcher.metrics.count('retries', material=material)
+                    work_queue.put((material_index, material, attempt + 1))
+                else:
+                    results[material] = 'error'
+            except Exception as e:
+                print(f"{prefix} 处理材料 {material} 时出错: {str(e)}")
+                results[material] = 'error'
+            finally:
+                work_queue.task_done()
+    finally:
+        fetcher.close()
+
+def scrape_materials_parallel(materials_list, base_url, standard=None, workers=2, max_retries=1, engine='http',
+                              limiter=None, state=None, cache=None, store=None, metrics=None, on_saved=None):
+    """使用多个独立浏览器会话并行爬取材料，HTTP引擎下各线程共享同一个连接池
+
+    Args:
+        materials_list: 要爬取的材料列表
+        base_url: 搜索页地址模板
+        standard: 指定的标准，默认为None表示不过滤
+        workers: 浏览器会话数量
+        max_retries: 浏览器会话崩溃时单个材料的最大重试次数
+        engine: 抓取引擎，'http' 或 'selenium'
+        limiter: 所有工作线程共享的RateLimiter，为None时使用默认配置
+        state: 所有工作线程共享的CrawlState，为None时不记录爬取进度
+        cache: 所有工作线程共享的SearchCache，为None时不缓存搜索结果
+        store: 所有工作线程共享的HtmlStore，为None时详情页写入 data/html_data
+        metrics: 所有工作线程共享的MetricsRecorder，为None时只在内存中统计
+        on_saved: 每保存一个详情页时调用的回调，见 scrape_material
+    Returns:
+        dict: 材料名称 -> 处理结果（found/not_found/error）
+    """
+    work_queue = queue.Queue()
+    for material_index, material in enumerate(materials_list, 1):
+        work_queue.put((material_index, material, 0))
+
+    http = HttpFetcher(pool_size=max(workers, 10)) if engine == 'http' else None
+    limiter = limiter if limiter is not None else RateLimiter()
+    metrics = metrics if metrics is not None else MetricsRecorder()
+    scrape_kwargs = {'standard': standard, 'state': state, 'cache': cache, 'store': store, 'on_saved': on_saved}
+    results = {}
+    threads = []
+    for worker_id in range(1, min(workers, len(materials_list)) + 1):
+        thread = threading.Thread(
+            target=_scrape_worker,
+            args=(worker_id, work_queue, results, max_retries, (engine, http, limiter, metrics), base_url, scrape_kwargs),
+            daemon=True,
+        )
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+    if http is not None:
+        http.close()
+
+    failed = [m for m, status in results.items() if status == 'error']
+    missing = [m for m, status in results.items() if status == 'not_found']
+    print(f"\n{'*'*30}")
+    print(f"并行爬取完成: 共 {len(materials_list)} 个材料, 未找到 {len(missing)} 个, 失败 {len(failed)} 个")
+    if failed:
+        print(f"失败的材料: {', '.join(failed)}")
+    limiter.report()
+    if cache is not None:
+        cache.report()
+    metrics.print_summary()
+    print("任务完成！")
+    return results
+
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='爬取材料数据')
     parser.add_argument('-m', '--material', type=str, help='指定要爬取的单个材料', default=None)
     parser.add_argument('-s', '--standard', type=str, help='指定材料的对应标准（如包含空格请用引号括起来）', default=None, nargs='+')
+    parser.add_argument('-w', '--workers', type=int, help='并行的浏览器会话数量', default=1)
+    parser.add_argument('--engine', choices=['http', 'selenium'], default='http',
+                        help='抓取引擎：http 优先使用HTTP请求，必要时回退到浏览器；selenium 始终使用浏览器')
+    parser.add_argument('--base-url', type=str, help='搜索页地址模板（可指向本地测试服务器）',
+                        default=DEFAULT_BASE_URL)
+    parser.add_argument('--rps', type=float, help='每个主机每秒允许的请求数', default=0.5)
+    parser.add_argument('--burst', type=int, help='允许的突发请求数', default=1)
+    parser.add_argument('--jitter', type=float, help='每次请求附加的随机等待上限（秒）', default=1.0)
+    parser.add_argument('--refresh-older-than', type=str, default=None,
+                        help='重新爬取早于该时长的记录（如 12h、7d；0 表示全部重新爬取），默认从上次中断处继续')
+    parser.add_argument('--cache-ttl', type=str, help='搜索结果缓存的有效期（如 12h、7d）', default='7d')
+    parser.add_argument('--cache-size', type=int, help='搜索结果缓存最多保留的条目数', default=5000)
+    parser.add_argument('--no-cache', action='store_true', help='不使用搜索结果缓存')
+    parser.add_argument('--metrics', type=str, help='指标文件路径（JSON lines），默认写入 data/metrics/', default=None)
+    parser.add_argument('--run-id', type=str, help='写入每条指标记录的运行标识，run_pipeline 调用时传入以便汇总', default=None)
     args = parser.parse_args()
     
     # 如果标准是以列表形式传入的，将其合并为字符串
     standard = ' '.join(args.standard) if args.standard else None
     print(f"标准: {standard}")
     
-    # 所有可用的材料列表
-    all_materials = ['06Cr19Ni10', '10', '10#', '100C6', '100Cr6', '100Cr6-E', '100Cr6-G', 
-                    '100Cr6A', '100CrMnMoSi8-4-6', '100CrMnSi6-4', '100CrMo7-3', '100CrMo7-4', 
-                    '10B50', '10MnCrNi', '10MnCrNiMo', '16MnCr5', '16MnCr5H', '18CrMo4', 
-                    '18CrNiMo7-6', '18Ni300',  '20Cr', '20CrMnTiH', '20CrMo', '20CrNiMo', 
-                    '20MnCr5', '20MnCr5ZR', '31CrMnV9ZR', '34Cr4',  '38CrMoAl', '40Cr', 
-                    '42CRMO', '42CrMo4', '440B', '44SMn28', '45#', '50CrMo4', '52100', '55#', 
-                    '55#钢', '65Mn', '8620H', '8Cr4Mo4V', '9Cr18Mo', 'C20', 'C45', 'CF53', 
-                    'Cr12MoV', 'EP4', 'EP6', 'GCr15', 'GCr15SiMn', 'GCr18Mo', 'K1010',  
-                    'M2高速钢', 'M50', 'S43C', 'S45C', 'S53C', 'SAE1055', 'SAE5120', 'SCM415H', 
-                    'SCM420H', 'SKF3L', 'SNCM439', 'SUJ2', 'SUJ2S1', 'W6Mo5Cr4V2', 'X45NiCrMo4', 
-                    'ZF7B']
-    
     # 确定要处理的材料列表
-    materials_to_process = [args.material] if args.material else all_materials
+    materials_to_process = [args.material] if args.material else ALL_MATERIALS
     
-    if args.material and args.material not in all_materials:
+    if args.material and args.material not in ALL_MATERIALS:
         print(f"警告：材料 '{args.material}' 不在预定义的材料列表中")
         proceed = input("是否继续？(y/n): ")
         if proceed.lower() != 'y':
             print("已取消操作")
             return
     
-    # 创建数据目录
-    if not os.path.exists('data/html_data'):
-        os.makedirs('data/html_data')
-    
-    # 设置浏览器选项
-    option = ChromeOptions()
-    # ... 保持原有的浏览器选项设置 ...
-    
-    print("正在启动浏览器...")
-    driver = webdriver.Chrome(option)
+    base_url = args.base_url
+    # 所有请求共享同一个限速器
+    limiter = RateLimiter(rate=args.rps, burst=args.burst, jitter=args.jitter)
+    # 爬取进度，用于中断后继续
+    refresh_older_than = parse_age(args.refresh_older_than) if args.refresh_older_than else None
+    state = CrawlState(refresh_older_than=refresh_older_than)
+    # 搜索结果缓存，同一材料按不同标准爬取时不再重复下载搜索页
+    cache = None if args.no_cache else SearchCache(ttl=parse_age(args.cache_ttl), max_entries=args.cache_size)
+    # 详情页按内容哈希压缩存储
+    store = HtmlStore()
+    # 分阶段耗时和计数
+    metrics = MetricsRecorder(args.metrics or default_metrics_path('scrape'), run_id=args.run_id)
     
-    # 使用 CDP 命令修改 webdriver 属性
-    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
-        'source': '''
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            })
-        '''
-    })
-    
-    base_url = "https://www.caishuku.com/material/?keyword={keyword}&page={page}"
-    
-    # 执行爬取
-    scrape_materials(materials_to_process, driver, base_url, standard)
+    try:
+        if args.workers > 1:
+            # 多个独立浏览器会话并行爬取
+            print(f"正在启动 {args.workers} 个工作线程...")
+            scrape_materials_parallel(materials_to_process, base_url, standard, args.workers,
+                                      engine=args.engine, limiter=limiter, state=state, cache=cache, store=store, metrics=metrics)
+            return
+        
+        # 浏览器在需要时才会启动
+        fetcher = PageFetcher(args.engine, limiter=limiter, metrics=metrics)
+        
+        # 执行爬取
+        scrape_materials(materials_to_process, fetcher, base_url, standard, state, cache, store)
+    finally:
+        state.close()
+        store.close()
+        metrics.close()
+        if cache is not None:
+            cache.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
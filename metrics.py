@@ -0,0 +1,201 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# 指标文件默认保存目录
+DEFAULT_METRICS_DIR = 'data/metrics'
+
+def percentile(values, pct):
+    """计算百分位数（最近秩法），values 为空时返回0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+def default_metrics_path(prefix):
+    """生成 data/metrics/<前缀>_<时间戳>.jsonl 形式的指标文件路径"""
+    return os.path.join(DEFAULT_METRICS_DIR, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+
+class MetricsRecorder:
+    """线程安全的分阶段计时器和计数器
+
+    每次计时和计数都会作为一行JSON写入指标文件，便于事后分析；
+    path 为None时只在内存中统计。
+
+    Args:
+        path: JSON lines 指标文件路径
+        run_id: 本次运行的标识，写入每条记录
+    """
+
+    def __init__(self, path=None, run_id=None):
+        self.path = path
+        self.run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.durations = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(path, 'a', encoding='utf-8')
+
+    def event(self, event_type, **fields):
+        """写入一条原始事件"""
+        record = {'ts': time.time(), 'run_id': self.run_id, 'type': event_type, **fields}
+        if self._file is not None:
+            line = json.dumps(record, ensure_ascii=False)
+            with self._lock:
+                self._file.write(line + '\n')
+                self._file.flush()
+
+    def record(self, phase, duration, **fields):
+        """记录一次阶段耗时（秒），记录的 ts 为结束时间，start 为开始时间"""
+        with self._lock:
+            self.durations.setdefault(phase, []).append(duration)
+        self.event('timer', phase=phase, start=round(time.time() - duration, 6), duration=round(duration, 6), **fields)
+
+    @contextmanager
+    def timer(self, phase, **fields):
+        """对代码块计时，异常时记录错误类型后继续抛出
+
+        返回的字典会随记录一起写入，代码块中可以补充字节数、token数等字段。
+        """
+        fields = dict(fields)
+        start = time.perf_counter()
+        try:
+            yield fields
+        except Exception as e:
+            fields['error'] = type(e).__name__
+            self.record(phase, time.perf_counter() - start, **fields)
+            raise
+        self.record(phase, time.perf_counter() - start, **fields)
+
+    def count(self, name, value=1, **fields):
+        """累加计数器"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        self.event('counter', name=name, value=value, **fields)
+
+    def summary(self):
+        """返回 {阶段: {'count', 'total', 'p50', 'p95', 'max'}}"""
+        with self._lock:
+            durations = {phase: list(values) for phase, values in self.durations.items()}
+        return {
+            phase: {
+                'count': len(values),
+                'total': sum(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'max': max(values),
+            }
+            for phase, values in durations.items()
+        }
+
+    def print_summary(self):
+        """打印各阶段耗时的 p50/p95 以及计数器"""
+        summary = self.summary()
+        if summary:
+            print(f"\n{'阶段':<20}{'次数':>8}{'总耗时(s)':>12}{'p50(s)':>10}{'p95(s)':>10}{'最大(s)':>10}")
+            for phase, stats in sorted(summary.items(), key=lambda x: -x[1]['total']):
+                print(f"{phase:<20}{stats['count']:>8}{stats['total']:>12.2f}"
+                      f"{stats['p50']:>10.3f}{stats['p95']:>10.3f}{stats['max']:>10.3f}")
+        if self.counters:
+            print("计数: " + ", ".join(f"{name}={value}" for name, value in sorted(self.counters.items())))
+        if self.path:
+            print(f"指标已写入: {self.path}")
+
+    def close(self):
+        self.event('summary', phases=self.summary(), counters=dict(self.counters))
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def load_events(paths):
+    """读取一个或多个指标文件中的所有事件"""
+    events = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    events.append(json.loads(line))
+    return events
+
+# 汇总时累加的数值字段
+_TOTAL_FIELDS = ('bytes_in', 'bytes_out', 'tokens_in', 'tokens_out', 'retries')
+
+def aggregate(events):
+    """按阶段汇总计时事件
+
+    吞吐量为次数除以该阶段在各次运行中的实际跨度（最早开始到最晚结束）之和，
+    并发执行时高于 1/平均耗时。
+
+    Returns:
+        {阶段: {'count', 'total', 'p50', 'p95', 'p99', 'max', 'errors', 'throughput', 及 _TOTAL_FIELDS 中的字段}}
+    """
+    phases = {}
+    for event in events:
+        if event.get('type') != 'timer':
+            continue
+        phases.setdefault(event['phase'], []).append(event)
+
+    summary = {}
+    for phase, items in phases.items():
+        durations = [item['duration'] for item in items]
+        spans = {}
+        for item in items:
+            start = item.get('start', item['ts'] - item['duration'])
+            first, last = spans.get(item['run_id'], (start, item['ts']))
+            spans[item['run_id']] = (min(first, start), max(last, item['ts']))
+        wall = sum(last - first for first, last in spans.values())
+        stats = {
+            'count': len(items),
+            'total': sum(durations),
+            'p50': percentile(durations, 50),
+            'p95': percentile(durations, 95),
+            'p99': percentile(durations, 99),
+            'max': max(durations),
+            'errors': sum(1 for item in items if item.get('error')),
+            'throughput': len(items) / wall if wall else 0.0,
+        }
+        for field in _TOTAL_FIELDS:
+            stats[field] = sum(item.get(field) or 0 for item in items)
+        summary[phase] = stats
+    return summary
+
+def slowest(events, top=10, phase=None):
+    """耗时最长的文件级计时事件（带 file 字段）"""
+    items = [event for event in events
+             if event.get('type') == 'timer' and event.get('file') and (phase is None or event['phase'] == phase)]
+    return sorted(items, key=lambda item: -item['duration'])[:top]
+
+def print_report(events, top=10, phase=None):
+    """打印各阶段的 p50/p95/p99、吞吐量、字节数、token数以及耗时最长的文件"""
+    summary = aggregate(events)
+    if phase:
+        summary = {name: stats for name, stats in summary.items() if name == phase}
+    runs = sorted({event['run_id'] for event in events})
+    print(f"共 {len(runs)} 次运行: {', '.join(runs)}")
+    if not summary:
+        print("没有计时记录")
+        return
+    print(f"\n{'阶段':<16}{'次数':>8}{'错误':>6}{'p50(s)':>10}{'p95(s)':>10}{'p99(s)':>10}{'最大(s)':>10}"
+          f"{'吞吐量(/s)':>12}{'输入MB':>10}{'输出MB':>10}{'输入token':>12}{'输出token':>12}{'重试':>6}")
+    for name, stats in sorted(summary.items(), key=lambda x: -x[1]['total']):
+        print(f"{name:<16}{stats['count']:>8}{stats['errors']:>6}{stats['p50']:>10.3f}{stats['p95']:>10.3f}"
+              f"{stats['p99']:>10.3f}{stats['max']:>10.3f}{stats['throughput']:>12.2f}"
+              f"{stats['bytes_in'] / 1048576:>10.2f}{stats['bytes_out'] / 1048576:>10.2f}"
+              f"{stats['tokens_in']:>12}{stats['tokens_out']:>12}{stats['retries']:>6}")
+
+    items = slowest(events, top, phase)
+    if items:
+        print(f"\n耗时最长的 {len(items)} 个文件:")
+        for item in items:
+            where = f"{item['material']}/{item['file']}" if item.get('material') else item['file']
+            print(f"  {item['duration']:>8.3f}s  {item['phase']:<10}{where}" + (f"  [{item['error']}]" if item.get('error') else ''))
@@ -1,10 +1,28 @@
 import subprocess
 import argparse
+import glob
+import json
+import queue
+import threading
 import time
 import os
+import sys
 from datetime import datetime
-import glob
 from typing import List, Set, Tuple
+from html_store import HtmlStore, content_hash
+from html_cleaner import CLEANERS, clean_stored_page, cleaner_version, load_manifest, save_manifest
+from html2Json import PROMPTS, AdaptiveLimiter, extractor_version, process_file
+from build_graph import clean_reason, json_reason, plan, print_plan, record_json
+from llm_cache import LlmCache
+from metal_materials_scraper import (ALL_MATERIALS, DEFAULT_BASE_URL, HttpFetcher, PageFetcher, RateLimiter,
+                                     WebDriverException, clean_name, scrape_material, scrape_materials_parallel)
+from crawl_state import CrawlState
+from search_cache import SearchCache
+from metrics import DEFAULT_METRICS_DIR, MetricsRecorder, default_metrics_path, load_events, print_report
+
+CLEAN_HTML_DIR = "./data/clean_html_data"
+JSON_DIR = "./data/JsonData"
+REPORT_DIR = "./data/reports"
 
 def print_section_header(title):
     """打印带格式的章节标题"""
@@ -49,151 +67,609 @@ def run_command(command, description):
         print(f"\n✗ 执行出错: {str(e)}")
         return False
 
-def get_files_to_process(material_name: str, start_time: float = None) -> Tuple[List[str], bool]:
+class Pipeline:
+    """在同一进程中清理和转换页面
+
+    存储索引、清理清单、JSON清单、模型客户端、限流器和模型响应缓存在所有文件之间共享，
+    不再为每个文件的每个步骤启动子进程。每个页面按 build_graph 的依赖关系只重新生成已过期的产物。
+
+    Args:
+        engine: 清理引擎，见 html_cleaner.CLEANERS
+        mode: 提取方式，见 html2Json.extract_material
+        llm_workers: 模型请求的最大并发数
+        use_cache: 是否使用模型响应缓存
+        prompt: 提示词方案，见 html2Json.PROMPTS
+        metrics: 共享的MetricsRecorder，每个文件的清理和转换各写入一条记录；为None时只在内存中统计
     """
-    获取需要处理的文件列表
+
+    def __init__(self, engine='bs4', mode='auto', llm_workers=1, use_cache=True, prompt='full', metrics=None):
+        self.engine = engine
+        self.mode = mode
+        self.prompt = prompt
+        self.extractor = extractor_version(mode, prompt)
+        self.store = HtmlStore()
+        self.manifest = load_manifest(CLEAN_HTML_DIR)
+        self.json_manifest = load_manifest(JSON_DIR)
+        self.limiter = AdaptiveLimiter(llm_workers)
+        self.cache = LlmCache() if use_cache else None
+        self.metrics = metrics if metrics is not None else MetricsRecorder()
+        self._manifest_lock = threading.Lock()
+
+    def clean(self, material, file):
+        """清理一个页面，返回清理后的HTML"""
+        with self.metrics.timer('clean', material=material, file=file) as fields:
+            manifest = {}
+            html = clean_stored_page(self.store, material, file, CLEAN_HTML_DIR, manifest, self.engine)
+            fields['bytes_in'] = self.store.page_size(material, file)
+            fields['bytes_out'] = len(html.encode('utf-8'))
+        with self._manifest_lock:
+            self.manifest.update(manifest)
+        return html
+
+    def prepare(self, material, file):
+        """返回页面清理后的HTML，清理结果已是最新时直接读取，不再重新清理"""
+        digest = self.store.get_hash(material, file)
+        with self._manifest_lock:
+            reason = (clean_reason(self.manifest, material, file, digest, cleaner_version(self.engine), CLEAN_HTML_DIR)
+                      if digest is not None else '原始页面缺失')
+        if reason is None:
+            with open(os.path.join(CLEAN_HTML_DIR, material, file), 'r', encoding='utf-8') as f:
+                return f.read()
+        html = self.clean(material, file)
+        print(f"✓ HTML清理（{reason}） - {material}/{file}")
+        return html
+
+    def extract(self, material, file, html):
+        """将清理后的HTML转换为JSON，返回 html2Json.process_file 的处理记录"""
+        os.makedirs(os.path.join(JSON_DIR, material), exist_ok=True)
+        json_path = os.path.join(JSON_DIR, material, file.replace('.html', '.json'))
+        with self.metrics.timer('extract', material=material, file=file) as fields:
+            record = process_file(os.path.join(CLEAN_HTML_DIR, material, file), json_path,
+                                  self.mode, self.limiter, self.cache, self.prompt, html=html)
+            fields.update(record['usage'])
+            fields['bytes_in'] = len(html.encode('utf-8'))
+            if record['status'] == 'ok':
+                fields['bytes_out'] = os.path.getsize(json_path)
+            else:
+                fields['error'] = record['error_type']
+        if record['status'] == 'ok':
+            with self._manifest_lock:
+                record_json(self.json_manifest, material, file, record['input_hash'], record['extractor'])
+        return record
+
+    def convert(self, material, file, html):
+        """JSON已过期时重新转换，返回处理记录；未过期时状态为 skipped"""
+        with self._manifest_lock:
+            reason = json_reason(self.json_manifest, material, file, content_hash(html), self.extractor, JSON_DIR)
+        if reason is None:
+            print(f"- JSON已是最新，跳过 - {material}/{file}")
+            self.metrics.count('up_to_date', material=material, file=file)
+            return {'file': file, 'status': 'skipped', 'error': None, 'sources': {}}
+        record = self.extract(material, file, html)
+        if record['status'] == 'ok':
+            print(f"✓ JSON转换（{reason}） - {material}/{file}")
+        else:
+            print(f"✗ {material}/{file} JSON转换失败，继续处理下一个文件")
+        return record
+
+    def process(self, material, stem):
+        """清理并转换一个文件，只重新生成已过期的产物，返回处理记录"""
+        file = f"{stem}.html"
+        try:
+            html = self.prepare(material, file)
+        except Exception as e:
+            print(f"\n✗ {stem} HTML清理失败: {e}，继续处理下一个文件")
+            return {'file': file, 'status': 'failed', 'error': f"{type(e).__name__}: {e}", 'sources': {}}
+        return self.convert(material, file, html)
+
+    def close(self):
+        with self._manifest_lock:
+            save_manifest(CLEAN_HTML_DIR, self.manifest)
+            if self.json_manifest:
+                os.makedirs(JSON_DIR, exist_ok=True)
+                save_manifest(JSON_DIR, self.json_manifest)
+        self.store.close()
+        if self.cache is not None:
+            self.cache.close()
+
+def get_files_to_process(material_name: str, engine: str = 'bs4', mode: str = 'auto',
+                         prompt: str = 'full') -> Tuple[List[str], bool]:
+    """
+    获取需要处理的文件列表：清理结果或JSON已过期的文件，见 build_graph.plan
     返回: (文件列表, 是否为新材料)
     """
-    html_path = f"./data/html_data/{material_name}"
-    clean_html_path = f"./data/clean_html_data/{material_name}"
-    
     # 检查是否为新材料
-    is_new_material = not os.path.exists(clean_html_path)
-    
-    if not os.path.exists(html_path):
-        return [], is_new_material
-    
-    # 获取所有原始HTML文件和已清理的HTML文件
-    html_files = set(os.path.splitext(os.path.basename(f))[0] 
-                    for f in glob.glob(os.path.join(html_path, "*.html")))
-    
-    if os.path.exists(clean_html_path):
-        clean_files = set(os.path.splitext(os.path.basename(f))[0] 
-                         for f in glob.glob(os.path.join(clean_html_path, "*.html")))
-    else:
-        clean_files = set()
-    
-    # 找出需要处理的文件
-    files_to_process = []
-    
-    if start_time:
-        # 如果指定了开始时间，只处理新爬取的文件
-        new_files = [f for f in html_files 
-                    if os.path.getctime(os.path.join(html_path, f + ".html")) >= start_time]
-        files_to_process.extend(new_files)
-    else:
-        # 否则处理所有未清理的文件
-        files_to_process.extend(html_files - clean_files)
-    
-    return sorted(files_to_process), is_new_material
+    is_new_material = not os.path.exists(os.path.join(CLEAN_HTML_DIR, material_name))
+    targets = plan("./data", CLEAN_HTML_DIR, JSON_DIR, engine, extractor_version(mode, prompt), material_name)
+    return sorted(os.path.splitext(target['file'])[0] for target in targets), is_new_material
+
+def stream_material(pipeline, material, standard=None, crawl=True, clean_workers=2, extract_workers=4,
+                    queue_size=16, base_url=DEFAULT_BASE_URL, scrape_engine='http'):
+    """边爬取边清理和转换：爬取、清理、转换三个阶段通过有界队列连接，各自并发执行
+
+    爬虫每保存一个详情页就立即放入清理队列，清理完成后放入转换队列；
+    队列满时上游阶段等待，避免清理或转换跟不上时堆积过多页面。
+    开始前先放入已有的需要处理的文件（见 get_files_to_process）。
+    只爬取一个材料，爬取阶段使用单个会话，同一站点的请求本就由限速器串行放行。
+    同一文件的同一内容只处理一次，本次运行中重新下载且内容变化的页面会再次处理。
+
+    Args:
+        pipeline: 共享的 Pipeline
+        material: 材料名称
+        standard: 指定的标准，默认为None表示不过滤
+        crawl: 是否爬取，为False时只处理已有的文件
+        clean_workers: 清理阶段的线程数
+        extract_workers: 转换阶段的线程数
+        queue_size: 每个队列最多缓存的页面数
+        base_url: 搜索页地址模板
+        scrape_engine: 抓取引擎，'http' 或 'selenium'
+    Returns:
+        list: 每个文件的处理记录，格式同 Pipeline.process
+    """
+    clean_queue = queue.Queue(queue_size)
+    extract_queue = queue.Queue(queue_size)
+    records = []
+    queued = set()
+    queued_lock = threading.Lock()
+
+    def enqueue(folder, file):
+        # 按内容哈希去重，已在队列中的旧内容在清理时也会读取存储中的最新内容
+        key = (folder, file, pipeline.store.get_hash(folder, file))
+        with queued_lock:
+            if key in queued:
+                return
+            queued.add(key)
+        clean_queue.put((folder, file, time.perf_counter()))
+
+    def clean_worker():
+        while True:
+            item = clean_queue.get()
+            if item is None:
+                break
+            folder, file, queued_at = item
+            pipeline.metrics.record('clean_wait', time.perf_counter() - queued_at)
+            try:
+                html = pipeline.prepare(folder, file)
+            except Exception as e:
+                print(f"\n✗ {file} HTML清理失败: {e}，继续处理下一个文件")
+                records.append({'file': file, 'status': 'failed', 'error': f"{type(e).__name__}: {e}", 'sources': {}})
+                continue
+            extract_queue.put((folder, file, html, time.perf_counter()))
+
+    def extract_worker():
+        while True:
+            item = extract_queue.get()
+            if item is None:
+                break
+            folder, file, html, queued_at = item
+            pipeline.metrics.record('extract_wait', time.perf_counter() - queued_at)
+            try:
+                records.append(pipeline.convert(folder, file, html))
+            except Exception as e:
+                print(f"\n✗ {file} JSON转换失败: {e}，继续处理下一个文件")
+                records.append({'file': file, 'status': 'failed', 'error': f"{type(e).__name__}: {e}", 'sources': {}})
+
+    cleaners = [threading.Thread(target=clean_worker, daemon=True) for _ in range(clean_workers)]
+    extractors = [threading.Thread(target=extract_worker, daemon=True) for _ in range(extract_workers)]
+    for thread in cleaners + extractors:
+        thread.start()
+
+    try:
+        # 与爬虫保存页面时使用同一个文件夹名
+        folder = clean_name(material)
+        files, _ = get_files_to_process(folder, pipeline.engine, pipeline.mode, pipeline.prompt)
+        for stem in files:
+            enqueue(folder, f"{stem}.html")
+        if crawl:
+            state = CrawlState()
+            cache = SearchCache()
+            try:
+                with pipeline.metrics.timer('scrape', material=material):
+                    scrape_materials_parallel([material], base_url, standard, 1, engine=scrape_engine,
+                                              limiter=RateLimiter(), state=state, cache=cache,
+                                              store=pipeline.store, metrics=pipeline.metrics, on_saved=enqueue)
+            finally:
+                state.close()
+                cache.close()
+    finally:
+        # 上游结束后依次通知下游的每个线程退出
+        for _ in cleaners:
+            clean_queue.put(None)
+        for thread in cleaners:
+            thread.join()
+        for _ in extractors:
+            extract_queue.put(None)
+        for thread in extractors:
+            thread.join()
+    return records
+
+def load_jobs(materials=None, materials_file=None, standard=None):
+    """生成批量处理的任务列表 [{'material', 'standard', 'priority'}, ...]
+
+    materials 中的 "all" 表示爬虫中预定义的全部材料。materials_file 每行一个任务，
+    格式为 "材料 | 标准 | 优先级"，标准和优先级可以省略，# 开头的行为注释。
+    同一 (材料, 标准) 只保留优先级最高的一个任务。
+    """
+    jobs = {}
+
+    def add(material, job_standard, priority):
+        key = (material, job_standard)
+        if key not in jobs or priority > jobs[key]['priority']:
+            jobs[key] = {'material': material, 'standard': job_standard, 'priority': priority}
+
+    for material in materials or []:
+        for name in (ALL_MATERIALS if material.lower() == 'all' else [material]):
+            add(name, standard, 0)
+    if materials_file:
+        with open(materials_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                parts = [part.strip() for part in line.split('|')]
+                material = parts[0]
+                job_standard = parts[1] if len(parts) > 1 and parts[1] else standard
+                priority = int(parts[2]) if len(parts) > 2 and parts[2] else 0
+                if material.lower() == 'all':
+                    for name in ALL_MATERIALS:
+                        add(name, job_standard, priority)
+                else:
+                    add(material, job_standard, priority)
+    return list(jobs.values())
+
+def _run_job(pipeline, fetcher, job, crawl, base_url, state, cache, folder_lock):
+    """执行一个任务：爬取（可选），然后清理并转换该材料需要处理的文件，返回处理记录列表
+
+    同一材料不同标准的任务共用一个文件夹，清理和转换在 folder_lock 下进行，
+    后执行的任务只会看到前一个任务没有处理的文件，不会重复请求模型或同时写入同一个JSON。
+    """
+    if crawl:
+        with pipeline.metrics.timer('scrape', material=job['material']):
+            scrape_material(job['material'], fetcher, base_url, job['standard'], state, cache, pipeline.store)
+    folder = clean_name(job['material'])
+    with folder_lock:
+        files, _ = get_files_to_process(folder, pipeline.engine, pipeline.mode, pipeline.prompt)
+        return [pipeline.process(folder, stem) for stem in files]
+
+def run_jobs(pipeline, jobs, workers=2, retries=1, crawl=True, base_url=DEFAULT_BASE_URL, scrape_engine='http'):
+    """按优先级在工作线程池中执行批量任务，返回每个任务的结果
+
+    每个工作线程持有一个浏览器会话，在它执行的所有任务之间复用；HTTP连接池、
+    限速器、爬取进度、搜索缓存以及 pipeline 中的存储、模型客户端和缓存由所有线程共享。
+    任务出错或有文件转换失败时重新入队，最多重试 retries 次；重试时只处理还没有成功的文件。
+
+    Args:
+        pipeline: 共享的 Pipeline
+        jobs: load_jobs 生成的任务列表
+        workers: 工作线程数
+        retries: 每个任务的最大重试次数
+        crawl: 是否爬取，为False时只处理已有的文件
+        base_url: 搜索页地址模板
+        scrape_engine: 抓取引擎，'http' 或 'selenium'
+    Returns:
+        list: [{'material', 'standard', 'priority', 'status', 'attempts', 'files', 'failed', 'error', 'elapsed'}, ...]
+    """
+    work_queue = queue.PriorityQueue()
+    for index, job in enumerate(jobs):
+        # 优先级高的先执行，相同优先级按输入顺序
+        work_queue.put((-job['priority'], index, 0))
+    results = {}
+    folder_locks = {clean_name(job['material']): threading.Lock() for job in jobs}
+    http = HttpFetcher(pool_size=max(workers, 10)) if crawl and scrape_engine == 'http' else None
+    limiter = RateLimiter()
+    state = CrawlState() if crawl else None
+    cache = SearchCache() if crawl else None
+
+    def worker():
+        fetcher = PageFetcher(scrape_engine, http, limiter, pipeline.metrics) if crawl else None
+        try:
+            while True:
+                try:
+                    priority, index, attempt = work_queue.get_nowait()
+                except queue.Empty:
+                    break
+                job = jobs[index]
+                name = f"{job['material']}" + (f" ({job['standard']})" if job['standard'] else '')
+                print(f"\n>>> 开始任务: {name}" + (f"，第 {attempt + 1} 次尝试" if attempt else ''))
+                start = time.perf_counter()
+                error = error_type = None
+                try:
+                    records = _run_job(pipeline, fetcher, job, crawl, base_url, state, cache,
+                                       folder_locks[clean_name(job['material'])])
+                    failed = [record['file'] for record in records if record['status'] == 'failed']
+                    if failed:
+                        error = f"{len(failed)} 个文件处理失败"
+                        error_type = next(record.get('error_type') for record in records if record['status'] == 'failed')
+                except Exception as e:
+                    if isinstance(e, WebDriverException) and fetcher is not None:
+                        # 浏览器会话崩溃：丢弃当前会话，下一个任务重新启动
+                        fetcher.close_driver()
+                    records, failed = [], []
+                    error = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+                    error_type = type(e).__name__
+                elapsed = time.perf_counter() - start
+                pipeline.metrics.record('job', elapsed, material=job['material'], standard=job['standard'],
+                                        attempt=attempt + 1, files=len(records), error=error_type)
+                previous = results.get(index, {'files': 0, 'elapsed': 0.0})
+                results[index] = {
+                    **job,
+                    'status': 'ok' if error is None else 'failed',
+                    'attempts': attempt + 1,
+                    'files': previous['files'] + sum(1 for record in records if record['status'] == 'ok'),
+                    'failed': failed,
+                    'error': error,
+                    'elapsed': previous['elapsed'] + elapsed,
+                }
+                if error is not None and attempt < retries:
+                    print(f"<<< 任务 {name} 失败（{error}），稍后重试")
+                    pipeline.metrics.count('job_retries', material=job['material'])
+                    work_queue.put((priority, index, attempt + 1))
+                else:
+                    print(f"<<< 任务 {name} " + ('完成' if error is None else f"失败: {error}") + f"，耗时 {elapsed:.1f}s")
+        finally:
+            if fetcher is not None:
+                fetcher.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(workers, len(jobs)))]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if http is not None:
+            http.close()
+        if state is not None:
+            state.close()
+        if cache is not None:
+            cache.close()
+    return [results[index] for index in sorted(results)]
+
+def write_report(results, elapsed, path=None):
+    """打印批量任务的汇总并写入JSON报告，返回报告路径"""
+    path = path or os.path.join(REPORT_DIR, f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    failed = [result for result in results if result['status'] != 'ok']
+    print(f"\n{'任务':<36}{'优先级':>6}{'状态':>8}{'尝试':>6}{'文件':>6}{'耗时(s)':>10}")
+    for result in sorted(results, key=lambda r: (-r['priority'], r['material'])):
+        name = result['material'] + (f" ({result['standard']})" if result['standard'] else '')
+        print(f"{name:<36}{result['priority']:>6}{result['status']:>8}{result['attempts']:>6}"
+              f"{result['files']:>6}{result['elapsed']:>10.1f}")
+    print(f"\n共 {len(results)} 个任务, 成功 {len(results) - len(failed)} 个, 失败 {len(failed)} 个, "
+          f"生成 {sum(result['files'] for result in results)} 个JSON文件, 总耗时 {elapsed:.1f}s")
+    for result in failed:
+        print(f"- {result['material']}: {result['error']}")
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'elapsed': round(elapsed, 3),
+            'jobs': len(results),
+            'failed': len(failed),
+            'results': [{**result, 'elapsed': round(result['elapsed'], 3)} for result in results],
+        }, f, ensure_ascii=False, indent=2)
+    print(f"运行报告已写入: {path}")
+    return path
+
+def scraper_metrics_path(path):
+    """爬虫子进程的指标文件：与流程的指标文件同名，加 .scrape 后缀，两个进程不写入同一文件"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.scrape{ext}"
+
+def metrics_files(paths, last=1):
+    """展开指标文件路径：目录取其中的 .jsonl 文件，未指定时取 data/metrics 中最近 last 次流程运行的文件
+
+    流程的指标文件对应的爬虫子进程指标文件（见 scraper_metrics_path）存在时一并加入。
+    """
+    if not paths:
+        paths = sorted(path for path in glob.glob(os.path.join(DEFAULT_METRICS_DIR, 'pipeline_*.jsonl'))
+                       if not path.endswith('.scrape.jsonl'))[-last:]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.jsonl'))))
+        else:
+            files.append(path)
+            if os.path.exists(scraper_metrics_path(path)):
+                files.append(scraper_metrics_path(path))
+    # 去掉重复指定的文件，保持顺序
+    return list(dict.fromkeys(files))
+
+def report_main(argv):
+    """report 子命令：汇总一次或多次运行的指标文件"""
+    parser = argparse.ArgumentParser(prog='run_pipeline.py report', description='汇总运行指标，输出各阶段耗时分位数、吞吐量和最慢的文件')
+    parser.add_argument('paths', nargs='*', help='指标文件或目录，默认取 data/metrics 中最近的流程运行')
+    parser.add_argument('--last', type=int, default=1, help='未指定文件时汇总最近几次运行')
+    parser.add_argument('--top', type=int, default=10, help='列出耗时最长的文件数量')
+    parser.add_argument('--phase', type=str, default=None, help='只显示指定阶段（如 clean、extract、scrape）')
+    args = parser.parse_args(argv)
+
+    files = metrics_files(args.paths, args.last)
+    if not files:
+        print(f"没有找到指标文件，请先运行流程或指定文件（默认目录: {DEFAULT_METRICS_DIR}）")
+        return
+    print("指标文件: " + ", ".join(files))
+    print_report(load_events(files), args.top, args.phase)
 
 def main():
-    parser = argparse.ArgumentParser(description='一键执行材料数据处理流程')
-    parser.add_argument('-m', '--material', type=str, required=True, help='指定要处理的材料名称')
+    if len(sys.argv) > 1 and sys.argv[1] == 'report':
+        return report_main(sys.argv[2:])
+    parser = argparse.ArgumentParser(description='一键执行材料数据处理流程',
+                                     epilog='汇总运行指标: python run_pipeline.py report [指标文件...]')
+    parser.add_argument('-m', '--material', type=str, help='指定要处理的材料名称')
+    parser.add_argument('--materials', type=str, nargs='+', default=None,
+                        help='批量处理多个材料，all 表示爬虫中预定义的全部材料')
+    parser.add_argument('--materials-file', type=str, default=None,
+                        help='批量处理的任务文件，每行格式为 "材料 | 标准 | 优先级"')
+    parser.add_argument('--jobs', type=int, default=2, help='批量处理时的工作线程数（即浏览器会话数量）')
+    parser.add_argument('--retries', type=int, default=1, help='批量处理时每个任务的最大重试次数')
+    parser.add_argument('--report', type=str, default=None, help='批量处理的运行报告路径，默认写入 data/reports/')
     parser.add_argument('-s', '--standard', type=str, help='指定材料的对应标准（如包含空格请用引号括起来）', default=None, nargs='+')
     parser.add_argument('--skip-crawl', action='store_true', help='跳过爬取步骤，只执行清理和转换')
+    parser.add_argument('--engine', choices=sorted(CLEANERS), default='bs4', help='清理引擎')
+    parser.add_argument('--mode', choices=['auto', 'parser', 'llm'], default='auto', help='JSON提取方式')
+    parser.add_argument('--prompt', choices=sorted(PROMPTS) + ['sections'], default='full', help='提示词方案')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='只列出需要重新清理和转换的文件及原因，不爬取也不生成文件；不指定材料时检查全部材料')
+    parser.add_argument('--stream', action='store_true', help='边爬取边清理和转换，各阶段通过有界队列连接')
+    parser.add_argument('--clean-workers', type=int, default=2, help='流式处理时清理阶段的线程数')
+    parser.add_argument('--extract-workers', type=int, default=4, help='流式处理时转换阶段的线程数（即模型请求的最大并发数）')
+    parser.add_argument('--queue-size', type=int, default=16, help='流式处理时每个阶段队列最多缓存的页面数')
+    parser.add_argument('--base-url', type=str, default=DEFAULT_BASE_URL, help='流式处理和批量处理时的搜索页地址模板')
+    parser.add_argument('--scrape-engine', choices=['http', 'selenium'], default='http',
+                        help='爬虫的抓取引擎，同 metal_materials_scraper.py 的 --engine')
+    parser.add_argument('--metrics', type=str, default=None,
+                        help='指标文件路径（JSON lines），默认写入 data/metrics/pipeline_<时间戳>.jsonl')
     args = parser.parse_args()
+    args.metrics = args.metrics or default_metrics_path('pipeline')
     
     start_time = time.time()
     standard = ' '.join(args.standard) if args.standard else None
-    
-    print_section_header(f"开始处理材料: {args.material}")
-    print(f"开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    # 如果指定了--skip-crawl，检查材料文件夹是否存在
-    if args.skip_crawl:
-        if not os.path.exists(f"./data/html_data/{args.material}"):
-            print(f"\n错误: 材料 {args.material} 不存在，无法跳过爬取步骤")
-            return
-        print("\n跳过爬取步骤，直接处理现有文件")
-    else:
-        # 执行爬取
-        print_step(1, 3, "爬取材料数据")
-        scraper_command = ['python', 'metal_materials_scraper.py', '-m', args.material]
-        if standard:
-            scraper_command.extend(['-s', standard])
-        
-        success = run_command(scraper_command, "数据爬取")
-        if not success:
-            print("\n爬取数据失败，终止后续步骤")
-            return
-            
-        # 等待文件写入完成
-        time.sleep(2)
-    
-    # 获取需要处理的文件
-    if not args.skip_crawl:
-        # 如果进行了爬取，只处理新爬取的文件
-        files_to_process, _ = get_files_to_process(args.material, start_time)
-    else:
-        # 否则处理所有未清理的文件
-        files_to_process, is_new_material = get_files_to_process(args.material)
-    
-    if not files_to_process:
-        print("\n没有需要处理的新文件")
+
+    if args.dry_run:
+        extractor = extractor_version(args.mode, args.prompt)
+        if args.materials or args.materials_file:
+            materials = sorted({clean_name(job['material']) for job in load_jobs(args.materials, args.materials_file)})
+        else:
+            materials = [args.material]
+        targets = [target for material in materials
+                   for target in plan("./data", CLEAN_HTML_DIR, JSON_DIR, args.engine, extractor, material)]
+        print_plan(targets)
         return
-    
-    print(f"\n需要处理的文件数量: {len(files_to_process)}")
-    for file in files_to_process:
-        print(f"- {file}")
-    
-    # 步骤2和3: 清理HTML并转换为JSON
-    for file in files_to_process:
-        # 步骤2: 清理HTML
-        print_step(2, 3, f"清理HTML数据 - {file}")
-        success = run_command(
-            ['python', 'html_cleaner.py', '-m', args.material, '-f', file],
-            f"HTML清理 - {file}"
-        )
-        if not success:
-            print(f"\n{file} HTML清理失败，继续处理下一个文件")
-            continue
-        
-        time.sleep(1)
-        
-        # 步骤3: 转换为JSON
-        print_step(3, 3, f"转换为JSON格式 - {file}")
-        success = run_command(
-            ['python', 'html2Json.py', '-m', args.material, '-f', file],
-            f"JSON转换 - {file}"
-        )
-        if not success:
-            print(f"\n{file} JSON转换失败，继续处理下一个文件")
-            continue
-    
-    # 计算总耗时
-    end_time = time.time()
-    duration = end_time - start_time
-    minutes = int(duration // 60)
-    seconds = int(duration % 60)
-    
-    print_section_header("处理完成")
-    print(f"材料: {args.material}")
-    if args.standard:
-        print(f"标准: {' '.join(args.standard)}")
-    print(f"处理文件数量: {len(files_to_process)}")
-    print(f"总耗时: {minutes}分{seconds}秒")
-    print(f"结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    # 检查并显示生成的文件
-    print("\n生成的文件:")
-    for file in files_to_process:
-        print(f"\n文件组 {file}:")
-        
-        # 检查原始HTML文件
-        html_path = f"./data/html_data/{args.material}/{file}.html"
-        if os.path.exists(html_path):
-            print(f"- 原始HTML文件: {html_path}")
-        
-        # 检查清理后的HTML文件
-        clean_html_path = f"./data/clean_html_data/{args.material}/{file}.html"
-        if os.path.exists(clean_html_path):
-            print(f"- 清理后HTML文件: {clean_html_path}")
-        
-        # 检查JSON文件
-        json_path = f"./data/JsonData/{args.material}/{file}.json"
-        if os.path.exists(json_path):
-            print(f"- JSON文件: {json_path}")
+
+    if not (args.material or args.materials or args.materials_file):
+        parser.error('需要指定 -m/--material、--materials 或 --materials-file')
+
+    # 整个运行共用一个运行标识，爬虫子进程写入单独的指标文件，report 时一并读取
+    metrics = MetricsRecorder(args.metrics)
+    print(f"运行标识: {metrics.run_id}，指标文件: {args.metrics}")
+    try:
+        with metrics.timer('run', material=args.material, mode=args.mode, engine=args.engine):
+            if args.materials or args.materials_file:
+                # 批量处理：所有任务共享浏览器会话、模型客户端和缓存
+                jobs = load_jobs(args.materials, args.materials_file, standard)
+                if not jobs:
+                    print("没有需要处理的任务")
+                    return
+                print_section_header(f"批量处理 {len(jobs)} 个任务")
+                print(f"开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                pipeline = Pipeline(args.engine, args.mode, llm_workers=args.jobs, prompt=args.prompt, metrics=metrics)
+                try:
+                    results = run_jobs(pipeline, jobs, args.jobs, args.retries, not args.skip_crawl, args.base_url,
+                                       args.scrape_engine)
+                finally:
+                    pipeline.close()
+                pipeline.metrics.print_summary()
+                write_report(results, time.time() - start_time, args.report)
+                return
+
+            print_section_header(f"开始处理材料: {args.material}")
+            print(f"开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+            if args.stream:
+                # 爬取、清理、转换三个阶段同时进行
+                print_step(1, 1, "边爬取边清理和转换")
+                pipeline = Pipeline(args.engine, args.mode, llm_workers=args.extract_workers, prompt=args.prompt,
+                                    metrics=metrics)
+                try:
+                    records = stream_material(pipeline, args.material, standard, not args.skip_crawl, args.clean_workers,
+                                              args.extract_workers, args.queue_size, args.base_url,
+                                              args.scrape_engine)
+                finally:
+                    pipeline.close()
+                pipeline.metrics.print_summary()
+                files_to_process = sorted(os.path.splitext(record['file'])[0] for record in records)
+                if not files_to_process:
+                    print("\n没有需要处理的新文件")
+                    return
+            else:
+                # 如果指定了--skip-crawl，检查材料文件夹是否存在
+                if args.skip_crawl:
+                    store = HtmlStore()
+                    material_exists = store.has_material(args.material)
+                    store.close()
+                    if not material_exists:
+                        print(f"\n错误: 材料 {args.material} 不存在，无法跳过爬取步骤")
+                        return
+                    print("\n跳过爬取步骤，直接处理现有文件")
+                else:
+                    # 执行爬取
+                    print_step(1, 3, "爬取材料数据")
+                    scraper_command = ['python', 'metal_materials_scraper.py', '-m', args.material,
+                                       '--engine', args.scrape_engine]
+                    if standard:
+                        scraper_command.extend(['-s', standard])
+
+                    scraper_command.extend(['--metrics', scraper_metrics_path(args.metrics), '--run-id', metrics.run_id])
+                    with metrics.timer('scrape', material=args.material) as fields:
+                        success = run_command(scraper_command, "数据爬取")
+                        if not success:
+                            fields['error'] = 'CalledProcessError'
+                    if not success:
+                        print("\n爬取数据失败，终止后续步骤")
+                        return
+
+                # 获取需要处理的文件
+                files_to_process, _ = get_files_to_process(args.material, args.engine, args.mode, args.prompt)
+
+                if not files_to_process:
+                    print("\n没有需要处理的新文件")
+                    return
+
+                print(f"\n需要处理的文件数量: {len(files_to_process)}")
+                for file in files_to_process:
+                    print(f"- {file}")
+
+                # 步骤2和3: 在同一进程中清理HTML并转换为JSON
+                print_step(2, 3, "清理HTML数据并转换为JSON格式")
+                pipeline = Pipeline(args.engine, args.mode, prompt=args.prompt, metrics=metrics)
+                try:
+                    for file in files_to_process:
+                        pipeline.process(args.material, file)
+                finally:
+                    pipeline.close()
+                pipeline.metrics.print_summary()
+
+            # 计算总耗时
+            end_time = time.time()
+            duration = end_time - start_time
+            minutes = int(duration // 60)
+            seconds = int(duration % 60)
+
+            print_section_header("处理完成")
+            print(f"材料: {args.material}")
+            if args.standard:
+                print(f"标准: {' '.join(args.standard)}")
+            print(f"处理文件数量: {len(files_to_process)}")
+            print(f"总耗时: {minutes}分{seconds}秒")
+            print(f"结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+            # 检查并显示生成的文件
+            print("\n生成的文件:")
+            store = HtmlStore()
+            for file in files_to_process:
+                print(f"\n文件组 {file}:")
+
+                # 检查原始HTML文件
+                digest = store.get_hash(args.material, f"{file}.html")
+                if digest:
+                    print(f"- 原始HTML文件: {args.material}/{file}.html -> {digest[:12]}")
+
+                # 检查清理后的HTML文件
+                clean_html_path = f"./data/clean_html_data/{args.material}/{file}.html"
+                if os.path.exists(clean_html_path):
+                    print(f"- 清理后HTML文件: {clean_html_path}")
+
+                # 检查JSON文件
+                json_path = f"./data/JsonData/{args.material}/{file}.json"
+                if os.path.exists(json_path):
+                    print(f"- JSON文件: {json_path}")
+            store.close()
+    finally:
+        metrics.close()
+
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
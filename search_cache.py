@@ -0,0 +1,88 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 默认的搜索结果缓存数据库
+DEFAULT_CACHE_PATH = 'data/search_cache.db'
+
+class SearchCache:
+    """搜索结果页的本地缓存，按 (关键字, 页码) 保存解析后的结果行
+
+    结果行的格式与 PageFetcher.search_rows 相同：[(名称, 详情链接, 标准), ...]，
+    无法识别的行以None占位。超过 ttl 的条目视为过期；条目数超过 max_entries 时
+    按最近访问时间淘汰。所有方法都是线程安全的。
+
+    Args:
+        path: SQLite数据库路径
+        ttl: 缓存有效期（秒）
+        max_entries: 最多保留的条目数
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 86400, max_entries=5000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_results (
+                keyword TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                rows TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (keyword, page)
+            )
+        ''')
+        self._conn.commit()
+
+    def get(self, keyword, page, fetched_after=None):
+        """返回未过期的结果行，未命中时返回None
+
+        指定 fetched_after（时间戳）时，早于该时间获取的条目同样视为过期。
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT rows, fetched_at FROM search_results WHERE keyword = ? AND page = ?',
+                (keyword, page)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl or (fetched_after is not None and row[1] < fetched_after):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                'UPDATE search_results SET accessed_at = ? WHERE keyword = ? AND page = ?',
+                (now, keyword, page)
+            )
+            self.hits += 1
+        return [tuple(r) if r is not None else None for r in json.loads(row[0])]
+
+    def put(self, keyword, page, rows):
+        """保存结果行，并在超出容量时淘汰最久未访问的条目"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?)',
+                (keyword, page, json.dumps(rows, ensure_ascii=False), now, now)
+            )
+            # 先清理过期条目，再按访问时间淘汰超出容量的部分
+            self._conn.execute('DELETE FROM search_results WHERE fetched_at < ?', (now - self.ttl,))
+            self._conn.execute('''
+                DELETE FROM search_results WHERE rowid IN (
+                    SELECT rowid FROM search_results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+
+    def report(self):
+        print(f"搜索结果缓存: 命中 {self.hits} 次, 未命中 {self.misses} 次")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,414 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import lxml.html
+
+# 输出中固定列出的元素，与提示词中的示例保持一致
+DEFAULT_ELEMENTS = ['Fe', 'C', 'Si', 'Mn', 'Cr', 'Ni', 'Mo', 'V', 'Cu', 'N', 'P', 'S', 'Mg', 'Zn', 'Al', 'W', 'Ti']
+# 化学成分表中可能出现的元素符号
+KNOWN_ELEMENTS = set(DEFAULT_ELEMENTS) | {
+    'B', 'Nb', 'Co', 'Pb', 'Sn', 'Sb', 'As', 'Bi', 'Ca', 'Ce', 'Zr', 'Ta', 'Se', 'Te', 'H', 'O', 'Re', 'Hf',
+}
+
+# 输出JSON的各个部分
+SECTIONS = ['Material', 'ChemicalComposition', 'MechanicalProperties', 'PhysicalProperties', 'SimilarGrades']
+
+_SIMILAR_KEYWORDS = ('相近牌号', '对应牌号', '近似牌号', '相似牌号', '牌号对照')
+# 根据表格标题判断所属部分的关键字
+_SECTION_KEYWORDS = [
+    ('chemical', ('化学成分',)),
+    ('heat_treatment', ('热处理',)),
+    ('mechanical', ('力学性能', '机械性能')),
+    ('physical', ('物理性能',)),
+    ('similar', _SIMILAR_KEYWORDS),
+    ('standards', ('相关标准', '所属标准', '标准')),
+]
+
+# 材料基本信息表中键名与输出字段的对应关系
+_IDENTITY_KEYS = [
+    ('OldName', ('旧牌号',)),
+    ('OtherNames', ('数字牌号', '其他名称', '别名', '统一数字代号')),
+    ('Category', ('分类', '类别', '类型', '钢种')),
+    ('Density', ('密度',)),
+    ('BelongsToStandard', ('所属标准', '标准号', '标准')),
+    ('Name', ('牌号', '名称')),
+]
+
+_NUMBER = r'[-+]?\d+(?:\.\d+)?'
+_RANGE_RE = re.compile(rf'^({_NUMBER})\s*[~～\-—–]\s*({_NUMBER})$')
+_MAX_RE = re.compile(rf'^(?:≤|<=|<|＜|max\.?)\s*({_NUMBER})$', re.IGNORECASE)
+_MIN_RE = re.compile(rf'^(?:≥|>=|>|＞|min\.?)\s*({_NUMBER})$', re.IGNORECASE)
+_STANDARD_CODE_RE = re.compile(r'^([A-Z][A-Za-z]*(?:[ /][A-Z][A-Za-z]*)*\s*[A-Z]?\s*\d[\w.\-/: ]*?-\d{4})\s*(.*)$')
+
+def _text(element) -> str:
+    return re.sub(r'\s+', ' ', element.text_content()).strip()
+
+def _table_rows(table) -> List[List[str]]:
+    """取出表格的单元格文本。清理后的HTML没有rowspan属性，
+    较短的行用上一行开头的单元格补齐，近似还原合并单元格。"""
+    rows = []
+    for tr in table.iter('tr'):
+        cells = [_text(cell) for cell in tr if cell.tag in ('td', 'th')]
+        if any(cells):
+            rows.append(cells)
+    width = max((len(r) for r in rows), default=0)
+    for index in range(1, len(rows)):
+        missing = width - len(rows[index])
+        previous = rows[index - 1]
+        if 0 < missing < len(previous):
+            rows[index] = previous[:missing] + rows[index]
+    return rows
+
+def _table_label(table) -> str:
+    """表格前最近的标题文本，以及只有一个单元格的首行"""
+    labels = []
+    for element in table.xpath('preceding::*[normalize-space(text())][1]'):
+        labels.append(_text(element))
+    first_row = table.xpath('.//tr[1]')
+    if first_row and len([c for c in first_row[0] if c.tag in ('td', 'th')]) == 1:
+        labels.append(_text(first_row[0]))
+    return ' '.join(labels)
+
+def _classify(label: str) -> Optional[str]:
+    for section, keywords in _SECTION_KEYWORDS:
+        if any(keyword in label for keyword in keywords):
+            return section
+    return None
+
+def _has_digit(text: str) -> bool:
+    return any(ch.isdigit() for ch in text)
+
+def parse_range(value: str) -> Dict[str, str]:
+    """将 0.17~0.24、≤0.035、≥0.5 等写法转换为 {'Min', 'Max'}"""
+    value = value.replace(' ', '').replace('%', '')
+    if not value or value in ('-', '—', '/', '余量', '余', 'bal', 'Bal', 'Bal.'):
+        return {'Min': '-', 'Max': '-'}
+    match = _RANGE_RE.match(value)
+    if match:
+        return {'Min': match.group(1), 'Max': match.group(2)}
+    match = _MAX_RE.match(value)
+    if match:
+        return {'Min': '-', 'Max': match.group(1)}
+    match = _MIN_RE.match(value)
+    if match:
+        return {'Min': match.group(1), 'Max': '-'}
+    if re.fullmatch(_NUMBER, value):
+        return {'Min': value, 'Max': value}
+    return None
+
+def _element_symbol(cell: str) -> Optional[str]:
+    symbol = re.sub(r'[\s(（].*$', '', cell)
+    return symbol if symbol in KNOWN_ELEMENTS else None
+
+def _parse_chemical(tables) -> Optional[Dict]:
+    elements = {}
+    for rows in tables:
+        # 横向：表头为元素符号，下一行为含量
+        for index, row in enumerate(rows[:-1]):
+            symbols = [_element_symbol(cell) for cell in row]
+            if sum(1 for s in symbols if s) >= 3:
+                values = rows[index + 1]
+                offset = len(values) - len(row)
+                for column, symbol in enumerate(symbols):
+                    if symbol and 0 <= column + offset < len(values):
+                        parsed = parse_range(values[column + offset])
+                        if parsed is not None:
+                            elements[symbol] = parsed
+                break
+        else:
+            # 纵向：每行为 元素, 含量 或 元素, 最小值, 最大值
+            for row in rows:
+                if len(row) >= 2 and _element_symbol(row[0]):
+                    if len(row) >= 3 and (_has_digit(row[1]) or _has_digit(row[2])):
+                        parsed = {'Min': row[1] or '-', 'Max': row[2] or '-'}
+                    else:
+                        parsed = parse_range(row[1])
+                    if parsed is not None:
+                        elements[_element_symbol(row[0])] = parsed
+
+    numeric = [e for e in elements.values() if e['Min'] != '-' or e['Max'] != '-']
+    if len(elements) < 3 or not numeric:
+        return None
+    result = {symbol: {'Min': '-', 'Max': '-'} for symbol in DEFAULT_ELEMENTS}
+    result.update(elements)
+    return {'Elements': result, 'Notes': []}
+
+def _matrix_entries(rows, value_key='Value') -> List[Dict[str, str]]:
+    """解析性能表，支持 性能/条件/数值 逐行排列和以表头为性能名的矩阵排列"""
+    entries = []
+    if not rows:
+        return entries
+    width = max(len(r) for r in rows)
+    header = rows[0]
+    header_is_labels = len(rows) > 1 and not any(_has_digit(cell) for cell in header[1:])
+    if width >= 3 and header_is_labels and len(header) == width and \
+            not any(k in header[0] for k in ('性能', '项目', '名称')):
+        # 矩阵：首列为条件，表头为性能名称
+        for row in rows[1:]:
+            for column in range(1, min(len(row), len(header))):
+                if row[column] and row[column] not in ('-', '/'):
+                    entries.append({'Property': header[column], 'Condition': row[0], value_key: row[column]})
+        return entries
+    body = rows[1:] if header_is_labels and not _has_digit(' '.join(header)) else rows
+    for row in body:
+        if len(row) >= 3:
+            entries.append({'Property': row[0], 'Condition': row[1], value_key: ' '.join(row[2:])})
+        elif len(row) == 2:
+            entries.append({'Property': row[0], value_key: row[1]})
+    return [e for e in entries if _has_digit(e[value_key])]
+
+def _parse_heat_treatment(tables) -> List[Dict[str, str]]:
+    entries = []
+    for rows in tables:
+        header = rows[0]
+        columns = {'Process': 0, 'TemperatureRange': 1, 'CoolingMethod': 2}
+        body = rows
+        if not any(_has_digit(cell) for cell in header):
+            for index, cell in enumerate(header):
+                if '温度' in cell:
+                    columns['TemperatureRange'] = index
+                elif '冷' in cell:
+                    columns['CoolingMethod'] = index
+                elif any(k in cell for k in ('工艺', '处理', '名称', '工序')):
+                    columns['Process'] = index
+            body = rows[1:]
+        for row in body:
+            entry = {key: row[index] if index < len(row) else '-' for key, index in columns.items()}
+            if _has_digit(entry['TemperatureRange']):
+                entries.append(entry)
+    return entries
+
+def _parse_similar(tables) -> Optional[List[Dict]]:
+    fields = []
+    for rows in tables:
+        if len(rows) < 2:
+            continue
+        header = rows[0]
+        # 首列是领域说明时单独处理
+        has_field_column = any(k in header[0] for k in ('领域', '类别', '分类', '用途', '钢类'))
+        start = 1 if has_field_column else 0
+        for row in rows[1:]:
+            mappings = []
+            for column in range(start, min(len(row), len(header))):
+                grades = [g.strip() for g in re.split(r'[,，、;；\n]', row[column]) if g.strip() not in ('', '-', '/')]
+                if grades and header[column]:
+                    mappings.append({'Standard': header[column], 'Grades': grades})
+            if mappings:
+                fields.append({'Field': row[0] if has_field_column else '', 'Mappings': mappings})
+    return fields or None
+
+def _parse_standard(text: str) -> Optional[Dict[str, str]]:
+    match = _STANDARD_CODE_RE.match(text.strip())
+    if not match:
+        return None
+    return {'StandardCode': match.group(1).strip(), 'Description': match.group(2).strip()}
+
+def _parse_identity(doc, key_values, standard_tables) -> Optional[Dict]:
+    material = {
+        'Name': '', 'OldName': '', 'OtherNames': [], 'Category': '', 'Density': '',
+        'BelongsToStandard': {'StandardCode': '', 'Description': ''}, 'AllStandards': [], 'Description': '',
+    }
+    for key, value in key_values:
+        for field, keywords in _IDENTITY_KEYS:
+            if any(keyword in key for keyword in keywords):
+                if field == 'OtherNames':
+                    material[field].extend(v.strip() for v in re.split(r'[,，、;；]', value) if v.strip())
+                elif field == 'BelongsToStandard':
+                    parsed = _parse_standard(value)
+                    if parsed and not material[field]['StandardCode']:
+                        material[field] = parsed
+                elif not material[field]:
+                    material[field] = value
+                break
+
+    for rows in standard_tables:
+        for row in rows:
+            parsed = _parse_standard(' '.join(row))
+            if parsed and parsed not in material['AllStandards']:
+                material['AllStandards'].append(parsed)
+
+    if not material['Name']:
+        # 位置导航的最后一项即为牌号
+        crumbs = [c for c in (_text(e) for e in doc.xpath('//span[1]//a | //span[1]//cite')) if c]
+        if crumbs:
+            material['Name'] = crumbs[-1]
+    standard = material['BelongsToStandard']
+    if not standard['StandardCode'] and material['AllStandards']:
+        material['BelongsToStandard'] = dict(material['AllStandards'][0])
+    elif standard['StandardCode'] and standard not in material['AllStandards']:
+        material['AllStandards'].insert(0, dict(standard))
+
+    if not material['Name'] or not material['BelongsToStandard']['StandardCode']:
+        return None
+    return material
+
+def _parse_each(tables, parse) -> Optional[List]:
+    """逐个表格解析并合并结果，任一表格解析不出内容时返回None"""
+    entries = []
+    for rows in tables:
+        parsed = parse(rows)
+        if not parsed:
+            return None
+        entries.extend(parsed)
+    return entries
+
+def _mentions_without_table(prose: str, keywords, tables) -> bool:
+    """表格以外的文字提到了某部分，但页面中没有对应的表格，说明内容写在正文里"""
+    return not tables and any(keyword in prose for keyword in keywords)
+
+def parse_material_page(html: str) -> Tuple[Dict, Dict[str, str]]:
+    """从清理后的材料详情页中解析各部分数据
+
+    返回 (数据, 来源)：数据只包含解析有把握的部分；来源记录每个部分的结果，
+    'parser' 表示由规则解析得到，None 表示需要交给模型处理。
+    一个部分只有在页面中属于它的每个表格都解析成功、且没有写在正文中的内容时才记为 'parser'。
+    """
+    doc = lxml.html.document_fromstring(html.encode('utf-8'),
+                                        parser=lxml.html.HTMLParser(encoding='utf-8'))
+    grouped = {}
+    key_values = []
+    for table in doc.iter('table'):
+        rows = _table_rows(table)
+        if not rows:
+            continue
+        section = _classify(_table_label(table))
+        if section is not None:
+            grouped.setdefault(section, []).append(rows)
+        # 其余两列（或四列）的键值表用于解析材料基本信息
+        if section in (None, 'standards'):
+            for row in rows:
+                if len(row) in (2, 4):
+                    key_values.extend(zip(row[0::2], row[1::2]))
+
+    # 表格以外的文字：标题、说明等，用于判断是否有内容没有写成表格
+    prose = re.sub(r'\s+', ' ', ' '.join(doc.xpath('//text()[not(ancestor::table)]')))
+    data = {}
+    sources = {section: None for section in SECTIONS}
+
+    material = _parse_identity(doc, key_values, grouped.get('standards', []))
+    if material is not None:
+        data['Material'] = material
+
+    chemical_tables = grouped.get('chemical', [])
+    if all(_parse_chemical([rows]) is not None for rows in chemical_tables):
+        chemical = _parse_chemical(chemical_tables)
+        if chemical is not None:
+            data['ChemicalComposition'] = chemical
+
+    # 力学性能和热处理表都要解析成功，只解析出其中一种时整个部分交给模型
+    mechanical_tables = grouped.get('mechanical', [])
+    heat_tables = grouped.get('heat_treatment', [])
+    conditions = _parse_each(mechanical_tables, _matrix_entries)
+    heat_treatment = _parse_each(heat_tables, lambda rows: _parse_heat_treatment([rows]))
+    if conditions is not None and heat_treatment is not None \
+            and not _mentions_without_table(prose, ('力学性能', '机械性能'), mechanical_tables) \
+            and not _mentions_without_table(prose, ('热处理',), heat_tables):
+        # 页面中没有相关内容时按提示词要求输出空数组
+        data['MechanicalProperties'] = {'Conditions': conditions, 'HeatTreatment': heat_treatment, 'Notes': []}
+
+    physical_tables = grouped.get('physical', [])
+    physical = _parse_each(physical_tables, _matrix_entries)
+    if physical is not None and not _mentions_without_table(prose, ('物理性能',), physical_tables):
+        data['PhysicalProperties'] = {'Properties': physical}
+
+    similar_tables = grouped.get('similar', [])
+    similar = _parse_each(similar_tables, lambda rows: _parse_similar([rows]))
+    if similar is not None and not _mentions_without_table(prose, _SIMILAR_KEYWORDS, similar_tables):
+        data['SimilarGrades'] = similar
+
+    for section in data:
+        sources[section] = 'parser'
+    return data, sources
+
+# 精简文本中需要换行的块级标签
+_BLOCK_TAGS = {
+    'html', 'body', 'head', 'title', 'div', 'p', 'section', 'article', 'header', 'footer', 'ul', 'ol', 'li',
+    'dl', 'dt', 'dd', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'blockquote', 'pre', 'form', 'fieldset',
+}
+
+def _table_lines(table) -> List[str]:
+    """基本信息等键值表输出为“键: 值”，其他表格输出为 | 分隔的行，第一行为表头"""
+    rows = _table_rows(table)
+    key_value = (
+        rows and not table.xpath('.//th') and _classify(_table_label(table)) in (None, 'standards')
+        and all(len(row) in (2, 4) for row in rows) and not any(_has_digit(row[0]) for row in rows)
+    )
+    if key_value:
+        return [f"{key}: {value}" for row in rows for key, value in zip(row[0::2], row[1::2]) if key or value]
+    return ['| ' + ' | '.join(cell.replace('|', '/') for cell in row) + ' |' for row in rows]
+
+def _compact_blocks(html: str) -> List[Tuple[Optional[str], List[str]]]:
+    """按文档顺序生成精简文本块 [(表格或标题所属的部分, 行列表), ...]"""
+    doc = lxml.html.document_fromstring(html.encode('utf-8'),
+                                        parser=lxml.html.HTMLParser(encoding='utf-8'))
+    blocks = []
+    buffer = []
+
+    def flush():
+        line = re.sub(r'\s+', ' ', ' '.join(buffer)).strip()
+        if line and (not blocks or blocks[-1][1] != [line]):
+            blocks.append((_classify(line), [line]))
+        buffer.clear()
+
+    def walk(element):
+        if not isinstance(element.tag, str):
+            return
+        if element.tag == 'table':
+            flush()
+            blocks.append((_classify(_table_label(element)), _table_lines(element)))
+            return
+        block = element.tag in _BLOCK_TAGS
+        if block:
+            flush()
+        if element.text:
+            buffer.append(element.text)
+        for child in element:
+            walk(child)
+            if child.tail:
+                buffer.append(child.tail)
+        if block:
+            flush()
+
+    walk(doc)
+    flush()
+    return blocks
+
+def compact_page(html: str) -> str:
+    """将清理后的HTML转换为发送给模型的精简文本
+
+    去掉所有标签，表格改写为 | 分隔的行或“键: 值”，其余文本按块级元素分行，
+    页面中的文字内容全部保留。
+    """
+    return '\n'.join(line for _, lines in _compact_blocks(html) for line in lines)
+
+# 表格分类到输出JSON各部分的对应关系，未分类的内容归入 Material
+_BLOCK_SECTIONS = {
+    'chemical': 'ChemicalComposition',
+    'heat_treatment': 'MechanicalProperties',
+    'mechanical': 'MechanicalProperties',
+    'physical': 'PhysicalProperties',
+    'similar': 'SimilarGrades',
+    'standards': 'Material',
+}
+
+def split_sections(html: str) -> Dict[str, str]:
+    """将页面的精简文本按输出JSON的各部分拆分，返回 {部分: 精简文本}
+
+    带有化学成分、力学性能等标题的表格和其后的文字归入对应部分，
+    其余内容（位置导航、基本信息、标准等）归入 Material；页面中找不到的部分不出现在结果中。
+    """
+    sections = {}
+    current = 'Material'
+    for category, lines in _compact_blocks(html):
+        if category is not None:
+            current = _BLOCK_SECTIONS[category]
+        sections.setdefault(current, []).extend(lines)
+    return {section: '\n'.join(lines) for section, lines in sections.items()}
+
+def missing_text(html: str, compact: str) -> List[str]:
+    """返回页面中没有出现在精简文本里的文字片段，用于检查转换是否丢失信息"""
+    doc = lxml.html.document_fromstring(html.encode('utf-8'),
+                                        parser=lxml.html.HTMLParser(encoding='utf-8'))
+    normalized = re.sub(r'\s+', ' ', compact)
+    fragments = (re.sub(r'\s+', ' ', text).strip().replace('|', '/') for text in doc.xpath('//text()'))
+    return [fragment for fragment in fragments if fragment and fragment not in normalized]
@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import sys
+
+import pytest
+from openai import OpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html2Json
+from html2Json import PROMPT_FIXTURES_DIR, run_batch
+
+PAGE = 'Q345B_GB_T_1591-2008'
+
+def _answer():
+    with open(os.path.join(PROMPT_FIXTURES_DIR, f"{PAGE}.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+class MockBatchApi:
+    """OpenAI兼容的批处理接口：上传文件、提交批处理、查询状态、下载结果"""
+
+    def __init__(self):
+        self.status = 'in_progress'
+        self.uploads = []
+        self.submitted = 0
+
+    def _batch(self):
+        done = self.status == 'completed'
+        return {
+            'id': 'batch_1', 'object': 'batch', 'endpoint': '/v1/chat/completions', 'input_file_id': 'file-input',
+            'completion_window': '24h', 'status': self.status, 'created_at': 0, 'errors': None,
+            'output_file_id': 'file-output' if done else None, 'error_file_id': None,
+            'request_counts': {'total': len(self._requests()), 'completed': len(self._requests()) if done else 0,
+                               'failed': 0},
+        }
+
+    def _requests(self):
+        # multipart 请求体中只取出上传的JSONL行
+        return [json.loads(line) for line in self.uploads[-1].splitlines() if line.strip() and line.startswith('{')]
+
+    def _output(self):
+        content = '```json\n' + json.dumps(_answer(), ensure_ascii=False) + '\n```'
+        lines = []
+        for request in self._requests():
+            body = {'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': 'test',
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': content}}]}
+            lines.append(json.dumps({'id': 'batch_req_1', 'custom_id': request['custom_id'], 'error': None,
+                                     'response': {'status_code': 200, 'request_id': 'req_1', 'body': body}},
+                                    ensure_ascii=False))
+        return '\n'.join(lines) + '\n'
+
+    def route(self, method, path, body):
+        headers = {'Content-Type': 'application/json'}
+        if method == 'POST' and path == '/v1/files':
+            self.uploads.append(body.decode('utf-8'))
+            return 200, headers, json.dumps({'id': 'file-input', 'object': 'file', 'bytes': len(body), 'created_at': 0,
+                                             'filename': 'input.jsonl', 'purpose': 'batch', 'status': 'processed'})
+        if method == 'POST' and path == '/v1/batches':
+            self.submitted += 1
+            return 200, headers, json.dumps(self._batch())
+        if method == 'GET' and path == '/v1/batches/batch_1':
+            return 200, headers, json.dumps(self._batch())
+        if method == 'GET' and path == '/v1/files/file-output/content':
+            return 200, {'Content-Type': 'application/octet-stream'}, self._output()
+        return 404, headers, json.dumps({'error': {'message': f"{method} {path}"}})
+
+@pytest.fixture
+def api(fixture_server, monkeypatch):
+    mock = MockBatchApi()
+    server = fixture_server(mock.route)
+    monkeypatch.setattr(html2Json, 'client', OpenAI(api_key='test', base_url=server.url + '/v1', max_retries=0,
+                                                    timeout=10))
+    return mock
+
+@pytest.fixture
+def workdir(tmp_path):
+    clean = tmp_path / 'clean_html_data' / 'Q345B'
+    clean.mkdir(parents=True)
+    shutil.copy(os.path.join(PROMPT_FIXTURES_DIR, f"{PAGE}.html"), clean / f"{PAGE}.html")
+    return tmp_path
+
+def _interrupt(seconds):
+    raise KeyboardInterrupt
+
+def test_resume_after_interrupted_polling(api, workdir, monkeypatch):
+    base, output, batch_dir = str(workdir / 'clean_html_data'), str(workdir / 'JsonData'), str(workdir / 'batch')
+    state_path = os.path.join(batch_dir, 'state.json')
+
+    # 第一次运行：提交后在等待时被中断，状态保留在 state.json 中
+    monkeypatch.setattr(html2Json.time, 'sleep', _interrupt)
+    assert run_batch(base, output, mode='llm', batch_dir=batch_dir, poll_interval=0) == []
+    with open(state_path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    assert (state['file_id'], state['batch_id'], state['status']) == ('file-input', 'batch_1', 'prepared')
+    assert api.submitted == 1 and len(api.uploads) == 1 and len(api._requests()) == 1
+    assert not os.path.exists(os.path.join(output, 'Q345B', f"{PAGE}.json"))
+
+    # 第二次运行：继续等待同一个批处理，不重新上传或提交
+    api.status = 'completed'
+    records = run_batch(base, output, mode='llm', batch_dir=batch_dir, poll_interval=0)
+    assert api.submitted == 1 and len(api.uploads) == 1
+    assert [(os.path.basename(r['file']), r['status']) for r in records] == [(f"{PAGE}.html", 'ok')]
+    with open(os.path.join(output, 'Q345B', f"{PAGE}.json"), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['Material']['Name'] == 'Q345B'
+    assert data['ChemicalComposition'] == _answer()['ChemicalComposition']
+    # 结果写回后状态移到本次批处理的目录中，下次运行会重新准备
+    assert not os.path.exists(state_path)
+    assert os.path.exists(os.path.join(state['run_dir'], 'state.json'))
+    assert os.path.exists(os.path.join(state['run_dir'], 'output.jsonl'))
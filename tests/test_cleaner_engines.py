@@ -0,0 +1,51 @@
+import glob
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_cleaner import CLEANERS, _canonical, clean_html_stream, expected_engine_outputs
+
+# 固定的一组已保存页面：正常详情页、页脚在容器之外、位置导航嵌套较深、缺少标记、数据说明不在同一容器
+PAGES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'fixtures', 'pages', '*.html')))
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def test_fixtures_exist():
+    assert PAGES
+
+@pytest.mark.parametrize('engine', sorted(set(CLEANERS) - {'bs4'}))
+@pytest.mark.parametrize('path', PAGES, ids=os.path.basename)
+def test_engine_matches_bs4(engine, path):
+    html = _read(path)
+    expected = expected_engine_outputs(engine, [html])[0]
+    assert _canonical(CLEANERS[engine](html)) == _canonical(expected)
+
+@pytest.mark.parametrize('chunk_size', [16, 256])
+@pytest.mark.parametrize('path', PAGES, ids=os.path.basename)
+def test_stream_chunk_size(chunk_size, path):
+    # 分块边界落在标签中间时输出不变
+    html = _read(path)
+    assert _canonical(clean_html_stream(html, chunk_size)) == _canonical(expected_engine_outputs('stream', [html])[0])
+
+def test_stream_keeps_header():
+    html = _read(os.path.join(os.path.dirname(__file__), 'fixtures', 'pages', 'detail_footer_outside.html'))
+    cleaned = clean_html_stream(html)
+    assert '材料库' in cleaned and '欢迎访问材数库' in cleaned
+    assert '广告位' not in cleaned and '页脚文字' not in cleaned
+
+SUPPLIERS = os.path.join(os.path.dirname(__file__), 'fixtures', 'suppliers')
+
+@pytest.mark.parametrize('engine', sorted(CLEANERS))
+def test_suppliers_block_removed(engine):
+    # expected_baseline.html 为最初的 bs4 实现的输出，只删除了开始注释后的第一个元素（S1），
+    # 现在两条注释之间的全部内容都删除（CLEANER_VERSION 2）
+    html = _read(os.path.join(SUPPLIERS, 'page.html'))
+    cleaned = _canonical(CLEANERS[engine](html))
+    assert cleaned == _canonical(_read(os.path.join(SUPPLIERS, 'expected.html')))
+    assert cleaned != _canonical(_read(os.path.join(SUPPLIERS, 'expected_baseline.html')))
+    assert 'S1' not in cleaned and 'S2' not in cleaned and 'S3' not in cleaned
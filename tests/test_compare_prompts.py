@@ -0,0 +1,104 @@
+import json
+import os
+import re
+import sys
+from types import SimpleNamespace
+
+import lxml.html
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html2Json
+from html2Json import PROMPT_FIXTURES_DIR, PROMPTS, _normalize_value, compare_prompts
+from table_parser import compact_page
+
+def _load_expected():
+    expected = {}
+    for name in os.listdir(PROMPT_FIXTURES_DIR):
+        if name.endswith('.json'):
+            with open(os.path.join(PROMPT_FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            expected[data['Material']['Name']] = data
+    return expected
+
+def _squash(text):
+    return re.sub(r'\s+', '', text)
+
+def _answer(value, text):
+    """只保留在输入中能找到的值，找不到的字符串置空"""
+    if isinstance(value, dict):
+        return {key: _answer(item, text) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_answer(item, text) for item in value]
+    if isinstance(value, str) and value not in ('', '-') and _squash(value) not in text:
+        return ''
+    return value
+
+class _Stream(list):
+    def close(self):
+        pass
+
+class ReadingModel:
+    """模拟模型：回答取决于收到的输入
+
+    按输入中出现的牌号找到对应的预期JSON，其中每个值只有在输入（完整HTML的文字或精简文本）中
+    能找到时才原样返回，否则置空。精简文本丢失或改写了页面内容时，compact 的输出就会与预期不同。
+    """
+
+    def __init__(self):
+        self.expected = _load_expected()
+        self.temperatures = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, stream=False, temperature=None, **kwargs):
+        self.temperatures.append(temperature)
+        content = messages[-1]['content']
+        if messages[0]['content'] == PROMPTS['full'][0]:
+            # 完整提示词发送的是HTML，只读取其中的文字
+            doc = lxml.html.document_fromstring(content.encode('utf-8'),
+                                                parser=lxml.html.HTMLParser(encoding='utf-8'))
+            content = ' '.join(doc.itertext())
+        text = _squash(content)
+        name = max((name for name in self.expected if _squash(name) in text), key=len)
+        body = '```json\n' + json.dumps(_answer(self.expected[name], text), ensure_ascii=False, indent=2) + '\n```'
+        chunks = [body[i:i + 64] for i in range(0, len(body), 64)]
+        return _Stream([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk))])
+                        for chunk in chunks])
+
+@pytest.fixture
+def model(monkeypatch):
+    model = ReadingModel()
+    monkeypatch.setattr(html2Json, 'client', model)
+    return model
+
+def test_normalize_value():
+    assert _normalize_value('7.850 g/cm³') == _normalize_value('7.85  g/cm³')
+    assert _normalize_value('≥ 500 MPa') == _normalize_value('≥500 MPa')
+    assert _normalize_value({'Min': '0.20', 'Max': 1}) == _normalize_value({'Min': '0.2', 'Max': '1.0'})
+    assert _normalize_value('≥500 MPa') != _normalize_value('≥550 MPa')
+
+def test_compare_prompts_matches_fixtures(model):
+    assert compare_prompts(PROMPT_FIXTURES_DIR)
+    assert model.temperatures and set(model.temperatures) == {0}
+
+def test_compare_prompts_detects_lossy_encoding(model, monkeypatch):
+    # 精简文本丢掉表格的最后一行时，compact 的输出与预期不一致
+    def lossy(html):
+        lines = compact_page(html).split('\n')
+        return '\n'.join(line for index, line in enumerate(lines)
+                         if not (line.startswith('|') and (index + 1 == len(lines) or not lines[index + 1].startswith('|'))))
+
+    monkeypatch.setitem(PROMPTS, 'compact', (PROMPTS['compact'][0], lossy))
+    assert compare_prompts(PROMPT_FIXTURES_DIR, prompts=['full'])
+    assert not compare_prompts(PROMPT_FIXTURES_DIR, prompts=['compact'])
+
+def test_compare_prompts_detects_wrong_expectation(model, tmp_path):
+    name = 'Q345B_GB_T_1591-2008'
+    with open(os.path.join(PROMPT_FIXTURES_DIR, name + '.html'), 'r', encoding='utf-8') as f:
+        (tmp_path / (name + '.html')).write_text(f.read(), encoding='utf-8')
+    with open(os.path.join(PROMPT_FIXTURES_DIR, name + '.json'), 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    expected['Material']['Density'] = '7.93 g/cm³'
+    (tmp_path / (name + '.json')).write_text(json.dumps(expected, ensure_ascii=False), encoding='utf-8')
+    assert not compare_prompts(str(tmp_path))
@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from openai import OpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html2Json
+from html2Json import PROMPT_FIXTURES_DIR, AdaptiveLimiter, call_openai_api
+
+RETRY_AFTER = 1.5
+
+def _answer():
+    with open(os.path.join(PROMPT_FIXTURES_DIR, 'Q345B_GB_T_1591-2008.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _sse(content, size=200):
+    """按OpenAI流式接口的格式分块返回"""
+    events = []
+    for start in range(0, len(content), size):
+        chunk = {'id': 'chatcmpl-test', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'test',
+                 'choices': [{'index': 0, 'delta': {'content': content[start:start + size]}, 'finish_reason': None}]}
+        events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+    events.append('data: [DONE]\n\n')
+    return ''.join(events)
+
+class MockModel:
+    """OpenAI兼容的模拟服务：前 throttled 个请求返回429和Retry-After，其余流式返回固定的JSON"""
+
+    def __init__(self, throttled=1, latency=0.2):
+        self.throttled = throttled
+        self.latency = latency
+        self.content = '```json\n' + json.dumps(_answer(), ensure_ascii=False) + '\n```'
+        self.calls = []       # (到达时间, 是否被限流)
+        self.throttled_at = []
+        self.in_flight = 0
+        self.peak_after_throttle = 0
+        self._lock = threading.Lock()
+
+    def route(self, method, path, body):
+        assert method == 'POST' and path == '/v1/chat/completions'
+        with self._lock:
+            arrived = time.monotonic()
+            throttle = len(self.calls) < self.throttled
+            self.calls.append((arrived, throttle))
+            self.in_flight += 1
+            if self.throttled_at and arrived > self.throttled_at[-1]:
+                self.peak_after_throttle = max(self.peak_after_throttle, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+            if throttle:
+                self.throttled_at.append(time.monotonic())
+        if throttle:
+            error = {'error': {'message': 'Rate limit reached', 'type': 'rate_limit_error', 'code': 'rate_limit'}}
+            return 429, {'Content-Type': 'application/json', 'Retry-After': str(RETRY_AFTER)}, json.dumps(error)
+        return 200, {'Content-Type': 'text/event-stream'}, _sse(self.content)
+
+@pytest.fixture
+def model(fixture_server, monkeypatch):
+    mock = MockModel()
+    server = fixture_server(mock.route)
+    monkeypatch.setattr(html2Json, 'client', OpenAI(api_key='test', base_url=server.url + '/v1', max_retries=0,
+                                                    timeout=10))
+    # 去掉随机抖动：第一次重试的指数退避为1秒，小于 Retry-After
+    monkeypatch.setattr(html2Json.random, 'uniform', lambda a, b: a)
+    return mock
+
+def test_retry_after_backs_off(model):
+    limiter = AdaptiveLimiter(4)
+    result = call_openai_api('<html><body>Q345B</body></html>', limiter)
+    assert result == _answer()
+    assert [throttled for _, throttled in model.calls] == [True, False]
+    # 重试在 Retry-After 之后才发出，而不是按1秒的指数退避
+    assert model.calls[1][0] - model.throttled_at[0] >= RETRY_AFTER
+    assert limiter.throttles == 1 and limiter.retries == 1
+    assert limiter.limit == 2
+
+def test_throttle_pauses_all_threads_and_halves_concurrency(model):
+    limiter = AdaptiveLimiter(4, increase_after=100)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda i: call_openai_api(f'<p>{i}</p>', limiter), range(8)))
+    assert results == [_answer()] * 8
+    throttled_at = model.throttled_at[0]
+    # 429之后到达的请求都在退避期结束后才发出
+    later = [arrived for arrived, _ in model.calls if arrived > throttled_at]
+    assert later and min(later) >= throttled_at + RETRY_AFTER
+    # 之后的并发数不超过减半后的2
+    assert model.peak_after_throttle <= 2
+    assert limiter.limit == 2 and limiter.throttles == 1
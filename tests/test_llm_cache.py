@@ -0,0 +1,45 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_cache import LlmCache
+
+def test_lock_for_serializes_same_key(tmp_path):
+    cache = LlmCache(str(tmp_path / 'llm_cache.db'))
+    active = {'a': 0, 'b': 0}
+    peak = {'a': 0, 'b': 0}
+    guard = threading.Lock()
+
+    def work(key):
+        with cache.lock_for(key):
+            with guard:
+                active[key] += 1
+                peak[key] = max(peak[key], active[key])
+            time.sleep(0.02)
+            with guard:
+                active[key] -= 1
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(work, ['a', 'b'] * 8))
+    # 同一个键同时只有一个线程
+    assert peak == {'a': 1, 'b': 1}
+    cache.close()
+
+def test_lock_for_drops_released_locks(tmp_path):
+    cache = LlmCache(str(tmp_path / 'llm_cache.db'))
+    for index in range(100):
+        with cache.lock_for(f"key{index}"):
+            assert f"key{index}" in cache._key_locks
+    assert cache._key_locks == {}
+    # 持有锁时抛出异常也会删除
+    try:
+        with cache.lock_for('error'):
+            raise ValueError
+    except ValueError:
+        pass
+    assert cache._key_locks == {}
+    cache.close()
@@ -0,0 +1,145 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import lxml.html
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metal_materials_scraper
+from metal_materials_scraper import (EXTRACT_ROWS_SCRIPT, PageFetcher, RateLimiter, parse_search_rows,
+                                     scrape_material)
+
+SEARCH_PAGE = '''<html><body>
+<table class="layui-table head-sticky">
+<thead><tr><th>序号</th><th>牌号</th><th>标准</th></tr></thead>
+<tbody>
+<tr><td>1</td><td><a href="/detail/1">40Cr</a></td><td><b>GB/T 3077-2015</b></td></tr>
+<tr><td>2</td><td><a href="/detail/2">40Cr</a></td><td><b>JIS G 4053-2016</b></td></tr>
+<tr><td>3</td><td><a href="/detail/3">40CrNi</a></td><td><b>GB/T 3077-2015</b></td></tr>
+</tbody></table>
+</body></html>'''
+
+DETAIL_PAGE = '''<html><body>
+<div class="layui-breadcrumb"><a>首页</a><a><cite>40Cr</cite></a></div>
+<table><tr><td>牌号</td><td>40Cr</td></tr></table>
+</body></html>'''
+
+CHALLENGE_PAGE = '<html><body><div id="captcha">请完成人机验证后继续访问</div></body></html>'
+EMPTY_SEARCH_PAGE = '<html><body><p>加载中...</p></body></html>'
+
+class FakeDriver:
+    """模拟浏览器：按地址返回渲染后的页面，记录访问过的地址"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.visited = []
+        self.window_handles = ['main']
+        self.switch_to = SimpleNamespace(window=lambda handle: None)
+        self.current_url = None
+        self.page_source = ''
+        self.quit_called = False
+
+    def get(self, url):
+        self.visited.append(url)
+        self.current_url = url
+        self.page_source = self.pages[url]
+
+    def execute_script(self, script, *args):
+        if script == "window.open('');":
+            self.window_handles.append(f"tab{len(self.window_handles)}")
+            return None
+        if script == EXTRACT_ROWS_SCRIPT:
+            return [list(row) for row in parse_search_rows(self.page_source, self.current_url)]
+        raise AssertionError(f"unexpected script: {script[:40]}")
+
+    def find_element(self, by, value):
+        if not lxml.html.fromstring(self.page_source).xpath(value):
+            raise NoSuchElementException(value)
+        return object()
+
+    def close(self):
+        self.window_handles.pop()
+
+    def quit(self):
+        self.quit_called = True
+
+@pytest.fixture
+def site(fixture_server):
+    """模拟材数库：搜索页和详情页，challenged 中的路径返回验证页"""
+    challenged = set()
+
+    def route(method, path, body):
+        if path in challenged:
+            return 200, {'Content-Type': 'text/html; charset=utf-8'}, CHALLENGE_PAGE
+        if path.startswith('/material/'):
+            return 200, {'Content-Type': 'text/html; charset=utf-8'}, SEARCH_PAGE
+        if path.startswith('/detail/'):
+            return 200, {'Content-Type': 'text/html; charset=utf-8'}, DETAIL_PAGE
+        return 404, {}, 'not found'
+
+    server = fixture_server(route)
+    server.challenged = challenged
+    return server
+
+@pytest.fixture
+def fetcher():
+    fetcher = PageFetcher('http', limiter=RateLimiter(rate=1000, burst=100, jitter=0))
+    yield fetcher
+    fetcher.close()
+
+def _install_driver(monkeypatch, pages):
+    driver = FakeDriver(pages)
+    monkeypatch.setattr(metal_materials_scraper, 'create_driver', lambda: driver)
+    return driver
+
+def _no_browser():
+    raise AssertionError('不应启动浏览器')
+
+def test_http_search_and_detail(site, fetcher, monkeypatch):
+    monkeypatch.setattr(metal_materials_scraper, 'create_driver', _no_browser)
+    rows = fetcher.search_rows(f"{site.url}/material/?keyword=40Cr&page=1")
+    assert rows == [
+        ('40Cr', f"{site.url}/detail/1", 'GB/T 3077-2015'),
+        ('40Cr', f"{site.url}/detail/2", 'JIS G 4053-2016'),
+        ('40CrNi', f"{site.url}/detail/3", 'GB/T 3077-2015'),
+    ]
+    assert fetcher.detail_page(rows[0][1]) == DETAIL_PAGE
+    assert fetcher.stats == {'http': 2, 'selenium': 0, 'fallback': 0}
+
+def test_challenge_detail_falls_back_to_browser(site, fetcher, monkeypatch):
+    site.challenged.add('/detail/1')
+    url = f"{site.url}/detail/1"
+    driver = _install_driver(monkeypatch, {url: DETAIL_PAGE})
+    assert fetcher.detail_page(url) == DETAIL_PAGE
+    assert driver.visited == [url]
+    assert driver.window_handles == ['main']
+    assert fetcher.stats == {'http': 0, 'selenium': 1, 'fallback': 1}
+    # 验证页视为限流信号，该主机的速率减半
+    bucket = fetcher.limiter._buckets[f"127.0.0.1:{site.server_address[1]}"]
+    assert bucket['throttles'] == 1
+
+def test_search_without_table_falls_back_to_browser(fixture_server, fetcher, monkeypatch):
+    server = fixture_server(lambda method, path, body: (200, {'Content-Type': 'text/html'}, EMPTY_SEARCH_PAGE))
+    url = f"{server.url}/material/?keyword=40Cr&page=1"
+    _install_driver(monkeypatch, {url: SEARCH_PAGE.replace('href="/', f'href="{server.url}/')})
+    rows = fetcher.search_rows(url)
+    assert [row[1] for row in rows] == [f"{server.url}/detail/{i}" for i in (1, 2, 3)]
+    assert fetcher.stats == {'http': 0, 'selenium': 1, 'fallback': 1}
+
+def test_scrape_material_over_http(site, fetcher, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    site.challenged.add('/detail/1')
+    driver = _install_driver(monkeypatch, {f"{site.url}/detail/1": DETAIL_PAGE})
+    saved = []
+    found = scrape_material('40Cr', fetcher, site.url + '/material/?keyword={keyword}&page={page}',
+                            standard='GB/T 3077-2015', on_saved=lambda folder, name: saved.append((folder, name)))
+    assert found
+    assert saved == [('40Cr', '40Cr_GB_T_3077-2015.html')]
+    with open(tmp_path / 'data' / 'html_data' / '40Cr' / '40Cr_GB_T_3077-2015.html', encoding='utf-8') as f:
+        assert f.read() == DETAIL_PAGE
+    # 搜索页走HTTP，只有返回验证页的详情页经过浏览器
+    assert driver.visited == [f"{site.url}/detail/1"]
+    assert [path for _, path, _ in site.requests] == ['/material/?keyword=40Cr&page=1', '/detail/1']
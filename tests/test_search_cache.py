@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawl_state import CrawlState
+from html_store import HtmlStore
+from metal_materials_scraper import scrape_material
+from metrics import MetricsRecorder
+from search_cache import SearchCache
+
+BASE_URL = 'http://example.test/material/?keyword={keyword}&page={page}'
+ROWS = [('40Cr', 'http://example.test/detail/1', 'GB/T 3077-2015'),
+        ('40Cr', 'http://example.test/detail/2', 'JIS G 4053-2016')]
+
+class FakeFetcher:
+    """记录搜索页请求的抓取器"""
+
+    def __init__(self):
+        self.metrics = MetricsRecorder()
+        self.searched = []
+
+    def search_rows(self, url):
+        self.searched.append(url)
+        return list(ROWS)
+
+    def detail_page(self, url):
+        return '<html><body><div class="layui-breadcrumb">40Cr</div></body></html>'
+
+def _age(cache, seconds):
+    """把缓存条目的获取时间提前 seconds 秒"""
+    with cache._conn:
+        cache._conn.execute('UPDATE search_results SET fetched_at = fetched_at - ?', (seconds,))
+
+def _age_all(tmp_path, seconds):
+    """把缓存和爬取进度中的所有记录提前 seconds 秒"""
+    cache = SearchCache(str(tmp_path / 'cache.db'))
+    _age(cache, seconds)
+    cache.close()
+    state = CrawlState(str(tmp_path / 'state.db'))
+    with state._conn:
+        state._conn.execute('UPDATE materials SET updated_at = updated_at - ?', (seconds,))
+        state._conn.execute('UPDATE search_pages SET visited_at = visited_at - ?', (seconds,))
+        state._conn.execute('UPDATE detail_urls SET saved_at = saved_at - ?', (seconds,))
+    state.close()
+
+def test_get_fetched_after(tmp_path):
+    cache = SearchCache(str(tmp_path / 'cache.db'))
+    cache.put('40Cr', 1, ROWS)
+    _age(cache, 3600)
+    assert cache.get('40Cr', 1) == ROWS
+    assert cache.get('40Cr', 1, fetched_after=time.time() - 7200) == ROWS
+    assert cache.get('40Cr', 1, fetched_after=time.time() - 1800) is None
+    cache.close()
+
+def _scrape(tmp_path, refresh_older_than, state_name='state.db'):
+    """按两个标准爬取同一材料，返回实际下载的搜索页"""
+    fetcher = FakeFetcher()
+    state = CrawlState(str(tmp_path / state_name), refresh_older_than=refresh_older_than)
+    cache = SearchCache(str(tmp_path / 'cache.db'))
+    store = HtmlStore(str(tmp_path / 'html'))
+    try:
+        assert scrape_material('40Cr', fetcher, BASE_URL, 'GB/T 3077-2015', state, cache, store)
+        # 同一次运行中按另一个标准爬取时使用本次获取的缓存
+        assert scrape_material('40Cr', fetcher, BASE_URL, 'JIS G 4053-2016', state, cache, store)
+    finally:
+        state.close()
+        cache.close()
+        store.close()
+    return fetcher.searched
+
+def test_refresh_bypasses_stale_search_cache(tmp_path):
+    assert _scrape(tmp_path, None) == [BASE_URL.format(keyword='40Cr', page=1)]
+    _age_all(tmp_path, 3600)
+
+    # 不要求重新爬取：材料已完成，直接跳过
+    assert _scrape(tmp_path, None) == []
+    # 重新爬取半小时前的记录：缓存仍在7天有效期内，但同样过期，搜索页重新下载
+    assert _scrape(tmp_path, 1800) == [BASE_URL.format(keyword='40Cr', page=1)]
+
+    # 缓存比过期时间点新时仍然使用
+    _age_all(tmp_path, 3600)
+    assert _scrape(tmp_path, 7200, state_name='other.db') == []
@@ -0,0 +1,168 @@
+import os
+import sys
+
+import lxml.html
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from table_parser import (DEFAULT_ELEMENTS, SECTIONS, _matrix_entries, _parse_chemical, _parse_identity,
+                          _table_rows, parse_material_page, parse_range)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+# 纵向化学成分表、合并单元格的力学性能表、矩阵排列的物理性能表
+Q345B = os.path.join(FIXTURES, 'prompts', 'Q345B_GB_T_1591-2008.html')
+# 横向化学成分表、以状态为首列的力学性能矩阵、两列键值表和相关标准表
+HORIZONTAL = os.path.join(FIXTURES, 'parser', '40CrNiMoA_GB_T_3077-2015.html')
+# 各部分都无法可靠解析：化学成分只有文字、力学性能写在正文、物理性能没有数值、相近牌号没有表格
+UNPARSEABLE = os.path.join(FIXTURES, 'parser', 'Q235A_unparseable.html')
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def _doc(html):
+    return lxml.html.document_fromstring(html.encode('utf-8'), parser=lxml.html.HTMLParser(encoding='utf-8'))
+
+def _tables(path):
+    """页面中所有表格的单元格文本，按出现顺序"""
+    return [_table_rows(table) for table in _doc(_read(path)).iter('table')]
+
+@pytest.mark.parametrize('value, expected', [
+    ('0.17~0.24', {'Min': '0.17', 'Max': '0.24'}),
+    ('0.17 - 0.24 %', {'Min': '0.17', 'Max': '0.24'}),
+    ('0.50～0.80', {'Min': '0.50', 'Max': '0.80'}),
+    ('≤0.035', {'Min': '-', 'Max': '0.035'}),
+    ('<0.5', {'Min': '-', 'Max': '0.5'}),
+    ('max 0.30', {'Min': '-', 'Max': '0.30'}),
+    ('≥0.5', {'Min': '0.5', 'Max': '-'}),
+    ('0.20', {'Min': '0.20', 'Max': '0.20'}),
+    ('余量', {'Min': '-', 'Max': '-'}),
+    ('', {'Min': '-', 'Max': '-'}),
+    ('-', {'Min': '-', 'Max': '-'}),
+])
+def test_parse_range(value, expected):
+    assert parse_range(value) == expected
+
+@pytest.mark.parametrize('value', ['见标准', '0.17~', '约0.2', 'Cr+Ni≤0.5'])
+def test_parse_range_unparseable(value):
+    assert parse_range(value) is None
+
+def test_table_rows_fills_rowspan():
+    # 清理后的页面没有rowspan属性，合并单元格的下一行少一列
+    mechanical = _tables(Q345B)[2]
+    assert mechanical[1] == ['屈服强度', '厚度≤16 mm', '≥345 MPa']
+    assert mechanical[2] == ['屈服强度', '厚度16~40 mm', '≥335 MPa']
+
+def test_parse_chemical_vertical():
+    chemical = _parse_chemical([_tables(Q345B)[1]])
+    elements = chemical['Elements']
+    assert list(elements)[:len(DEFAULT_ELEMENTS)] == DEFAULT_ELEMENTS
+    assert elements['C'] == {'Min': '-', 'Max': '0.20'}
+    assert elements['V'] == {'Min': '0.02', 'Max': '0.15'}
+    assert elements['Mo'] == {'Min': '-', 'Max': '-'}
+    assert chemical['Notes'] == []
+
+def test_parse_chemical_horizontal():
+    elements = _parse_chemical([_tables(HORIZONTAL)[2]])['Elements']
+    assert elements['Ni'] == {'Min': '1.25', 'Max': '1.65'}
+    assert elements['P'] == {'Min': '-', 'Max': '0.020'}
+    assert elements['Fe'] == {'Min': '-', 'Max': '-'}
+
+def test_parse_chemical_horizontal_with_label_column():
+    rows = [['元素', 'C', 'Si', 'Mn'], ['含量(%)', '0.17~0.24', '≤0.37', '0.35~0.65']]
+    elements = _parse_chemical([rows])['Elements']
+    assert elements['C'] == {'Min': '0.17', 'Max': '0.24'}
+    assert elements['Mn'] == {'Min': '0.35', 'Max': '0.65'}
+
+def test_parse_chemical_unparseable():
+    assert _parse_chemical([_tables(UNPARSEABLE)[1]]) is None
+    # 少于三个元素时不认为是化学成分表
+    assert _parse_chemical([[['C', '0.20'], ['Si', '0.30']]]) is None
+    # 只有元素没有数值
+    assert _parse_chemical([[['C', '-'], ['Si', '-'], ['Mn', '-']]]) is None
+
+def test_matrix_entries_rowspan_rows():
+    entries = _matrix_entries(_tables(Q345B)[2])
+    assert entries[1] == {'Property': '屈服强度', 'Condition': '厚度16~40 mm', 'Value': '≥335 MPa'}
+    assert [e['Property'] for e in entries] == ['屈服强度', '屈服强度', '抗拉强度', '断后伸长率']
+
+def test_matrix_entries_matrix_layout():
+    physical = _matrix_entries(_tables(Q345B)[4])
+    assert physical[0] == {'Property': '弹性模量(GPa)', 'Condition': '20℃', 'Value': '206'}
+    assert len(physical) == 4
+    # 无数值的单元格（-）不输出
+    mechanical = _matrix_entries(_tables(HORIZONTAL)[3])
+    assert [e['Condition'] for e in mechanical] == ['调质'] * 3
+    assert mechanical[0] == {'Property': '抗拉强度Rm(MPa)', 'Condition': '调质', 'Value': '≥980'}
+
+def test_matrix_entries_value_key_and_unparseable():
+    assert _matrix_entries([['硬度', '≤229 HBW']], value_key='Data') == [{'Property': '硬度', 'Data': '≤229 HBW'}]
+    assert _matrix_entries([['高温性能', '见标准附录']]) == []
+    assert _matrix_entries([]) == []
+
+def test_parse_identity_four_columns():
+    rows = _tables(Q345B)[0]
+    key_values = [kv for row in rows for kv in zip(row[0::2], row[1::2])]
+    material = _parse_identity(_doc(_read(Q345B)), key_values, [])
+    assert material['Name'] == 'Q345B'
+    assert material['OldName'] == '16Mn'
+    assert material['OtherNames'] == ['L03452']
+    assert material['Density'] == '7.85 g/cm³'
+    assert material['BelongsToStandard'] == {'StandardCode': 'GB/T 1591-2008', 'Description': '低合金高强度结构钢'}
+    assert material['AllStandards'] == [material['BelongsToStandard']]
+
+def test_parse_identity_standard_table():
+    tables = _tables(HORIZONTAL)
+    key_values = [kv for row in tables[0] for kv in zip(row[0::2], row[1::2])]
+    material = _parse_identity(_doc(_read(HORIZONTAL)), key_values, [tables[1]])
+    assert material['OtherNames'] == ['A50403', 'SNCM439']
+    assert material['Category'] == '合金结构钢'
+    # 没有所属标准时取相关标准的第一条
+    assert material['BelongsToStandard']['StandardCode'] == 'GB/T 3077-2015'
+    assert [s['StandardCode'] for s in material['AllStandards']] == ['GB/T 3077-2015', 'GB/T 699-2015']
+
+def test_parse_identity_name_from_breadcrumb():
+    doc = _doc(_read(Q345B))
+    material = _parse_identity(doc, [('所属标准', 'GB/T 1591-2008 低合金高强度结构钢')], [])
+    assert material['Name'] == 'Q345B'
+
+def test_parse_identity_without_standard():
+    doc = _doc(_read(UNPARSEABLE))
+    assert _parse_identity(doc, [('分类', '碳素结构钢')], []) is None
+
+def test_parse_material_page_complete():
+    for path in (Q345B, HORIZONTAL):
+        data, sources = parse_material_page(_read(path))
+        assert sources == {section: 'parser' for section in SECTIONS}
+    data, _ = parse_material_page(_read(HORIZONTAL))
+    # 页面没有热处理、物理性能和相近牌号内容时输出空数组
+    assert data['MechanicalProperties']['HeatTreatment'] == []
+    assert data['PhysicalProperties'] == {'Properties': []}
+    assert data['SimilarGrades'] == []
+
+def test_parse_material_page_unparseable():
+    data, sources = parse_material_page(_read(UNPARSEABLE))
+    assert data == {}
+    assert sources == {section: None for section in SECTIONS}
+
+def test_heat_treatment_alone_is_not_mechanical():
+    # 力学性能写在正文中，只有热处理表能解析时整个部分交给模型
+    html = _read(Q345B)
+    start = html.index('<h2>力学性能</h2>')
+    end = html.index('<h2>热处理</h2>')
+    html = html[:start] + '<h2>力学性能</h2>\n<p>屈服强度不小于345 MPa。</p>\n' + html[end:]
+    data, sources = parse_material_page(html)
+    assert 'MechanicalProperties' not in data and sources['MechanicalProperties'] is None
+    assert sources['ChemicalComposition'] == 'parser'
+
+def test_one_unparseable_table_rejects_section():
+    html = _read(Q345B).replace(
+        '<h2>热处理</h2>', '<h3>高温力学性能</h3>\n<table><tr><td>高温性能</td><td>见标准附录</td></tr></table>\n<h2>热处理</h2>')
+    data, sources = parse_material_page(html)
+    assert sources['MechanicalProperties'] is None
+    html = _read(Q345B).replace(
+        '<h2>相近牌号</h2>', '<h3>其他物理性能</h3>\n<table><tr><td>线膨胀系数</td><td>见标准</td></tr></table>\n<h2>相近牌号</h2>')
+    data, sources = parse_material_page(html)
+    assert sources['PhysicalProperties'] is None
+    assert sources['MechanicalProperties'] == 'parser'